@@ -2,13 +2,22 @@
 API路由定义
 """
 
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Header, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, List
 from loguru import logger
 
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.redis_client import get_redis
+from app.core.tracing import tracer
+from app.services.json_extract import json_extractor
+from app.services.status_writer import TASK_TOTALS_KEY
+from app.services.task_events import TERMINAL_STATUSES, task_event_hub
 
 
 # 创建API路由器
@@ -22,6 +31,7 @@ class GenerationRequest(BaseModel):
     type: str = Field(..., description="生成类型: banner, slogan, emoji")
     prompt: str = Field(..., min_length=1, max_length=1000, description="生成提示词")
     parameters: Dict[str, Any] = Field(default_factory=dict, description="生成参数")
+    user_id: Optional[str] = Field(default=None, description="用户ID，用于同类型任务间的公平调度")
 
 
 class TaskStatusResponse(BaseModel):
@@ -33,6 +43,17 @@ class TaskStatusResponse(BaseModel):
     error: Optional[str] = None
 
 
+class BulkTaskStatusRequest(BaseModel):
+    """批量任务状态请求模型"""
+    task_ids: List[str] = Field(..., min_length=1, max_length=200, description="任务ID列表")
+
+
+class BulkTaskStatusResponse(BaseModel):
+    """批量任务状态响应模型"""
+    tasks: List[TaskStatusResponse]
+    missing: List[str] = Field(default_factory=list, description="不存在的任务ID")
+
+
 # 依赖注入
 async def get_ai_service(request: Request):
     """获取AI服务实例"""
@@ -46,10 +67,13 @@ async def get_ai_service(request: Request):
 async def generate_content(
     request: GenerationRequest,
     background_tasks: BackgroundTasks,
-    ai_svc = Depends(get_ai_service)
+    ai_svc = Depends(get_ai_service),
+    traceparent: Optional[str] = Header(default=None)
 ):
     """
     生成AI内容
+    
+    请求头中的W3C traceparent会作为任务链路的上游
     """
     try:
         logger.info(f"收到生成请求: {request.task_id} - {request.type}")
@@ -66,21 +90,88 @@ async def generate_content(
             task_id=request.task_id,
             generation_type=request.type,
             prompt=request.prompt,
-            parameters=request.parameters
+            parameters=request.parameters,
+            user_id=request.user_id,
+            traceparent=traceparent
         )
         
+        if result.get("status") == "rejected":
+            raise HTTPException(
+                status_code=429,
+                detail=result["message"],
+                headers={"Retry-After": str(result["retry_after"])}
+            )
+        
         return {
             "message": "生成任务已启动",
             "task_id": request.task_id,
             "status": result.get("status", "queued"),
-            "estimated_time": 30  # 预估30秒
+            "estimated_time": result.get("estimated_time")
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"生成请求处理失败: {e}")
         raise HTTPException(status_code=500, detail=f"生成失败: {str(e)}")
 
 
+# 任务状态缓存时间（秒）
+TASK_CACHE_TTL = 3600
+
+TASK_RECORD_COLUMNS = """
+    task_id, status, progress, output_image_path, thumbnail_path,
+    error_message, generation_time, created_at, completed_at
+"""
+
+
+def _task_from_cache(task_id: str, cached_result: Dict[str, Any]) -> TaskStatusResponse:
+    """由Redis缓存的任务状态构建响应"""
+    return TaskStatusResponse(
+        task_id=task_id,
+        status=cached_result.get("status", "unknown"),
+        progress=cached_result.get("progress", 0),
+        result=cached_result.get("result"),
+        error=cached_result.get("error")
+    )
+
+
+def _task_cache_entry(task: TaskStatusResponse) -> Dict[str, Any]:
+    """任务状态的Redis缓存格式"""
+    return task.model_dump(exclude={'task_id'}, exclude_none=True)
+
+
+def _task_from_record(task: Dict[str, Any]) -> TaskStatusResponse:
+    """由数据库记录构建响应"""
+    result_data = None
+    if task['output_image_path']:
+        result_data = {
+            'image_path': task['output_image_path'],
+            'thumbnail_path': task.get('thumbnail_path'),
+            'generation_time': task['generation_time']
+        }
+    
+    return TaskStatusResponse(
+        task_id=task['task_id'],
+        status=task['status'],
+        progress=task['progress'],
+        result=result_data,
+        error=task['error_message']
+    )
+
+
+async def _task_from_db(task_id: str) -> Optional[TaskStatusResponse]:
+    """从数据库读取任务状态，任务不存在时返回None"""
+    db = await get_db()
+    query = f"""
+        SELECT {TASK_RECORD_COLUMNS}
+        FROM fazd_generation_records 
+        WHERE task_id = %s
+    """
+    results = await db.execute_query(query, (task_id,))
+    return _task_from_record(results[0]) if results else None
+
+
 @api_router.get("/task/{task_id}", response_model=TaskStatusResponse)
 async def get_task_status(task_id: str):
     """
@@ -88,51 +179,23 @@ async def get_task_status(task_id: str):
     """
     try:
         redis = await get_redis()
-        db = await get_db()
         
         # 先从Redis缓存获取
         cache_key = f"task:{task_id}"
         cached_result = await redis.get(cache_key)
         
         if cached_result:
-            return TaskStatusResponse(
-                task_id=task_id,
-                status=cached_result.get("status", "unknown"),
-                progress=cached_result.get("progress", 0),
-                result=cached_result.get("result"),
-                error=cached_result.get("error")
-            )
+            return _task_from_cache(task_id, cached_result)
         
         # 从数据库获取
-        query = """
-            SELECT task_id, status, progress, output_image_path, 
-                   error_message, generation_time, created_at, completed_at
-            FROM fazd_generation_records 
-            WHERE task_id = %s
-        """
-        
-        results = await db.execute_query(query, (task_id,))
-        
-        if not results:
+        task = await _task_from_db(task_id)
+        if task is None:
             raise HTTPException(status_code=404, detail="任务不存在")
         
-        task = results[0]
-        
-        # 构建结果
-        result_data = None
-        if task['output_image_path']:
-            result_data = {
-                'image_path': task['output_image_path'],
-                'generation_time': task['generation_time']
-            }
-        
-        return TaskStatusResponse(
-            task_id=task_id,
-            status=task['status'],
-            progress=task['progress'],
-            result=result_data,
-            error=task['error_message']
-        )
+        if task.status in TERMINAL_STATUSES:
+            # 终态不再变化，回填缓存避免重复查询数据库
+            await redis.set(cache_key, _task_cache_entry(task), expire=TASK_CACHE_TTL)
+        return task
         
     except HTTPException:
         raise
@@ -141,19 +204,163 @@ async def get_task_status(task_id: str):
         raise HTTPException(status_code=500, detail=f"获取任务状态失败: {str(e)}")
 
 
+@api_router.post("/tasks/status", response_model=BulkTaskStatusResponse)
+async def get_tasks_status(request: BulkTaskStatusRequest):
+    """
+    批量获取任务状态：一次MGET读取缓存，未命中的任务合并为一次数据库查询
+    """
+    try:
+        redis = await get_redis()
+        
+        # 去重并保持请求顺序
+        task_ids = list(dict.fromkeys(request.task_ids))
+        cached_results = await redis.mget([f"task:{task_id}" for task_id in task_ids])
+        
+        tasks: Dict[str, TaskStatusResponse] = {}
+        misses = []
+        for task_id, cached_result in zip(task_ids, cached_results):
+            if isinstance(cached_result, dict):
+                tasks[task_id] = _task_from_cache(task_id, cached_result)
+            else:
+                misses.append(task_id)
+        
+        if misses:
+            db = await get_db()
+            placeholders = ", ".join(["%s"] * len(misses))
+            query = f"""
+                SELECT {TASK_RECORD_COLUMNS}
+                FROM fazd_generation_records 
+                WHERE task_id IN ({placeholders})
+            """
+            backfill = {}
+            for record in await db.execute_query(query, tuple(misses)):
+                task = _task_from_record(record)
+                tasks[task.task_id] = task
+                if task.status in TERMINAL_STATUSES:
+                    backfill[f"task:{task.task_id}"] = _task_cache_entry(task)
+            
+            # 终态任务回填缓存，一次往返写入
+            await redis.mset(backfill, expire=TASK_CACHE_TTL)
+        
+        return BulkTaskStatusResponse(
+            tasks=[tasks[task_id] for task_id in task_ids if task_id in tasks],
+            missing=[task_id for task_id in task_ids if task_id not in tasks]
+        )
+        
+    except Exception as e:
+        logger.error(f"批量获取任务状态失败: {e}")
+        raise HTTPException(status_code=500, detail=f"批量获取任务状态失败: {str(e)}")
+
+
+async def _task_events(task_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+    """
+    任务进度事件流，任务进入终态后结束
+    
+    先返回当前状态快照（缓存已过期或任务尚未开始处理时读取数据库记录），
+    任务不存在时抛出404；空闲超过心跳间隔时产出None
+    """
+    async with task_event_hub.subscribe(task_id) as queue:
+        # 先订阅再读取快照，避免错过两者之间的事件
+        redis = await get_redis()
+        snapshot = await redis.get(f"task:{task_id}")
+        if not isinstance(snapshot, dict):
+            task = await _task_from_db(task_id)
+            if task is None:
+                raise HTTPException(status_code=404, detail="任务不存在")
+            snapshot = _task_cache_entry(task)
+        yield {'task_id': task_id, **snapshot}
+        if snapshot.get('status') in TERMINAL_STATUSES:
+            return
+        
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.TASK_EVENTS_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            yield event
+            if event.get('status') in TERMINAL_STATUSES:
+                return
+
+
+def _sse_message(event: Optional[Dict[str, Any]]) -> str:
+    """事件的Server-Sent Events格式，None为心跳注释"""
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"event: progress\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@api_router.get("/task/{task_id}/events")
+async def stream_task_events(task_id: str):
+    """
+    以Server-Sent Events推送任务进度
+    """
+    events = _task_events(task_id)
+    # 开始推送前先取出快照，任务不存在时直接返回404
+    snapshot = await events.__anext__()
+    
+    async def event_stream():
+        try:
+            yield _sse_message(snapshot)
+            async for event in events:
+                yield _sse_message(event)
+        finally:
+            await events.aclose()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# 任务不存在时WebSocket的关闭码（应用自定义范围4000-4999）
+WS_CLOSE_TASK_NOT_FOUND = 4404
+
+
+@api_router.websocket("/task/{task_id}/ws")
+async def task_events_websocket(websocket: WebSocket, task_id: str):
+    """
+    以WebSocket推送任务进度
+    """
+    await websocket.accept()
+    try:
+        async for event in _task_events(task_id):
+            if event is not None:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except HTTPException as e:
+        await websocket.send_json({'task_id': task_id, 'error': e.detail})
+        await websocket.close(code=WS_CLOSE_TASK_NOT_FOUND)
+    except Exception as e:
+        logger.error(f"推送任务进度失败: {task_id} ({e})")
+        await websocket.close(code=1011)
+
+
 @api_router.get("/queue/status")
 async def get_queue_status(ai_svc = Depends(get_ai_service)):
     """
     获取队列状态
     """
     try:
-        queue_size = ai_svc.generation_queue.qsize()
+        lanes = await ai_svc.generation_queue.lane_depths()
         worker_count = len(ai_svc.worker_tasks)
         
         return {
-            "queue_size": queue_size,
+            "queue_size": sum(lanes.values()),
+            "lanes": {lane: {"depth": depth, "weight": settings.lane_weights.get(lane, 1)}
+                      for lane, depth in lanes.items()},
             "worker_count": worker_count,
-            "service_ready": ai_svc.is_ready()
+            "service_ready": ai_svc.is_ready(),
+            "queue": ai_svc.generation_queue.stats(),
+            "render": ai_svc.render_executor.stats(),
+            "status_writer": ai_svc.status_writer.stats(),
+            "admission": ai_svc.admission.stats(),
+            "result_cache": ai_svc.result_cache.stats(),
+            "task_events": task_event_hub.stats(),
+            "task_totals": await (await get_redis()).counters(TASK_TOTALS_KEY)
         }
         
     except Exception as e:
@@ -161,6 +368,33 @@ async def get_queue_status(ai_svc = Depends(get_ai_service)):
         raise HTTPException(status_code=500, detail=f"获取队列状态失败: {str(e)}")
 
 
+@api_router.get("/debug/trace/{task_id}")
+async def get_task_trace(task_id: str):
+    """
+    获取任务各阶段的耗时（span）
+    """
+    try:
+        spans = await tracer.load(task_id)
+        if not spans:
+            raise HTTPException(status_code=404, detail="未找到任务的追踪数据")
+        
+        start = min(span['start'] for span in spans)
+        end = max(span['end'] or span['start'] for span in spans)
+        return {
+            "task_id": task_id,
+            "trace_id": spans[0]['trace_id'],
+            "duration": round(end - start, 6),
+            "stages": tracer.breakdown(spans),
+            "spans": spans
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取任务追踪数据失败: {e}")
+        raise HTTPException(status_code=500, detail=f"获取任务追踪数据失败: {str(e)}")
+
+
 @api_router.post("/test/generate")
 async def test_generate(ai_svc = Depends(get_ai_service)):
     """
@@ -195,14 +429,16 @@ async def get_models_status(request: Request):
     获取AI模型状态
     """
     try:
-        from app.core.config import settings
 
         ai_svc = getattr(request.app.state, 'ai_service', None)
 
         models_status = {
             "gemini": {
                 "configured": bool(settings.GEMINI_API_KEY),
-                "available": bool(ai_svc.gemini_model) if ai_svc and ai_svc.is_ready() else False
+                "available": (bool(ai_svc.gemini_model) and ai_svc.model_guard.available
+                              if ai_svc and ai_svc.is_ready() else False),
+                "guard": ai_svc.model_guard.stats() if ai_svc else None,
+                "json_extraction": json_extractor.stats()
             },
             "openai": {
                 "configured": bool(settings.OPENAI_API_KEY),
@@ -248,7 +484,7 @@ async def health_check(request: Request):
                 "redis": redis_status,
                 "ai_service": ai_status
             },
-            "queue_size": ai_svc.generation_queue.qsize() if ai_svc and ai_svc.is_ready() else 0
+            "queue_size": await ai_svc.generation_queue.size() if ai_svc and ai_svc.is_ready() else 0
         }
 
     except Exception as e:
@@ -4,6 +4,7 @@
 
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import Dict
 import os
 
 # 项目根目录
@@ -24,12 +25,52 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = Field(default="", env="OPENAI_API_KEY")
     AI_REQUEST_TIMEOUT: int = Field(default=300, env="AI_REQUEST_TIMEOUT")
     MAX_CONCURRENT_REQUESTS: int = Field(default=10, env="MAX_CONCURRENT_REQUESTS")
+    QUEUE_BACKEND: str = Field(default="memory", env="QUEUE_BACKEND")  # memory 或 redis
+    QUEUE_KEY_PREFIX: str = Field(default="ai:queue", env="QUEUE_KEY_PREFIX")
+    QUEUE_VISIBILITY_TIMEOUT: int = Field(default=600, env="QUEUE_VISIBILITY_TIMEOUT")  # 未确认任务重新投递前的秒数
+    QUEUE_MAX_DELIVERIES: int = Field(default=3, env="QUEUE_MAX_DELIVERIES")
+    QUEUE_POLL_TIMEOUT: float = Field(default=1.0, env="QUEUE_POLL_TIMEOUT")  # 阻塞取任务的超时（秒），需小于Redis socket超时
+    QUEUE_MAX_DEPTH: int = Field(default=500, env="QUEUE_MAX_DEPTH")  # 排队任务数上限，超过后拒绝新任务
+    QUEUE_WAIT_SLO: float = Field(default=120.0, env="QUEUE_WAIT_SLO")  # 预计排队时间上限（秒）
+    ADMISSION_RATE_WINDOW: float = Field(default=60.0, env="ADMISSION_RATE_WINDOW")  # 统计出队速率的时间窗口（秒）
+    ADMISSION_DEFAULT_SERVICE_TIME: float = Field(default=30.0, env="ADMISSION_DEFAULT_SERVICE_TIME")  # 无样本时假定的单任务处理耗时（秒）
+    ADMISSION_KEY_PREFIX: str = Field(default="ai:admission", env="ADMISSION_KEY_PREFIX")
+    ADMISSION_SYNC_INTERVAL: float = Field(default=1.0, env="ADMISSION_SYNC_INTERVAL")  # Redis队列下与其他副本汇总完成记录的间隔（秒）
+    SCHEDULER_LANE_WEIGHTS: str = Field(default="slogan=6,banner=2,emoji=2", env="SCHEDULER_LANE_WEIGHTS")  # 各生成类型车道的调度权重
+    RESULT_CACHE_PREFIX: str = Field(default="ai:result", env="RESULT_CACHE_PREFIX")
+    RESULT_CACHE_TTL: int = Field(default=86400, env="RESULT_CACHE_TTL")  # 生成结果缓存时间（秒），0表示关闭
+    RESULT_CACHE_MAX_ENTRIES: int = Field(default=10000, env="RESULT_CACHE_MAX_ENTRIES")
+    RESULT_CACHE_MAX_BYTES: int = Field(default=65536, env="RESULT_CACHE_MAX_BYTES")  # 单个结果的最大字节数，超过则不缓存
+    RESULT_CACHE_LOCK_TTL: int = Field(default=30, env="RESULT_CACHE_LOCK_TTL")  # 跨副本生成标记的有效期（秒），生成期间续期，副本退出后其他副本最多等待该时间
+    RESULT_CACHE_POLL_INTERVAL: float = Field(default=0.5, env="RESULT_CACHE_POLL_INTERVAL")  # 等待其他副本生成结果时轮询缓存的间隔（秒）
+    MODEL_BREAKER_WINDOW: int = Field(default=20, env="MODEL_BREAKER_WINDOW")  # 熔断统计的最近调用次数
+    MODEL_BREAKER_MIN_CALLS: int = Field(default=5, env="MODEL_BREAKER_MIN_CALLS")  # 达到该调用次数后才判断是否熔断
+    MODEL_BREAKER_FAILURE_RATE: float = Field(default=0.5, env="MODEL_BREAKER_FAILURE_RATE")
+    MODEL_BREAKER_SLOW_CALL_SECONDS: float = Field(default=60.0, env="MODEL_BREAKER_SLOW_CALL_SECONDS")  # 超过该耗时视为慢调用
+    MODEL_BREAKER_SLOW_CALL_RATE: float = Field(default=0.8, env="MODEL_BREAKER_SLOW_CALL_RATE")
+    MODEL_BREAKER_RESET_TIMEOUT: float = Field(default=30.0, env="MODEL_BREAKER_RESET_TIMEOUT")  # 熔断后尝试恢复的等待时间（秒）
+    MODEL_HEDGING: bool = Field(default=False, env="MODEL_HEDGING")  # 模型调用慢于近期延迟分位数时发起对冲请求
+    MODEL_HEDGE_PERCENTILE: float = Field(default=95.0, env="MODEL_HEDGE_PERCENTILE")
+    MODEL_HEDGE_BUDGET: float = Field(default=0.1, env="MODEL_HEDGE_BUDGET")  # 对冲请求数占调用数的比例上限
+    MODEL_HEDGE_MIN_SAMPLES: int = Field(default=20, env="MODEL_HEDGE_MIN_SAMPLES")  # 延迟样本达到该数量后才开始对冲
+    MODEL_HEDGE_MIN_DELAY: float = Field(default=0.5, env="MODEL_HEDGE_MIN_DELAY")  # 对冲延迟下限（秒）
+    MODEL_CALL_THREADS: int = Field(default=16, env="MODEL_CALL_THREADS")  # 同步模型调用专用的线程数
+    MODEL_STREAMING: bool = Field(default=False, env="MODEL_STREAMING")  # 流式读取模型输出并发布部分结果
+    SLOGAN_BATCH_WINDOW: float = Field(default=0.05, env="SLOGAN_BATCH_WINDOW")  # 口号请求合并的等待窗口（秒）
+    SLOGAN_BATCH_MAX_SIZE: int = Field(default=8, env="SLOGAN_BATCH_MAX_SIZE")  # 单次模型调用合并的最大口号请求数，1表示不合并
+    TASK_EVENTS_CHANNEL_PREFIX: str = Field(default="task-events", env="TASK_EVENTS_CHANNEL_PREFIX")
+    TASK_EVENTS_HEARTBEAT: float = Field(default=15.0, env="TASK_EVENTS_HEARTBEAT")  # 推送连接空闲时的心跳间隔（秒）
+    STATUS_FLUSH_INTERVAL: float = Field(default=2.0, env="STATUS_FLUSH_INTERVAL")  # 中间进度批量落库间隔（秒）
+    STATUS_FLUSH_BATCH_SIZE: int = Field(default=200, env="STATUS_FLUSH_BATCH_SIZE")  # 缓冲达到该数量时立即落库
     
     # Redis配置
     REDIS_HOST: str = Field(default="localhost", env="REDIS_HOST")
     REDIS_PORT: int = Field(default=6379, env="REDIS_PORT")
     REDIS_PASSWORD: str = Field(default="", env="REDIS_PASSWORD")
     REDIS_DB: int = Field(default=1, env="REDIS_DB")
+    REDIS_CODEC: str = Field(default="json", env="REDIS_CODEC")  # json 或 msgpack
+    REDIS_COMPRESS_THRESHOLD: int = Field(default=1024, env="REDIS_COMPRESS_THRESHOLD")  # 超过该字节数的值压缩存储，0表示不压缩
+    REDIS_COMPRESS_LEVEL: int = Field(default=1, env="REDIS_COMPRESS_LEVEL")
     
     # MySQL配置
     DB_HOST: str = Field(default="localhost", env="DB_HOST")
@@ -37,6 +78,11 @@ class Settings(BaseSettings):
     DB_USER: str = Field(default="root", env="DB_USER")
     DB_PASSWORD: str = Field(default="netPA-2025", env="DB_PASSWORD")
     DB_NAME: str = Field(default="fanzd_net", env="DB_NAME")
+    DB_DRIVER: str = Field(default="aiomysql", env="DB_DRIVER")  # aiomysql 或 mysql-connector
+    DB_POOL_SIZE: int = Field(default=10, env="DB_POOL_SIZE")
+    DB_POOL_MIN_SIZE: int = Field(default=1, env="DB_POOL_MIN_SIZE")
+    DB_POOL_RECYCLE: int = Field(default=3600, env="DB_POOL_RECYCLE")  # 连接回收时间（秒）
+    DB_HEALTH_CHECK_INTERVAL: int = Field(default=30, env="DB_HEALTH_CHECK_INTERVAL")  # 连接空闲超过该秒数时先ping
     
     # 文件存储配置
     STORAGE_PATH: str = Field(default="../../storage", env="STORAGE_PATH")
@@ -48,8 +94,18 @@ class Settings(BaseSettings):
     # 图像处理配置
     MAX_IMAGE_WIDTH: int = Field(default=2048, env="MAX_IMAGE_WIDTH")
     MAX_IMAGE_HEIGHT: int = Field(default=2048, env="MAX_IMAGE_HEIGHT")
-    THUMBNAIL_SIZE: int = Field(default=300, env="THUMBNAIL_SIZE")
-    IMAGE_QUALITY: int = Field(default=85, env="IMAGE_QUALITY")
+    THUMBNAIL_SIZE: int = Field(default=300, env="THUMBNAIL_SIZE")  # 缩略图最长边（像素），0表示不生成缩略图
+    IMAGE_QUALITY: int = Field(default=85, env="IMAGE_QUALITY")  # 有损编码质量（1-100），无损WebP为压缩力度
+    IMAGE_FORMAT: str = Field(default="webp", env="IMAGE_FORMAT")  # 输出格式: png / webp / webp_lossless / avif，请求参数format可覆盖
+    RENDER_WORKERS: int = Field(default=2, env="RENDER_WORKERS")  # 渲染进程数，0表示在进程内渲染
+    ELEMENT_CACHE_SIZE: int = Field(default=256, env="ELEMENT_CACHE_SIZE")  # 缓存的已缩放元素数量
+    FONT_FAMILIES: str = Field(
+        default="source-han-sans-bold=app/assets/fonts/SourceHanSans-Bold.otf",
+        env="FONT_FAMILIES"
+    )  # 字体族=字体文件路径，多个用逗号分隔，相对路径基于项目根目录
+    DEFAULT_FONT_FAMILY: str = Field(default="source-han-sans-bold", env="DEFAULT_FONT_FAMILY")
+    FONT_CACHE_SIZE: int = Field(default=32, env="FONT_CACHE_SIZE")  # 缓存的(字体族, 字号)字体对象数量
+    MAX_FONT_SIZE: int = Field(default=512, env="MAX_FONT_SIZE")  # 请求参数fontSize的上限，超出时按上限渲染
     
     # 安全配置
     ALLOWED_HOSTS: str = Field(default="localhost,127.0.0.1", env="ALLOWED_HOSTS")
@@ -57,6 +113,12 @@ class Settings(BaseSettings):
     # 监控配置
     ENABLE_METRICS: bool = Field(default=True, env="ENABLE_METRICS")
     METRICS_PORT: int = Field(default=8001, env="METRICS_PORT")
+    TRACING_ENABLED: bool = Field(default=True, env="TRACING_ENABLED")  # 按任务记录各阶段耗时
+    TRACE_MAX_TASKS: int = Field(default=1000, env="TRACE_MAX_TASKS")  # 内存中保留追踪数据的任务数
+    TRACE_KEY_PREFIX: str = Field(default="ai:trace", env="TRACE_KEY_PREFIX")
+    TRACE_TTL: int = Field(default=3600, env="TRACE_TTL")  # 追踪数据在Redis中的保留时间（秒）
+    TRACING_OTLP_ENDPOINT: str = Field(default="", env="TRACING_OTLP_ENDPOINT")  # OTLP/HTTP地址，如 http://collector:4318/v1/traces，为空时不导出
+    TRACING_SERVICE_NAME: str = Field(default="fanzdnet-ai-service", env="TRACING_SERVICE_NAME")
     
     @property
     def redis_url(self) -> str:
@@ -65,6 +127,28 @@ class Settings(BaseSettings):
             return f"redis://:{self.REDIS_PASSWORD}@{self.REDIS_HOST}:{self.REDIS_PORT}/{self.REDIS_DB}"
         return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}/{self.REDIS_DB}"
     
+    @property
+    def font_families(self) -> Dict[str, str]:
+        """字体族与字体文件路径的映射"""
+        families = {}
+        for item in self.FONT_FAMILIES.split(','):
+            if '=' not in item:
+                continue
+            family, path = (part.strip() for part in item.split('=', 1))
+            families[family] = path if os.path.isabs(path) else os.path.join(BASE_DIR, path)
+        return families
+    
+    @property
+    def lane_weights(self) -> Dict[str, int]:
+        """生成类型车道与调度权重的映射"""
+        weights = {}
+        for item in self.SCHEDULER_LANE_WEIGHTS.split(','):
+            if '=' not in item:
+                continue
+            lane, weight = (part.strip() for part in item.split('=', 1))
+            weights[lane] = max(int(weight), 1)
+        return weights
+    
     @property
     def database_url(self) -> str:
         """数据库连接URL"""
@@ -3,6 +3,7 @@
 """
 
 import mysql.connector
+import mysql.connector.pooling
 from mysql.connector import Error
 from loguru import logger
 from typing import Optional, Dict, Any, List
@@ -10,13 +11,32 @@ import asyncio
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
+from app.core.metrics import DB_FAILURES, DB_LATENCY
+
+try:
+    import aiomysql
+except ImportError:  # 未安装时退回mysql-connector线程池模式
+    aiomysql = None
+
+
+# 各驱动的数据库异常
+DB_ERRORS = (Error, aiomysql.Error) if aiomysql else (Error,)
+
+# 执行模式 -> 失败日志前缀
+EXECUTE_MODES = {
+    'query': '查询执行失败',
+    'update': '更新执行失败',
+    'insert': '插入执行失败',
+    'many': '批量执行失败',
+}
 
 
 class DatabaseManager:
     """数据库管理器"""
-    
+
     def __init__(self):
         self.pool = None
+        self.driver = None
         self._connection_config = {
             'host': settings.DB_HOST,
             'port': settings.DB_PORT,
@@ -27,127 +47,224 @@ class DatabaseManager:
             'collation': 'utf8mb4_unicode_ci',
             'autocommit': True,
             'pool_name': 'ai_service_pool',
-            'pool_size': 10,
+            'pool_size': settings.DB_POOL_SIZE,
             'pool_reset_session': True
         }
-    
+
+    @property
+    def is_async(self) -> bool:
+        """是否使用原生异步驱动"""
+        return self.driver == 'aiomysql'
+
     async def initialize(self):
         """初始化数据库连接池"""
         try:
-            self.pool = mysql.connector.pooling.MySQLConnectionPool(**self._connection_config)
-            logger.info("数据库连接池初始化成功")
-            
+            if settings.DB_DRIVER == 'aiomysql' and aiomysql:
+                self.pool = await aiomysql.create_pool(
+                    host=settings.DB_HOST,
+                    port=settings.DB_PORT,
+                    user=settings.DB_USER,
+                    password=settings.DB_PASSWORD,
+                    db=settings.DB_NAME,
+                    charset='utf8mb4',
+                    autocommit=True,
+                    minsize=settings.DB_POOL_MIN_SIZE,
+                    maxsize=settings.DB_POOL_SIZE,
+                    pool_recycle=settings.DB_POOL_RECYCLE
+                )
+                self.driver = 'aiomysql'
+            else:
+                if settings.DB_DRIVER == 'aiomysql':
+                    logger.warning("未安装aiomysql，使用mysql-connector线程池模式")
+                self.pool = await asyncio.to_thread(
+                    mysql.connector.pooling.MySQLConnectionPool, **self._connection_config
+                )
+                self.driver = 'mysql-connector'
+            logger.info(f"数据库连接池初始化成功 ({self.driver})")
+
             # 测试连接
             await self.test_connection()
-            
-        except Error as e:
+
+        except DB_ERRORS as e:
             logger.error(f"数据库连接池初始化失败: {e}")
             raise
-    
+
     async def test_connection(self):
         """测试数据库连接"""
         try:
-            connection = self.pool.get_connection()
-            cursor = connection.cursor()
-            cursor.execute("SELECT 1")
-            result = cursor.fetchone()
-            cursor.close()
-            connection.close()
-            
-            if result[0] == 1:
+            result = await self.execute_query("SELECT 1 AS ok")
+
+            if result and result[0]['ok'] == 1:
                 logger.info("数据库连接测试成功")
             else:
                 raise Exception("数据库连接测试失败")
-                
-        except Error as e:
+
+        except DB_ERRORS as e:
             logger.error(f"数据库连接测试失败: {e}")
             raise
-    
+
+    async def acquire(self):
+        """从连接池获取连接，空闲过久的连接先做健康检查"""
+        if not self.is_async:
+            return await asyncio.to_thread(self.pool.get_connection)
+
+        connection = await self.pool.acquire()
+        try:
+            idle_time = asyncio.get_running_loop().time() - connection.last_usage
+            if idle_time > settings.DB_HEALTH_CHECK_INTERVAL:
+                await connection.ping(reconnect=True)
+        except DB_ERRORS as e:
+            logger.warning(f"数据库连接健康检查失败: {e}")
+            self.pool.release(connection)
+            raise
+        return connection
+
+    async def release(self, connection):
+        """归还连接到连接池"""
+        if not self.is_async:
+            await asyncio.to_thread(self._close_sync, connection)
+            return
+
+        self.pool.release(connection)
+
     @asynccontextmanager
     async def get_connection(self):
         """获取数据库连接（上下文管理器）"""
         connection = None
         try:
-            connection = self.pool.get_connection()
+            connection = await self.acquire()
             yield connection
-        except Error as e:
+        except DB_ERRORS as e:
             logger.error(f"获取数据库连接失败: {e}")
             raise
         finally:
-            if connection and connection.is_connected():
-                connection.close()
-    
-    async def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
-        """执行查询并返回结果"""
+            if connection:
+                await self.release(connection)
+
+    async def health_check(self) -> bool:
+        """检查数据库连接是否可用"""
+        try:
+            await self.execute_query("SELECT 1")
+            return True
+        except DB_ERRORS as e:
+            logger.warning(f"数据库健康检查失败: {e}")
+            return False
+
+    async def _execute(self, query: str, params: Optional[tuple], mode: str):
+        """执行SQL，mode为 query / update / insert / many"""
+        try:
+            with DB_LATENCY.time(operation=mode):
+                if self.is_async:
+                    return await self._execute_async(query, params, mode)
+
+                # mysql-connector为阻塞驱动，放到线程中执行
+                return await asyncio.to_thread(self._execute_sync, query, params, mode)
+        except Exception:
+            DB_FAILURES.inc(operation=mode)
+            raise
+
+    async def _execute_async(self, query: str, params: Optional[tuple], mode: str):
+        """使用aiomysql执行SQL"""
         async with self.get_connection() as connection:
-            cursor = connection.cursor(dictionary=True)
-            try:
+            cursor_class = aiomysql.DictCursor if mode == 'query' else aiomysql.Cursor
+            async with connection.cursor(cursor_class) as cursor:
+                try:
+                    if mode == 'many':
+                        await cursor.executemany(query, params)
+                    else:
+                        await cursor.execute(query, params or ())
+                    if mode == 'query':
+                        return list(await cursor.fetchall())
+                    await connection.commit()
+                    return cursor.lastrowid if mode == 'insert' else cursor.rowcount
+                except DB_ERRORS as e:
+                    if mode != 'query':
+                        await connection.rollback()
+                    self._log_error(mode, e, query, params)
+                    raise
+
+    def _execute_sync(self, query: str, params: Optional[tuple], mode: str):
+        """使用mysql-connector执行SQL（在线程中调用）"""
+        connection = self.pool.get_connection()
+        cursor = connection.cursor(dictionary=(mode == 'query'))
+        try:
+            if mode == 'many':
+                cursor.executemany(query, params)
+            else:
                 cursor.execute(query, params or ())
-                result = cursor.fetchall()
-                return result
-            except Error as e:
-                logger.error(f"查询执行失败: {e}")
-                logger.error(f"SQL: {query}")
-                logger.error(f"参数: {params}")
-                raise
-            finally:
-                cursor.close()
-    
+            if mode == 'query':
+                return cursor.fetchall()
+            connection.commit()
+            return cursor.lastrowid if mode == 'insert' else cursor.rowcount
+        except Error as e:
+            if mode != 'query':
+                connection.rollback()
+            self._log_error(mode, e, query, params)
+            raise
+        finally:
+            cursor.close()
+            self._close_sync(connection)
+
+    @staticmethod
+    def _close_sync(connection):
+        """关闭mysql-connector连接（归还到连接池）"""
+        if connection.is_connected():
+            connection.close()
+
+    @staticmethod
+    def _log_error(mode: str, error: Exception, query: str, params: Optional[tuple]):
+        """记录SQL执行失败日志"""
+        logger.error(f"{EXECUTE_MODES[mode]}: {error}")
+        logger.error(f"SQL: {query}")
+        logger.error(f"参数: {params}")
+
+    async def execute_query(self, query: str, params: tuple = None) -> List[Dict[str, Any]]:
+        """执行查询并返回结果"""
+        return await self._execute(query, params, 'query')
+
     async def execute_update(self, query: str, params: tuple = None) -> int:
         """执行更新操作并返回影响的行数"""
-        async with self.get_connection() as connection:
-            cursor = connection.cursor()
-            try:
-                cursor.execute(query, params or ())
-                connection.commit()
-                return cursor.rowcount
-            except Error as e:
-                connection.rollback()
-                logger.error(f"更新执行失败: {e}")
-                logger.error(f"SQL: {query}")
-                logger.error(f"参数: {params}")
-                raise
-            finally:
-                cursor.close()
-    
+        return await self._execute(query, params, 'update')
+
     async def execute_insert(self, query: str, params: tuple = None) -> int:
         """执行插入操作并返回插入的ID"""
-        async with self.get_connection() as connection:
-            cursor = connection.cursor()
-            try:
-                cursor.execute(query, params or ())
-                connection.commit()
-                return cursor.lastrowid
-            except Error as e:
-                connection.rollback()
-                logger.error(f"插入执行失败: {e}")
-                logger.error(f"SQL: {query}")
-                logger.error(f"参数: {params}")
-                raise
-            finally:
-                cursor.close()
-    
+        return await self._execute(query, params, 'insert')
+
+    async def execute_many(self, query: str, params_list: List[tuple]) -> int:
+        """使用同一条SQL批量执行多组参数，返回影响的行数"""
+        if not params_list:
+            return 0
+        return await self._execute(query, list(params_list), 'many')
+
     async def close(self):
         """关闭数据库连接池"""
-        if self.pool:
-            # 关闭连接池中的所有连接
-            try:
-                # 获取所有连接并关闭
-                connections = []
-                while True:
-                    try:
-                        conn = self.pool.get_connection()
-                        connections.append(conn)
-                    except:
-                        break
-                
-                for conn in connections:
-                    if conn.is_connected():
-                        conn.close()
-                        
-                logger.info("数据库连接池已关闭")
-            except Exception as e:
-                logger.error(f"关闭数据库连接池时出错: {e}")
+        if not self.pool:
+            return
+
+        if self.is_async:
+            self.pool.close()
+            await self.pool.wait_closed()
+            logger.info("数据库连接池已关闭")
+            return
+
+        # 关闭连接池中的所有连接
+        try:
+            # 获取所有连接并关闭
+            connections = []
+            while True:
+                try:
+                    conn = self.pool.get_connection()
+                    connections.append(conn)
+                except:
+                    break
+
+            for conn in connections:
+                if conn.is_connected():
+                    conn.close()
+
+            logger.info("数据库连接池已关闭")
+        except Exception as e:
+            logger.error(f"关闭数据库连接池时出错: {e}")
 
 
 # 全局数据库管理器实例
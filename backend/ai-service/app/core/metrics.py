@@ -0,0 +1,282 @@
+"""
+运行指标
+进程内记录计数器、仪表盘和直方图，以Prometheus文本格式在METRICS_PORT端口输出
+"""
+
+import asyncio
+import functools
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+
+
+# 默认直方图分桶（秒），覆盖从Redis命令到模型调用的耗时范围
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """指标基类，按标签值分别记录"""
+
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标{self.name}的标签应为{self.labelnames}，实际为{tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels_text(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._labels_text(key)} {_format_value(value)}"
+                for key, value in sorted(self._values.items())]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+    def clear(self):
+        self._values.clear()
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """可增可减的仪表盘"""
+
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class _Timer:
+    """耗时记录器，可作为上下文管理器或异步函数装饰器使用"""
+
+    def __init__(self, histogram: 'Histogram', labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+    def __call__(self, func: Callable[..., Awaitable[Any]]):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return await func(*args, **kwargs)
+        return wrapper
+
+
+class Histogram(_Metric):
+    """分桶直方图"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            # [各分桶计数, 总和, 总数]
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][index] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    def time(self, **labels) -> _Timer:
+        """记录代码块或异步函数的耗时"""
+        self._key(labels)
+        return _Timer(self, labels)
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def sum(self, **labels) -> float:
+        entry = self._values.get(self._key(labels))
+        return entry[1] if entry else 0.0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = self._labels_text(key, ('le', _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels_text(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._labels_text(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，输出前先运行采集函数刷新按需计算的指标"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Awaitable[None]]] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已存在: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Awaitable[None]]):
+        """注册采集函数，每次输出指标前调用"""
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], Awaitable[None]]):
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    async def render(self) -> str:
+        """以Prometheus文本格式输出全部指标"""
+        for collector in list(self._collectors):
+            try:
+                await collector()
+            except Exception as e:
+                logger.warning(f"指标采集失败: {e}")
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+class MetricsServer:
+    """指标HTTP服务，GET /metrics 返回Prometheus文本格式"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: Optional[str] = None, port: Optional[int] = None):
+        host = settings.HOST if host is None else host
+        port = settings.METRICS_PORT if port is None else port
+        try:
+            self.server = await asyncio.start_server(self._handle, host, port)
+            logger.info(f"指标服务已启动 - 端口: {port}")
+        except OSError as e:
+            # 多个工作进程共用端口时只有一个能绑定成功
+            logger.warning(f"指标服务启动失败: {e}")
+
+    @property
+    def port(self) -> Optional[int]:
+        if not self.server or not self.server.sockets:
+            return None
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # 读完请求头
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', (await self.registry.render()).encode()
+            else:
+                status, body = '404 Not Found', b'not found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {self.CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError) as e:
+            logger.debug(f"指标请求中断: {e}")
+        finally:
+            writer.close()
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+
+# 全局指标注册表与指标
+registry = MetricsRegistry()
+
+QUEUE_DEPTH = registry.gauge('ai_queue_depth', '生成队列中等待的任务数', ['lane'])
+QUEUE_WAIT = registry.histogram('ai_queue_wait_seconds', '任务从入队到开始处理的等待时间', ['type'])
+TASK_PROCESSING = registry.histogram('ai_task_processing_seconds', '任务处理耗时', ['type', 'status'])
+TASK_LATENCY = registry.histogram('ai_task_latency_seconds', '任务从入队到结束的端到端耗时', ['type', 'status'])
+MODEL_CALL_LATENCY = registry.histogram('ai_model_call_seconds', '模型调用耗时', ['outcome'])
+MODEL_CALL_ERRORS = registry.counter('ai_model_call_errors_total', '模型调用失败次数', ['reason'])
+MODEL_HEDGES = registry.counter('ai_model_hedges_total', '模型对冲请求次数', ['result'])
+RENDER_LATENCY = registry.histogram('ai_render_seconds', '图片渲染耗时', ['mode'])
+STATUS_UPDATES = registry.counter('ai_status_updates_total', '任务状态更新次数', ['status'])
+STATUS_UPDATE_LATENCY = registry.histogram('ai_status_update_seconds', '任务状态写入耗时')
+DB_LATENCY = registry.histogram('ai_db_query_seconds', '数据库语句耗时', ['operation'])
+DB_FAILURES = registry.counter('ai_db_errors_total', '数据库语句失败次数', ['operation'])
+REDIS_LATENCY = registry.histogram('ai_redis_command_seconds', 'Redis命令耗时', ['command'])
+REDIS_ERRORS = registry.counter('ai_redis_errors_total', 'Redis命令失败次数', ['command'])
+
+metrics_server = MetricsServer(registry)
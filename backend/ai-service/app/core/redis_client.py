@@ -4,35 +4,219 @@ Redis客户端管理
 
 import redis.asyncio as redis
 from loguru import logger
-from typing import Optional, Any
+from typing import Optional, Any, List, Dict, AsyncIterator, Callable
+from contextlib import asynccontextmanager
 import json
-import pickle
+import zlib
 
 from app.core.config import settings
+from app.core.metrics import REDIS_ERRORS, REDIS_LATENCY
+
+try:
+    import orjson
+except ImportError:  # 未安装时使用标准库json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # 未安装时msgpack编码退回json
+    msgpack = None
+
+
+class RedisCodec:
+    """
+    Redis值编解码器
+
+    编码结果为2字节头部加数据：第1字节为类型标记，第2字节为压缩标记。
+    读取时按头部直接解码，不再逐个尝试解析；没有头部的旧数据按原方式解析
+    """
+
+    TAG_STR = ord('s')
+    TAG_BYTES = ord('b')
+    TAG_JSON = ord('j')
+    TAG_MSGPACK = ord('m')
+    RAW = ord('-')
+    ZLIB = ord('z')
+
+    def __init__(self, fmt: Optional[str] = None, compress_threshold: Optional[int] = None,
+                 compress_level: Optional[int] = None):
+        fmt = fmt or settings.REDIS_CODEC
+        if fmt == 'msgpack' and msgpack is None:
+            logger.warning("未安装msgpack，Redis编码使用json")
+            fmt = 'json'
+        self.format = fmt
+        self.compress_threshold = (settings.REDIS_COMPRESS_THRESHOLD
+                                   if compress_threshold is None else compress_threshold)
+        self.compress_level = settings.REDIS_COMPRESS_LEVEL if compress_level is None else compress_level
+        self.counters = {'encoded': 0, 'compressed': 0, 'bytes_in': 0, 'bytes_out': 0, 'legacy_reads': 0}
+
+    def _dump(self, value: Any) -> tuple:
+        """序列化结构化数据，返回(类型标记, 数据)"""
+        if self.format == 'msgpack':
+            return self.TAG_MSGPACK, msgpack.packb(value, use_bin_type=True)
+        if orjson is not None:
+            return self.TAG_JSON, orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        return self.TAG_JSON, json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+    def encode(self, value: Any) -> bytes:
+        """编码值"""
+        if isinstance(value, str):
+            tag, payload = self.TAG_STR, value.encode('utf-8')
+        elif isinstance(value, (bytes, bytearray)):
+            tag, payload = self.TAG_BYTES, bytes(value)
+        else:
+            tag, payload = self._dump(value)
+
+        compression = self.RAW
+        if self.compress_threshold and len(payload) >= self.compress_threshold:
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < len(payload):
+                compression, payload = self.ZLIB, compressed
+                self.counters['compressed'] += 1
+
+        data = bytes((tag, compression)) + payload
+        self.counters['encoded'] += 1
+        self.counters['bytes_out'] += len(data)
+        return data
+
+    def decode(self, data: Optional[bytes]) -> Any:
+        """解码值"""
+        if data is None:
+            return None
+        self.counters['bytes_in'] += len(data)
+
+        if len(data) < 2 or data[1] not in (self.RAW, self.ZLIB) or \
+                data[0] not in (self.TAG_STR, self.TAG_BYTES, self.TAG_JSON, self.TAG_MSGPACK):
+            return self._decode_legacy(data)
+
+        tag, payload = data[0], data[2:]
+        if data[1] == self.ZLIB:
+            payload = zlib.decompress(payload)
+
+        if tag == self.TAG_STR:
+            return payload.decode('utf-8')
+        if tag == self.TAG_BYTES:
+            return payload
+        if tag == self.TAG_MSGPACK:
+            if msgpack is None:
+                raise ValueError("读取msgpack编码的数据需要安装msgpack")
+            return msgpack.unpackb(payload, raw=False)
+        return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+    def _decode_legacy(self, data: bytes) -> Any:
+        """解析引入编码头部之前写入的数据"""
+        self.counters['legacy_reads'] += 1
+        value = data.decode('utf-8')
+        try:
+            return json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return value
+
+    def stats(self) -> Dict[str, Any]:
+        """编解码统计"""
+        return {'format': self.format, 'compress_threshold': self.compress_threshold, **self.counters}
+
+
+class RedisBatch:
+    """
+    批量命令：在管道中排队，退出上下文时一次发送
+
+    值的编码与RedisManager的单键接口一致；执行后results按顺序保存各命令的结果
+    """
+
+    def __init__(self, pipe, codec: RedisCodec):
+        self.pipe = pipe
+        self.codec = codec
+        self._decoders: List[Optional[Callable[[Any], Any]]] = []
+        self.results: List[Any] = []
+
+    def _queue(self, command, *args, decoder: Optional[Callable[[Any], Any]] = None, **kwargs):
+        command(*args, **kwargs)
+        self._decoders.append(decoder)
+        return self
+
+    def set(self, key: str, value: Any, expire: Optional[int] = None):
+        return self._queue(self.pipe.set, key, self.codec.encode(value), ex=expire)
+
+    def get(self, key: str):
+        return self._queue(self.pipe.get, key, decoder=self.codec.decode)
+
+    def delete(self, *keys: str):
+        return self._queue(self.pipe.delete, *keys)
+
+    def expire(self, key: str, seconds: int):
+        return self._queue(self.pipe.expire, key, seconds)
+
+    def incr(self, key: str, amount: int = 1):
+        return self._queue(self.pipe.incrby, key, amount)
+
+    def hset(self, name: str, key: str, value: Any):
+        return self._queue(self.pipe.hset, name, key, self.codec.encode(value))
+
+    def hmset(self, name: str, mapping: Dict[str, Any]):
+        encoded = {key: self.codec.encode(value) for key, value in mapping.items()}
+        return self._queue(self.pipe.hset, name, mapping=encoded)
+
+    def hincrby(self, name: str, key: str, amount: int = 1):
+        return self._queue(self.pipe.hincrby, name, key, amount)
+
+    def lpush(self, key: str, *values):
+        return self._queue(self.pipe.lpush, key, *(self.codec.encode(value) for value in values))
+
+    def publish(self, channel: str, message: Any):
+        # 订阅方按JSON文本解析，不经过编解码器
+        if isinstance(message, (dict, list)):
+            message = json.dumps(message, ensure_ascii=False)
+        return self._queue(self.pipe.publish, channel, message)
+
+    async def execute(self) -> List[Any]:
+        """发送排队的命令并解码结果"""
+        try:
+            with REDIS_LATENCY.time(command='pipeline'):
+                results = await self.pipe.execute()
+        except Exception:
+            REDIS_ERRORS.inc(command='pipeline')
+            raise
+        self.results = [decoder(result) if decoder else result
+                        for decoder, result in zip(self._decoders, results)]
+        self._decoders = []
+        return self.results
 
 
 class RedisManager:
-    """Redis管理器"""
+    """
+    Redis管理器
+
+    redis_client: 文本连接，供队列、发布订阅等直接使用Redis命令的模块使用
+    binary_client: 二进制连接，set/get/哈希/列表等值接口经编解码器读写
+    """
     
-    def __init__(self):
+    def __init__(self, codec: Optional[RedisCodec] = None):
         self.redis_client: Optional[redis.Redis] = None
+        self.binary_client: Optional[redis.Redis] = None
+        self.codec = codec or RedisCodec()
     
     async def initialize(self):
         """初始化Redis连接"""
         try:
-            self.redis_client = redis.from_url(
-                settings.redis_url,
-                encoding="utf-8",
-                decode_responses=True,
+            options = dict(
                 socket_connect_timeout=5,
                 socket_timeout=5,
                 retry_on_timeout=True,
                 health_check_interval=30
             )
+            self.redis_client = redis.from_url(
+                settings.redis_url,
+                encoding="utf-8",
+                decode_responses=True,
+                **options
+            )
+            self.binary_client = redis.from_url(settings.redis_url, **options)
             
             # 测试连接
             await self.redis_client.ping()
-            logger.info("Redis连接初始化成功")
+            await self.binary_client.ping()
+            logger.info(f"Redis连接初始化成功 (编码: {self.codec.format})")
             
         except Exception as e:
             logger.error(f"Redis连接初始化失败: {e}")
@@ -40,159 +224,206 @@ class RedisManager:
     
     async def close(self):
         """关闭Redis连接"""
+        if self.binary_client:
+            await self.binary_client.close()
         if self.redis_client:
             await self.redis_client.close()
             logger.info("Redis连接已关闭")
     
+    @REDIS_LATENCY.time(command='set')
     async def set(self, key: str, value: Any, expire: Optional[int] = None) -> bool:
         """设置键值对"""
         try:
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value, ensure_ascii=False)
-            elif not isinstance(value, str):
-                value = str(value)
-            
-            result = await self.redis_client.set(key, value, ex=expire)
+            result = await self.binary_client.set(key, self.codec.encode(value), ex=expire)
             return result
         except Exception as e:
+            REDIS_ERRORS.inc(command='set')
             logger.error(f"Redis设置失败 - Key: {key}, Error: {e}")
             return False
     
+    @REDIS_LATENCY.time(command='get')
     async def get(self, key: str) -> Optional[Any]:
         """获取值"""
         try:
-            value = await self.redis_client.get(key)
-            if value is None:
-                return None
-            
-            # 尝试解析JSON
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
-                
+            return self.codec.decode(await self.binary_client.get(key))
         except Exception as e:
+            REDIS_ERRORS.inc(command='get')
             logger.error(f"Redis获取失败 - Key: {key}, Error: {e}")
             return None
     
+    @REDIS_LATENCY.time(command='mget')
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """一次读取多个键，按顺序返回值，不存在的键返回None"""
+        if not keys:
+            return []
+        try:
+            values = await self.binary_client.mget(keys)
+            return [self.codec.decode(value) for value in values]
+        except Exception as e:
+            REDIS_ERRORS.inc(command='mget')
+            logger.error(f"Redis批量获取失败 - Keys: {len(keys)}, Error: {e}")
+            return [None] * len(keys)
+    
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[RedisBatch]:
+        """
+        批量执行命令，退出上下文时一次往返发送全部命令
+        
+        transaction为True时以MULTI/EXEC原子执行；执行失败时抛出异常
+        """
+        async with self.binary_client.pipeline(transaction=transaction) as pipe:
+            batch = RedisBatch(pipe, self.codec)
+            yield batch
+            await batch.execute()
+    
+    async def mset(self, mapping: Dict[str, Any], expire: Optional[int] = None) -> bool:
+        """一次写入多个键值对，可统一设置过期时间"""
+        if not mapping:
+            return True
+        try:
+            async with self.pipeline() as pipe:
+                for key, value in mapping.items():
+                    pipe.set(key, value, expire=expire)
+            return all(pipe.results)
+        except Exception as e:
+            logger.error(f"Redis批量设置失败 - Keys: {len(mapping)}, Error: {e}")
+            return False
+    
+    async def hmset(self, name: str, mapping: Dict[str, Any]) -> bool:
+        """一次设置多个哈希字段"""
+        if not mapping:
+            return True
+        try:
+            async with self.pipeline() as pipe:
+                pipe.hmset(name, mapping)
+            return True
+        except Exception as e:
+            logger.error(f"Redis哈希批量设置失败 - Name: {name}, Error: {e}")
+            return False
+    
+    @REDIS_LATENCY.time(command='counters')
+    async def counters(self, name: str) -> Dict[str, int]:
+        """读取由hincrby累加的计数哈希"""
+        try:
+            result = await self.redis_client.hgetall(name)
+            return {key: int(value) for key, value in result.items()}
+        except Exception as e:
+            REDIS_ERRORS.inc(command='counters')
+            logger.error(f"Redis计数获取失败 - Name: {name}, Error: {e}")
+            return {}
+    
+    @REDIS_LATENCY.time(command='delete')
     async def delete(self, key: str) -> bool:
         """删除键"""
         try:
             result = await self.redis_client.delete(key)
             return result > 0
         except Exception as e:
+            REDIS_ERRORS.inc(command='delete')
             logger.error(f"Redis删除失败 - Key: {key}, Error: {e}")
             return False
     
+    @REDIS_LATENCY.time(command='exists')
     async def exists(self, key: str) -> bool:
         """检查键是否存在"""
         try:
             result = await self.redis_client.exists(key)
             return result > 0
         except Exception as e:
+            REDIS_ERRORS.inc(command='exists')
             logger.error(f"Redis检查存在失败 - Key: {key}, Error: {e}")
             return False
     
+    @REDIS_LATENCY.time(command='expire')
     async def expire(self, key: str, seconds: int) -> bool:
         """设置过期时间"""
         try:
             result = await self.redis_client.expire(key, seconds)
             return result
         except Exception as e:
+            REDIS_ERRORS.inc(command='expire')
             logger.error(f"Redis设置过期时间失败 - Key: {key}, Error: {e}")
             return False
     
+    @REDIS_LATENCY.time(command='incr')
     async def incr(self, key: str, amount: int = 1) -> Optional[int]:
         """递增"""
         try:
             result = await self.redis_client.incrby(key, amount)
             return result
         except Exception as e:
+            REDIS_ERRORS.inc(command='incr')
             logger.error(f"Redis递增失败 - Key: {key}, Error: {e}")
             return None
     
+    @REDIS_LATENCY.time(command='hset')
     async def hset(self, name: str, key: str, value: Any) -> bool:
         """设置哈希字段"""
         try:
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value, ensure_ascii=False)
-            elif not isinstance(value, str):
-                value = str(value)
-            
-            result = await self.redis_client.hset(name, key, value)
+            result = await self.binary_client.hset(name, key, self.codec.encode(value))
             return result
         except Exception as e:
+            REDIS_ERRORS.inc(command='hset')
             logger.error(f"Redis哈希设置失败 - Name: {name}, Key: {key}, Error: {e}")
             return False
     
+    @REDIS_LATENCY.time(command='hget')
     async def hget(self, name: str, key: str) -> Optional[Any]:
         """获取哈希字段值"""
         try:
-            value = await self.redis_client.hget(name, key)
-            if value is None:
-                return None
-            
-            # 尝试解析JSON
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
-                
+            return self.codec.decode(await self.binary_client.hget(name, key))
         except Exception as e:
+            REDIS_ERRORS.inc(command='hget')
             logger.error(f"Redis哈希获取失败 - Name: {name}, Key: {key}, Error: {e}")
             return None
     
+    @REDIS_LATENCY.time(command='hgetall')
     async def hgetall(self, name: str) -> dict:
         """获取哈希所有字段"""
         try:
-            result = await self.redis_client.hgetall(name)
-            
-            # 尝试解析JSON值
-            parsed_result = {}
-            for key, value in result.items():
-                try:
-                    parsed_result[key] = json.loads(value)
-                except (json.JSONDecodeError, TypeError):
-                    parsed_result[key] = value
-            
-            return parsed_result
+            result = await self.binary_client.hgetall(name)
+            return {key.decode('utf-8'): self.codec.decode(value) for key, value in result.items()}
         except Exception as e:
+            REDIS_ERRORS.inc(command='hgetall')
             logger.error(f"Redis哈希获取全部失败 - Name: {name}, Error: {e}")
             return {}
     
+    @REDIS_LATENCY.time(command='lpush')
     async def lpush(self, key: str, *values) -> Optional[int]:
         """列表左推"""
         try:
-            # 序列化复杂对象
-            serialized_values = []
-            for value in values:
-                if isinstance(value, (dict, list)):
-                    serialized_values.append(json.dumps(value, ensure_ascii=False))
-                else:
-                    serialized_values.append(str(value))
-            
-            result = await self.redis_client.lpush(key, *serialized_values)
+            result = await self.binary_client.lpush(key, *(self.codec.encode(value) for value in values))
             return result
         except Exception as e:
+            REDIS_ERRORS.inc(command='lpush')
             logger.error(f"Redis列表推入失败 - Key: {key}, Error: {e}")
             return None
     
+    @REDIS_LATENCY.time(command='rpop')
     async def rpop(self, key: str) -> Optional[Any]:
         """列表右弹"""
         try:
-            value = await self.redis_client.rpop(key)
-            if value is None:
-                return None
-            
-            # 尝试解析JSON
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
-                
+            return self.codec.decode(await self.binary_client.rpop(key))
         except Exception as e:
+            REDIS_ERRORS.inc(command='rpop')
             logger.error(f"Redis列表弹出失败 - Key: {key}, Error: {e}")
             return None
+    
+    @REDIS_LATENCY.time(command='publish')
+    async def publish(self, channel: str, message: Any) -> Optional[int]:
+        """发布消息，返回收到消息的订阅者数量（订阅方按JSON文本解析）"""
+        try:
+            if isinstance(message, (dict, list)):
+                message = json.dumps(message, ensure_ascii=False)
+            elif not isinstance(message, str):
+                message = str(message)
+            
+            result = await self.redis_client.publish(channel, message)
+            return result
+        except Exception as e:
+            REDIS_ERRORS.inc(command='publish')
+            logger.error(f"Redis发布消息失败 - Channel: {channel}, Error: {e}")
+            return None
 
 
 # 全局Redis管理器实例
@@ -0,0 +1,306 @@
+"""
+链路追踪
+按任务记录生成流程各阶段的耗时（span），兼容W3C traceparent，可选以OTLP/HTTP JSON格式导出
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+
+_TRACEPARENT = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# 当前协程所在的span
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """解析W3C traceparent，返回(trace_id, parent_span_id)，格式无效时返回None"""
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if not match:
+        return None
+    version, trace_id, span_id, _ = match.groups()
+    if version == 'ff' or trace_id == '0' * 32 or span_id == '0' * 16:
+        return None
+    return trace_id, span_id
+
+
+class Span:
+    """一个阶段的耗时记录"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'task_id',
+                 'start', 'end', 'attributes', 'status', 'error')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], task_id: Optional[str],
+                 start: Optional[float] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.task_id = task_id
+        self.start = time.time() if start is None else start
+        self.end: Optional[float] = None
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return ((self.end or time.time()) - self.start)
+
+    @property
+    def traceparent(self) -> str:
+        """供下游继续追踪的traceparent"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'end': self.end,
+            'duration': round(self.duration, 6),
+            'attributes': self.attributes,
+            'status': self.status,
+            'error': self.error
+        }
+
+
+class OTLPExporter:
+    """
+    OTLP/HTTP JSON导出器
+
+    span结束后先进入缓冲区，后台按interval秒或batch_size条批量发送到endpoint（如 http://collector:4318/v1/traces）
+    """
+
+    def __init__(self, endpoint: str, service_name: Optional[str] = None,
+                 batch_size: int = 256, interval: float = 5.0, max_buffer: int = 10000):
+        self.endpoint = endpoint
+        self.service_name = service_name or settings.TRACING_SERVICE_NAME
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_buffer = max_buffer
+        self._buffer: List[Span] = []
+        self._task: Optional[asyncio.Task] = None
+        self._client = None
+        self.counters = {'exported': 0, 'dropped': 0, 'failures': 0}
+
+    def export(self, span: Span):
+        if len(self._buffer) >= self.max_buffer:
+            # 收集端不可用时丢弃最旧的span，避免内存无限增长
+            self._buffer.pop(0)
+            self.counters['dropped'] += 1
+        self._buffer.append(span)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {'key': key, 'value': {'boolValue': value}}
+        if isinstance(value, int):
+            return {'key': key, 'value': {'intValue': str(value)}}
+        if isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+        return {'key': key, 'value': {'stringValue': str(value)}}
+
+    def payload(self, spans: List[Span]) -> Dict[str, Any]:
+        """构建OTLP JSON请求体"""
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': [self._attribute('service.name', self.service_name)]},
+                'scopeSpans': [{
+                    'scope': {'name': 'app.core.tracing'},
+                    'spans': [{
+                        'traceId': span.trace_id,
+                        'spanId': span.span_id,
+                        'parentSpanId': span.parent_id or '',
+                        'name': span.name,
+                        'kind': 1,
+                        'startTimeUnixNano': str(int(span.start * 1e9)),
+                        'endTimeUnixNano': str(int((span.end or span.start) * 1e9)),
+                        'attributes': [self._attribute(key, value) for key, value in
+                                       {**span.attributes, 'task.id': span.task_id or ''}.items()],
+                        'status': {'code': 2, 'message': span.error or ''} if span.status == 'error'
+                        else {'code': 1}
+                    } for span in spans]
+                }]
+            }]
+        }
+
+    async def flush(self):
+        """发送缓冲区中的span"""
+        while self._buffer:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            try:
+                if self._client is None:
+                    import httpx
+                    self._client = httpx.AsyncClient(timeout=10)
+                response = await self._client.post(self.endpoint, json=self.payload(batch))
+                response.raise_for_status()
+                self.counters['exported'] += len(batch)
+            except Exception as e:
+                self.counters['failures'] += 1
+                self.counters['dropped'] += len(batch)
+                logger.warning(f"导出追踪数据失败: {e}")
+                break
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class Tracer:
+    """按任务记录span，最近max_tasks个任务的span保留在内存中"""
+
+    def __init__(self, max_tasks: Optional[int] = None, exporter: Optional[OTLPExporter] = None):
+        self.enabled = settings.TRACING_ENABLED
+        self.max_tasks = settings.TRACE_MAX_TASKS if max_tasks is None else max_tasks
+        self.exporter = exporter
+        # task_id -> (任务的根span, 已结束的span)
+        self._tasks: 'OrderedDict[str, Tuple[Span, List[Span]]]' = OrderedDict()
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        """当前协程所在的span"""
+        return _current_span.get()
+
+    def _new_span(self, name: str, task_id: Optional[str], traceparent: Optional[str],
+                  start: Optional[float], attributes: Dict[str, Any]) -> Span:
+        parent = _current_span.get()
+        if parent is not None and (task_id is None or task_id == parent.task_id):
+            return Span(name, parent.trace_id, parent.span_id, parent.task_id, start, attributes)
+        if task_id in self._tasks:
+            # 同一任务在本进程已有链路时挂到其根span下
+            root = self._tasks[task_id][0]
+            self._tasks.move_to_end(task_id)
+            return Span(name, root.trace_id, root.span_id, task_id, start, attributes)
+        remote = parse_traceparent(traceparent)
+        trace_id, parent_id = remote if remote else (os.urandom(16).hex(), None)
+        span = Span(name, trace_id, parent_id, task_id, start, attributes)
+        if task_id:
+            self._tasks[task_id] = (span, [])
+            while len(self._tasks) > self.max_tasks:
+                self._tasks.popitem(last=False)
+        return span
+
+    @contextmanager
+    def span(self, name: str, task_id: Optional[str] = None, traceparent: Optional[str] = None,
+             **attributes) -> Iterator[Optional[Span]]:
+        """
+        记录一个阶段
+
+        在已有span内调用时作为其子span；否则开始新的链路，traceparent有效时接续上游链路
+        """
+        if not self.enabled:
+            yield None
+            return
+        span = self._new_span(name, task_id, traceparent, None, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except asyncio.CancelledError:
+            span.status = 'cancelled'
+            raise
+        except Exception as e:
+            span.status = 'error'
+            span.error = str(e)
+            raise
+        finally:
+            span.end = time.time()
+            _current_span.reset(token)
+            self._finish(span)
+
+    def record(self, name: str, start: float, end: float, **attributes) -> Optional[Span]:
+        """记录已完成的阶段（如在渲染进程中计时的阶段），作为当前span的子span"""
+        if not self.enabled:
+            return None
+        span = self._new_span(name, None, None, start, attributes)
+        span.end = end
+        self._finish(span)
+        return span
+
+    def _finish(self, span: Span):
+        entry = self._tasks.get(span.task_id) if span.task_id else None
+        if entry is not None:
+            entry[1].append(span)
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def spans(self, task_id: str) -> List[Dict[str, Any]]:
+        """任务在本进程记录的span，按开始时间排序"""
+        entry = self._tasks.get(task_id)
+        if entry is None:
+            return []
+        return [span.to_dict() for span in sorted(entry[1], key=lambda s: s.start)]
+
+    @staticmethod
+    def breakdown(spans: List[Dict[str, Any]]) -> Dict[str, float]:
+        """按阶段名汇总耗时"""
+        totals: Dict[str, float] = {}
+        for span in spans:
+            totals[span['name']] = round(totals.get(span['name'], 0.0) + span['duration'], 6)
+        return totals
+
+    async def persist(self, task_id: str):
+        """把任务的span写入Redis，供其他进程的调试接口查询"""
+        spans = self.spans(task_id)
+        if not spans:
+            return
+        try:
+            redis = await get_redis()
+            await redis.set(f"{settings.TRACE_KEY_PREFIX}:{task_id}", spans, expire=settings.TRACE_TTL)
+        except Exception as e:
+            logger.warning(f"保存追踪数据失败: {task_id} ({e})")
+
+    async def load(self, task_id: str) -> List[Dict[str, Any]]:
+        """读取任务的span：优先本进程内存，其次Redis"""
+        spans = self.spans(task_id)
+        if spans:
+            return spans
+        redis = await get_redis()
+        return await redis.get(f"{settings.TRACE_KEY_PREFIX}:{task_id}") or []
+
+    def start(self):
+        """启动导出器的后台发送"""
+        if self.exporter is not None:
+            self.exporter.start()
+
+    async def close(self):
+        if self.exporter is not None:
+            await self.exporter.close()
+
+
+# 全局追踪器实例
+tracer = Tracer(exporter=OTLPExporter(settings.TRACING_OTLP_ENDPOINT)
+                if settings.TRACING_OTLP_ENDPOINT else None)
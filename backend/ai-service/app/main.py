@@ -15,9 +15,12 @@ from loguru import logger
 
 from app.core.config import settings
 from app.core.database import init_db
+from app.core.metrics import metrics_server
+from app.core.tracing import tracer
 from app.core.redis_client import init_redis
 from app.api.routes import api_router
 from app.services.ai_service import AIService
+from app.services.task_events import task_event_hub
 
 
 @asynccontextmanager
@@ -46,6 +49,11 @@ async def lifespan(app: FastAPI):
     os.makedirs(settings.TEMP_PATH, exist_ok=True)
     logger.info("✅ 存储目录创建完成")
     
+    # 启动指标服务
+    if settings.ENABLE_METRICS:
+        await metrics_server.start()
+    tracer.start()
+    
     logger.info(f"🎉 AI服务启动成功 - 端口: {settings.PORT}")
     
     yield
@@ -54,6 +62,9 @@ async def lifespan(app: FastAPI):
     logger.info("🔄 AI服务关闭中...")
     if hasattr(app.state, 'ai_service'):
         await app.state.ai_service.cleanup()
+    await task_event_hub.close()
+    await metrics_server.stop()
+    await tracer.close()
     logger.info("✅ AI服务关闭完成")
 
 
@@ -0,0 +1,250 @@
+"""
+生成任务准入控制
+根据队列深度和按实测处理耗时估算的出队速率预测排队时间，超过上限时拒绝新任务
+
+使用Redis队列时队列深度是所有副本的总和，出队速率也需按所有副本汇总：
+各副本把完成记录写入Redis的秒级时间桶，并定期读回全局窗口
+"""
+
+import asyncio
+import math
+import os
+import socket
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+
+@dataclass
+class AdmissionDecision:
+    """准入判定结果"""
+    admitted: bool
+    queue_depth: int
+    predicted_wait: float  # 预计排队时间（秒）
+    estimated_time: int  # 预计完成时间（秒），包含处理时间
+    retry_after: int = 0  # 被拒绝时建议的重试间隔（秒）
+    reason: Optional[str] = None
+
+
+@dataclass
+class CompletionWindow:
+    """窗口内的完成记录汇总"""
+    completions: int
+    busy_time: float  # 处理耗时之和（秒）
+    workers: int
+
+
+class RedisCompletionWindow:
+    """
+    多副本共享的完成记录窗口
+
+    {prefix}:completions 秒级时间桶 -> 完成任务数（哈希）
+    {prefix}:busy        秒级时间桶 -> 处理耗时之和（哈希）
+    {prefix}:replicas    副本标识 -> 最近上报时间（有序集合）
+    {prefix}:workers     副本标识 -> 工作线程数（哈希）
+    """
+
+    def __init__(self, redis_client=None, prefix: Optional[str] = None,
+                 replica_id: Optional[str] = None, replica_ttl: Optional[float] = None):
+        self.client = redis_client
+        self.prefix = prefix or settings.ADMISSION_KEY_PREFIX
+        self.replica_id = replica_id or f"{socket.gethostname()}:{os.getpid()}"
+        # 超过该时间未上报的副本不再计入工作线程数
+        self.replica_ttl = replica_ttl or max(settings.ADMISSION_SYNC_INTERVAL * 5, 5)
+        self.completions_key = f"{self.prefix}:completions"
+        self.busy_key = f"{self.prefix}:busy"
+        self.replicas_key = f"{self.prefix}:replicas"
+        self.workers_key = f"{self.prefix}:workers"
+
+    async def _client(self):
+        if self.client is None:
+            redis = await get_redis()
+            self.client = redis.redis_client
+        return self.client
+
+    async def sync(self, completions: List[Tuple[float, float]], workers: int,
+                   window: float, now: float) -> CompletionWindow:
+        """上报本副本的完成记录与工作线程数，返回所有副本在窗口内的汇总"""
+        client = await self._client()
+        async with client.pipeline(transaction=False) as pipe:
+            for finished_at, service_time in completions:
+                bucket = int(finished_at)
+                pipe.hincrby(self.completions_key, bucket, 1)
+                pipe.hincrbyfloat(self.busy_key, bucket, service_time)
+            pipe.zadd(self.replicas_key, {self.replica_id: now})
+            pipe.hset(self.workers_key, self.replica_id, workers)
+            pipe.zremrangebyscore(self.replicas_key, '-inf', now - self.replica_ttl)
+            pipe.zrange(self.replicas_key, 0, -1)
+            pipe.hgetall(self.workers_key)
+            pipe.hgetall(self.completions_key)
+            pipe.hgetall(self.busy_key)
+            replicas, replica_workers, counts, busy = (await pipe.execute())[-4:]
+
+        # 时间桶 b 覆盖 [b, b+1)，整个桶落在窗口外时清理
+        expired = [bucket for bucket in counts if int(bucket) + 1 <= now - window]
+        departed = [replica for replica in replica_workers if replica not in replicas]
+        if expired or departed:
+            async with client.pipeline(transaction=False) as pipe:
+                if expired:
+                    pipe.hdel(self.completions_key, *expired)
+                    pipe.hdel(self.busy_key, *expired)
+                if departed:
+                    pipe.hdel(self.workers_key, *departed)
+                await pipe.execute()
+
+        live = [bucket for bucket in counts if bucket not in expired]
+        return CompletionWindow(
+            completions=sum(int(counts[bucket]) for bucket in live),
+            busy_time=sum(float(busy.get(bucket, 0)) for bucket in live),
+            workers=sum(int(replica_workers[replica]) for replica in replicas
+                        if replica in replica_workers)
+        )
+
+
+class AdmissionController:
+    """准入控制器"""
+
+    def __init__(self, max_depth: Optional[int] = None, wait_slo: Optional[float] = None,
+                 rate_window: Optional[float] = None, workers: Optional[int] = None,
+                 default_service_time: Optional[float] = None,
+                 shared: Optional[RedisCompletionWindow] = None,
+                 sync_interval: Optional[float] = None):
+        self.max_depth = settings.QUEUE_MAX_DEPTH if max_depth is None else max_depth
+        self.wait_slo = settings.QUEUE_WAIT_SLO if wait_slo is None else wait_slo
+        self.rate_window = settings.ADMISSION_RATE_WINDOW if rate_window is None else rate_window
+        self.workers = workers or settings.MAX_CONCURRENT_REQUESTS
+        self.default_service_time = (settings.ADMISSION_DEFAULT_SERVICE_TIME
+                                     if default_service_time is None else default_service_time)
+        self.shared = shared
+        self.sync_interval = sync_interval or settings.ADMISSION_SYNC_INTERVAL
+        # 窗口内的完成时间戳与处理耗时
+        self._completions: deque = deque()
+        # 尚未上报到共享窗口的完成记录，以及最近一次读回的全局汇总
+        self._unpublished: List[Tuple[float, float]] = []
+        self._shared_window: Optional[CompletionWindow] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self.counters = {'admitted': 0, 'rejected_depth': 0, 'rejected_slo': 0}
+
+    async def start(self):
+        """使用共享窗口时立即汇总一次并启动定期同步"""
+        if self.shared is None or self._sync_task is not None:
+            return
+        await self.sync()
+        self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def close(self):
+        """停止定期同步"""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+
+    def record_completion(self, service_time: float, now: Optional[float] = None):
+        """记录一个任务处理完成（成功或失败）"""
+        now = time.time() if now is None else now
+        self._completions.append((now, service_time))
+        if self.shared is not None:
+            self._unpublished.append((now, service_time))
+        self._expire(now)
+
+    def _expire(self, now: float):
+        while self._completions and self._completions[0][0] < now - self.rate_window:
+            self._completions.popleft()
+
+    async def sync(self, now: Optional[float] = None):
+        """上报本副本的完成记录并读回所有副本的汇总，失败时保留记录下次重试"""
+        if self.shared is None:
+            return
+        now = time.time() if now is None else now
+        pending, self._unpublished = self._unpublished, []
+        try:
+            self._shared_window = await self.shared.sync(pending, self.workers, self.rate_window, now)
+        except Exception as e:
+            self._unpublished = pending + self._unpublished
+            logger.warning(f"同步准入控制窗口失败: {e}")
+
+    async def _sync_loop(self):
+        while True:
+            try:
+                await asyncio.sleep(self.sync_interval)
+                await self.sync()
+            except asyncio.CancelledError:
+                break
+
+    def window(self, now: Optional[float] = None) -> CompletionWindow:
+        """用于估算的完成记录：有共享汇总时使用全局窗口，否则使用本进程窗口"""
+        if self._shared_window is not None:
+            return self._shared_window
+        now = time.time() if now is None else now
+        self._expire(now)
+        return CompletionWindow(
+            completions=len(self._completions),
+            busy_time=sum(duration for _, duration in self._completions),
+            workers=self.workers
+        )
+
+    def service_time(self, now: Optional[float] = None) -> float:
+        """窗口内的平均处理耗时，无样本时使用默认值"""
+        window = self.window(now)
+        if not window.completions:
+            return self.default_service_time
+        return window.busy_time / window.completions
+
+    def drain_rate(self, now: Optional[float] = None) -> float:
+        """出队速率（任务/秒）
+
+        按工作线程数和平均处理耗时估算处理能力；负载较低时窗口内的完成速率只反映到达速率，
+        因此只在其更高时（如处理耗时波动）采用实测速率
+        """
+        window = self.window(now)
+        capacity = window.workers / max(self.service_time(now), 1e-3)
+        return max(capacity, window.completions / self.rate_window)
+
+    def check(self, queue_depth: int, now: Optional[float] = None) -> AdmissionDecision:
+        """判断新任务能否进入队列"""
+        rate = self.drain_rate(now)
+        predicted_wait = (queue_depth + 1) / rate
+        estimated_time = math.ceil(predicted_wait + self.service_time(now))
+
+        if queue_depth >= self.max_depth:
+            self.counters['rejected_depth'] += 1
+            excess = queue_depth - self.max_depth + 1
+            return AdmissionDecision(False, queue_depth, predicted_wait, estimated_time,
+                                     self._retry_after(excess / rate), 'queue_full')
+
+        if predicted_wait > self.wait_slo:
+            self.counters['rejected_slo'] += 1
+            return AdmissionDecision(False, queue_depth, predicted_wait, estimated_time,
+                                     self._retry_after(predicted_wait - self.wait_slo), 'wait_slo')
+
+        self.counters['admitted'] += 1
+        return AdmissionDecision(True, queue_depth, predicted_wait, estimated_time)
+
+    @staticmethod
+    def _retry_after(seconds: float) -> int:
+        return max(math.ceil(seconds), 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """准入统计"""
+        return {
+            **self.counters,
+            'max_depth': self.max_depth,
+            'wait_slo': self.wait_slo,
+            'shared': self.shared is not None,
+            'workers': self.window().workers,
+            'drain_rate': round(self.drain_rate(), 3),
+            'service_time': round(self.service_time(), 3)
+        }
+
+
+def create_admission_controller() -> AdmissionController:
+    """根据配置创建准入控制器，Redis队列由多个副本共同消费，出队速率按全局窗口统计"""
+    if settings.QUEUE_BACKEND == 'redis':
+        return AdmissionController(shared=RedisCompletionWindow())
+    return AdmissionController()
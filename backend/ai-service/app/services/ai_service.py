@@ -8,13 +8,93 @@ import time
 from typing import Dict, Any, Optional, List
 from loguru import logger
 import google.generativeai as genai
-from PIL import Image, ImageDraw, ImageFont
-import io
-import os
 
 from app.core.config import settings
-from app.core.database import get_db
-from app.core.redis_client import get_redis
+from app.core.tracing import tracer
+from app.core.metrics import (
+    QUEUE_DEPTH, QUEUE_WAIT, STATUS_UPDATE_LATENCY, STATUS_UPDATES, TASK_LATENCY,
+    TASK_PROCESSING, registry as metrics_registry
+)
+from app.services.batcher import BatchItemError, MicroBatcher
+from app.services.admission import create_admission_controller
+from app.services.asset_cache import element_cache
+from app.services.font_registry import font_registry
+from app.services.json_extract import json_extractor
+from app.services.render_executor import RenderExecutor
+from app.services.renderer import RenderJob, RenderResult
+from app.services.model_guard import ModelGuard
+from app.services.result_cache import ResultCache
+from app.services.streaming import StreamingJSONScanner, stream_model_text
+from app.services.status_writer import TaskStatusWriter
+from app.services.task_queue import create_task_queue
+
+
+# 模拟模式与模型不可用时使用的预设口号
+DEFAULT_SLOGANS = [
+    {"type": "简短有力", "text": "樊振东必胜！"},
+    {"type": "朗朗上口", "text": "东哥威武，球技超群！"},
+    {"type": "押韵节拍", "text": "樊振东，真英雄，乒乓场上显神通！"},
+    {"type": "激励鼓舞", "text": "永不放弃，勇往直前，樊振东加油！"},
+    {"type": "胜利祝愿", "text": "愿你每球都精彩，每赛都夺冠！"}
+]
+
+# 口号生成要求，单个与批量提示词共用
+SLOGAN_REQUIREMENTS = """
+            请生成5个不同风格的应援口号，每个口号包含：
+            1. 口号文字内容
+            2. 视觉呈现建议
+            3. 推荐配图元素
+            4. 排版样式建议
+
+            口号类型：
+            1. 简短有力型（4-8字）
+            2. 朗朗上口型（8-16字）
+            3. 押韵节拍型
+            4. 激励鼓舞型
+            5. 胜利祝愿型
+
+            视觉元素选项：
+            - 樊振东元素：fzd-portrait, fzd-silhouette
+            - 乒乓球元素：ping-pong-ball, paddle, table-tennis-table
+            - 荣誉元素：gold-trophy, medal
+            - 装饰元素：star, crown, lightning, ribbon
+            - 气泡样式：round-bubble, thought-bubble, shout-bubble"""
+
+SLOGAN_ITEM_SCHEMA = """
+                    {
+                        "type": "简短有力",
+                        "text": "口号内容",
+                        "visualStyle": {
+                            "presentationType": "card",
+                            "backgroundColor": "#FF0000",
+                            "textColor": "#FFFFFF",
+                            "fontSize": "large",
+                            "fontWeight": "bold",
+                            "elements": ["star", "lightning"],
+                            "layout": "center",
+                            "effects": ["glow", "shadow"]
+                        },
+                        "description": "适用场景说明"
+                    }
+                """
+
+
+def is_valid_banner_design(data: Dict[str, Any]) -> bool:
+    """横幅设计方案至少要有非空的主标题"""
+    title = data.get('mainTitle')
+    return isinstance(title, str) and bool(title.strip())
+
+
+def is_valid_slogans(data: Dict[str, Any]) -> bool:
+    """口号结果需包含非空的口号列表，且每条口号都有文本"""
+    slogans = data.get('slogans')
+    return (isinstance(slogans, list) and bool(slogans)
+            and all(isinstance(slogan, dict) and slogan.get('text') for slogan in slogans))
+
+
+def is_valid_slogan_batch(data: Dict[str, Any]) -> bool:
+    """批量口号结果需包含results列表"""
+    return isinstance(data.get('results'), list)
 
 
 class AIService:
@@ -23,8 +103,19 @@ class AIService:
     def __init__(self):
         self.gemini_model = None
         self.is_initialized = False
-        self.generation_queue = asyncio.Queue()
+        self.generation_queue = create_task_queue()
         self.worker_tasks = []
+        self.render_executor = RenderExecutor()
+        self.status_writer = TaskStatusWriter()
+        self.admission = create_admission_controller()
+        self.result_cache = ResultCache()
+        self.model_guard = ModelGuard()
+        self.slogan_batcher = MicroBatcher(
+            self._generate_slogan_batch,
+            window=settings.SLOGAN_BATCH_WINDOW,
+            max_batch_size=settings.SLOGAN_BATCH_MAX_SIZE,
+            name='slogan'
+        )
         
     async def initialize(self):
         """初始化AI服务"""
@@ -37,6 +128,19 @@ class AIService:
             else:
                 logger.warning("未配置Gemini API密钥，将使用模拟模式")
             
+            # 索引视觉元素素材、加载字体并启动渲染进程池
+            element_cache.build_index()
+            font_registry.load()
+            self.render_executor.start()
+            
+            # 启动任务状态批量写入
+            self.status_writer.start()
+            
+            # 启动生成任务队列
+            await self.generation_queue.start()
+            await self.admission.start()
+            metrics_registry.add_collector(self._collect_metrics)
+            
             # 启动工作线程
             for i in range(settings.MAX_CONCURRENT_REQUESTS):
                 task = asyncio.create_task(self._generation_worker(f"worker-{i}"))
@@ -63,78 +167,171 @@ class AIService:
         if self.worker_tasks:
             await asyncio.gather(*self.worker_tasks, return_exceptions=True)
         
+        # 关闭生成任务队列
+        metrics_registry.remove_collector(self._collect_metrics)
+        await self.generation_queue.close()
+        await self.admission.close()
+        
+        # 处理剩余的批量口号请求
+        await self.slogan_batcher.close()
+        self.model_guard.close()
+        
+        # 关闭渲染进程池
+        await self.render_executor.shutdown()
+        
+        # 写出缓冲中的任务状态
+        await self.status_writer.close()
+        
         logger.info("AI服务清理完成")
     
     async def generate_content(self, task_id: str, generation_type: str, 
-                             prompt: str, parameters: Dict[str, Any]) -> Dict[str, Any]:
-        """生成内容的主入口"""
-        try:
-            # 将任务加入队列
-            task_data = {
-                'task_id': task_id,
-                'type': generation_type,
-                'prompt': prompt,
-                'parameters': parameters,
-                'created_at': time.time()
-            }
+                             prompt: str, parameters: Dict[str, Any],
+                             user_id: Optional[str] = None,
+                             traceparent: Optional[str] = None) -> Dict[str, Any]:
+        """生成内容的主入口，traceparent为上游传入的W3C追踪上下文"""
+        with tracer.span('enqueue', task_id=task_id, traceparent=traceparent,
+                         type=generation_type) as span:
+            try:
+                # 相同内容已生成过时直接完成任务
+                cached = await self.result_cache.get(
+                    self.result_cache.key(generation_type, prompt, parameters)
+                )
+                if cached is not None:
+                    await self._update_task_status(task_id, 'completed', 100, cached)
+                    logger.info(f"任务命中结果缓存: {task_id}")
+                    return {
+                        'status': 'completed',
+                        'task_id': task_id,
+                        'estimated_time': 0,
+                        'cached': True,
+                        'message': '任务已完成（命中结果缓存）'
+                    }
+
+                # 准入控制：预计排队时间过长时直接拒绝，保护已入队任务的延迟
+                decision = self.admission.check(await self.generation_queue.size())
+                if not decision.admitted:
+                    logger.warning(f"任务被拒绝: {task_id} ({decision.reason}, 队列深度{decision.queue_depth})")
+                    return {
+                        'status': 'rejected',
+                        'task_id': task_id,
+                        'reason': decision.reason,
+                        'retry_after': decision.retry_after,
+                        'message': '生成队列繁忙，请稍后重试'
+                    }
+
+                # 将任务加入队列
+                task_data = {
+                    'task_id': task_id,
+                    'type': generation_type,
+                    'prompt': prompt,
+                    'parameters': parameters,
+                    'user_id': user_id,
+                    'created_at': time.time(),
+                    # 工作线程（可能在其他进程）据此接续同一条链路
+                    'traceparent': span.traceparent if span else traceparent
+                }
             
-            await self.generation_queue.put(task_data)
-            logger.info(f"任务已加入队列: {task_id}")
+                await self.generation_queue.put(task_data)
+                logger.info(f"任务已加入队列: {task_id}")
             
-            return {
-                'status': 'queued',
-                'task_id': task_id,
-                'message': '任务已加入生成队列'
-            }
+                return {
+                    'status': 'queued',
+                    'task_id': task_id,
+                    'estimated_time': decision.estimated_time,
+                    'message': '任务已加入生成队列'
+                }
             
-        except Exception as e:
-            logger.error(f"生成内容失败: {e}")
-            return {
-                'status': 'error',
-                'task_id': task_id,
-                'error': str(e)
-            }
+            except Exception as e:
+                logger.error(f"生成内容失败: {e}")
+                return {
+                    'status': 'error',
+                    'task_id': task_id,
+                    'error': str(e)
+                }
     
     async def _generation_worker(self, worker_name: str):
         """生成工作线程"""
         logger.info(f"工作线程 {worker_name} 启动")
         
         while True:
+            task_data = None
             try:
                 # 从队列获取任务
                 task_data = await self.generation_queue.get()
                 task_id = task_data['task_id']
+                started_at = time.time()
+                QUEUE_WAIT.observe(max(started_at - task_data.get('created_at', started_at), 0),
+                                   type=task_data['type'])
                 
-                logger.info(f"工作线程 {worker_name} 开始处理任务: {task_id}")
+                with tracer.span('process', task_id=task_id, traceparent=task_data.get('traceparent'),
+                                 type=task_data['type'], worker=worker_name):
+                    tracer.record('queue_wait', task_data.get('created_at', started_at), started_at)
+                    logger.info(f"工作线程 {worker_name} 开始处理任务: {task_id}")
                 
-                # 更新任务状态为处理中
-                await self._update_task_status(task_id, 'processing', 10)
+                    # 更新任务状态为处理中
+                    await self._update_task_status(task_id, 'processing', 10)
                 
-                # 根据类型调用相应的生成方法
-                if task_data['type'] == 'banner':
-                    result = await self._generate_banner(task_data)
-                elif task_data['type'] == 'slogan':
-                    result = await self._generate_slogan(task_data)
-                elif task_data['type'] == 'emoji':
-                    result = await self._generate_emoji(task_data)
-                else:
-                    raise ValueError(f"不支持的生成类型: {task_data['type']}")
+                    # 相同内容正在生成或已有缓存时复用结果
+                    cache_key = self.result_cache.key(
+                        task_data['type'], task_data['prompt'], task_data['parameters']
+                    )
+                    result = await self.result_cache.get_or_generate(
+                        cache_key, lambda: self._generate(task_data)
+                    )
                 
-                # 更新任务状态为完成
-                await self._update_task_status(task_id, 'completed', 100, result)
+                    # 更新任务状态为完成
+                    await self._update_task_status(task_id, 'completed', 100, result)
                 
-                logger.info(f"工作线程 {worker_name} 完成任务: {task_id}")
+                    logger.info(f"工作线程 {worker_name} 完成任务: {task_id}")
+                
+                await self.generation_queue.ack(task_data)
+                self.admission.record_completion(time.time() - started_at)
+                self._observe_task(task_data, started_at, 'completed')
+                await tracer.persist(task_id)
                 
             except asyncio.CancelledError:
                 logger.info(f"工作线程 {worker_name} 被取消")
+                # 未完成的任务交还队列，以便其他进程重新处理
+                if task_data is not None:
+                    await self.generation_queue.nack(task_data)
                 break
             except Exception as e:
                 logger.error(f"工作线程 {worker_name} 处理任务时出错: {e}")
-                if 'task_id' in locals():
-                    await self._update_task_status(task_id, 'failed', 0, {'error': str(e)})
-            finally:
-                if 'task_data' in locals():
-                    self.generation_queue.task_done()
+                if task_data is not None:
+                    await self._update_task_status(task_data['task_id'], 'failed', 0, {'error': str(e)})
+                    await self.generation_queue.ack(task_data)
+                    self.admission.record_completion(time.time() - started_at)
+                    self._observe_task(task_data, started_at, 'failed')
+                    await tracer.persist(task_data['task_id'])
+                else:
+                    # 队列暂不可用时稍后重试，避免空转
+                    await asyncio.sleep(1)
+    
+    @staticmethod
+    def _observe_task(task_data: Dict[str, Any], started_at: float, status: str):
+        """记录任务处理耗时与端到端耗时"""
+        finished_at = time.time()
+        task_type = task_data.get('type', 'unknown')
+        TASK_PROCESSING.observe(finished_at - started_at, type=task_type, status=status)
+        TASK_LATENCY.observe(finished_at - task_data.get('created_at', started_at),
+                             type=task_type, status=status)
+
+    async def _collect_metrics(self):
+        """输出指标前刷新各车道的队列深度"""
+        for lane, depth in (await self.generation_queue.lane_depths()).items():
+            QUEUE_DEPTH.set(depth, lane=lane)
+
+    async def _generate(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
+        """根据类型调用相应的生成方法"""
+        with tracer.span('generate', type=task_data['type']):
+            if task_data['type'] == 'banner':
+                return await self._generate_banner(task_data)
+            elif task_data['type'] == 'slogan':
+                return await self._generate_slogan(task_data)
+            elif task_data['type'] == 'emoji':
+                return await self._generate_emoji(task_data)
+            else:
+                raise ValueError(f"不支持的生成类型: {task_data['type']}")
     
     async def _generate_banner(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         """生成应援横幅"""
@@ -148,6 +345,7 @@ class AIService:
         await self._update_task_status(task_id, 'processing', 30)
 
         # 生成横幅设计方案
+        fallback = False
         if self.gemini_model:
             # 使用真实的Gemini API生成完整设计方案
             enhanced_prompt = f"""
@@ -178,6 +376,7 @@ class AIService:
                - 辅助色
                - 文字颜色
                - 特效颜色
+               - 背景渐变（可选，线性或径向，可包含多个色标）
 
             请以JSON格式返回设计方案：
             {{
@@ -200,7 +399,15 @@ class AIService:
                     "primary": "#FF0000",
                     "secondary": "#FFD700",
                     "textColor": "#FFFFFF",
-                    "effectColor": "#FFA500"
+                    "effectColor": "#FFA500",
+                    "gradient": {{
+                        "type": "linear 或 radial",
+                        "angle": 90,
+                        "stops": [
+                            {{"color": "#FF0000", "position": 0}},
+                            {{"color": "#FFD700", "position": 1}}
+                        ]
+                    }}
                 }},
                 "effects": [
                     {{
@@ -214,21 +421,27 @@ class AIService:
             确保设计方案体现樊振东的特点和球迷的热情支持。
             """
 
-            response = await asyncio.to_thread(
-                self.gemini_model.generate_content, enhanced_prompt
-            )
-
             try:
-                # 解析JSON响应
-                import re
-                json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
-                if json_match:
-                    design_data = json.loads(json_match.group())
+                if settings.MODEL_STREAMING:
+                    # 流式调用会发布部分结果，不做对冲
+                    response_text = await self.model_guard.call(
+                        lambda: self._stream_banner_design(task_id, enhanced_prompt), hedge=False
+                    )
                 else:
-                    raise ValueError("无法解析AI响应")
+                    response_text = await self._call_model(enhanced_prompt)
             except Exception as e:
-                logger.warning(f"解析AI响应失败: {e}，使用默认设计")
+                # 超时、熔断或模型错误时使用默认设计，不占用工作线程等待
+                logger.warning(f"模型调用失败: {e}，使用默认设计")
+                response_text = None
+
+            design_data = None
+            if response_text is not None:
+                design_data = json_extractor.extract(response_text, is_valid_banner_design, 'banner')
+                if design_data is None:
+                    logger.warning("解析AI响应失败，使用默认设计")
+            if design_data is None:
                 design_data = self._get_default_banner_design(prompt)
+                fallback = True
 
         else:
             # 模拟模式
@@ -239,20 +452,23 @@ class AIService:
         await self._update_task_status(task_id, 'processing', 60)
 
         # 生成横幅图片
-        banner_path = await self._create_enhanced_banner_image(
+        banner = await self._create_enhanced_banner_image(
             task_id, design_data, parameters
         )
 
         # 更新进度
         await self._update_task_status(task_id, 'processing', 90)
 
-        return {
+        result = {
             'type': 'banner',
             'content': design_data.get('mainTitle', '樊振东加油！'),
             'design_data': design_data,
-            'image_path': banner_path,
+            **self._image_fields(banner),
             'parameters': parameters
         }
+        if fallback:
+            result['fallback'] = True
+        return result
     
     async def _generate_slogan(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         """生成应援口号"""
@@ -265,93 +481,162 @@ class AIService:
         # 更新进度
         await self._update_task_status(task_id, 'processing', 50)
         
+        fallback = False
         if self.gemini_model:
-            # 使用真实的Gemini API
-            enhanced_prompt = f"""
+            try:
+                if settings.MODEL_STREAMING:
+                    # 流式模式逐条发布口号，不参与批量合并
+                    slogans_data = await self._request_slogans(prompt, task_id)
+                elif self.slogan_batcher.max_batch_size > 1:
+                    try:
+                        # 与同一时间窗口内的其他口号任务合并为一次模型调用
+                        slogans_data = await self.slogan_batcher.submit(prompt)
+                    except BatchItemError as e:
+                        # 只有解析失败的任务单独重试，模型调用本身失败时不重复请求
+                        logger.warning(f"批量口号结果不可用，单独生成: {task_id} ({e})")
+                        slogans_data = await self._request_slogans(prompt)
+                else:
+                    slogans_data = await self._request_slogans(prompt)
+            except Exception as e:
+                # 超时、熔断或模型错误时使用预设口号
+                logger.warning(f"模型调用失败: {e}，使用预设口号")
+                slogans_data = {"slogans": DEFAULT_SLOGANS}
+                fallback = True
+        else:
+            # 模拟模式
+            await asyncio.sleep(2)
+            slogans_data = {"slogans": DEFAULT_SLOGANS}
+        
+        result = {
+            'type': 'slogan',
+            'slogans': slogans_data['slogans'],
+            'parameters': parameters
+        }
+        if fallback:
+            result['fallback'] = True
+        return result
+    
+    async def _call_model(self, prompt: str) -> str:
+        """调用Gemini模型并返回响应文本，受截止时间与熔断保护"""
+        async def invoke():
+            response = await self.model_guard.run_in_thread(
+                self.gemini_model.generate_content, prompt,
+                request_options=self.model_guard.request_options
+            )
+            return response.text
+        
+        return await self.model_guard.call(invoke)
+    
+    async def _stream_banner_design(self, task_id: str, prompt: str) -> str:
+        """流式生成横幅设计方案，主标题确定后立即发布部分结果"""
+        scanner = StreamingJSONScanner(fields=('mainTitle', 'subTitle'))
+        published = False
+        async for chunk in stream_model_text(self.gemini_model, prompt, self.model_guard.executor,
+                                             self.model_guard.request_options):
+            scanner.feed(chunk)
+            if not published and 'mainTitle' in scanner.found:
+                published = True
+                await self._update_task_status(task_id, 'processing', 40, {
+                    'partial': True,
+                    'type': 'banner',
+                    'design_data': dict(scanner.found)
+                })
+        return scanner.text
+    
+    async def _stream_slogans(self, task_id: str, prompt: str) -> str:
+        """流式生成口号，每条口号的JSON对象完整后立即发布"""
+        scanner = StreamingJSONScanner(array_key='slogans')
+        slogans = []
+        async for chunk in stream_model_text(self.gemini_model, prompt, self.model_guard.executor,
+                                             self.model_guard.request_options):
+            new_slogans = [item for item in scanner.feed(chunk) if item.get('text')]
+            if new_slogans:
+                slogans.extend(new_slogans)
+                await self._update_task_status(task_id, 'processing', min(50 + 8 * len(slogans), 90), {
+                    'partial': True,
+                    'type': 'slogan',
+                    'slogans': list(slogans)
+                })
+        return scanner.text
+    
+    async def _request_slogans(self, prompt: str, task_id: Optional[str] = None) -> Dict[str, Any]:
+        """单独调用模型生成一个需求的口号，流式模式下需传入task_id以发布部分结果"""
+        enhanced_prompt = f"""
             为樊振东球迷创建应援口号和视觉呈现方案。
             用户需求: {prompt}
 
-            请生成5个不同风格的应援口号，每个口号包含：
-            1. 口号文字内容
-            2. 视觉呈现建议
-            3. 推荐配图元素
-            4. 排版样式建议
-
-            口号类型：
-            1. 简短有力型（4-8字）
-            2. 朗朗上口型（8-16字）
-            3. 押韵节拍型
-            4. 激励鼓舞型
-            5. 胜利祝愿型
-
-            视觉元素选项：
-            - 樊振东元素：fzd-portrait, fzd-silhouette
-            - 乒乓球元素：ping-pong-ball, paddle, table-tennis-table
-            - 荣誉元素：gold-trophy, medal
-            - 装饰元素：star, crown, lightning, ribbon
-            - 气泡样式：round-bubble, thought-bubble, shout-bubble
+{SLOGAN_REQUIREMENTS}
 
             请以JSON格式返回：
-            {
-                "slogans": [
-                    {
-                        "type": "简短有力",
-                        "text": "口号内容",
-                        "visualStyle": {
-                            "presentationType": "card",
-                            "backgroundColor": "#FF0000",
-                            "textColor": "#FFFFFF",
-                            "fontSize": "large",
-                            "fontWeight": "bold",
-                            "elements": ["star", "lightning"],
-                            "layout": "center",
-                            "effects": ["glow", "shadow"]
-                        },
-                        "description": "适用场景说明"
-                    }
-                ]
-            }
+            {{
+                "slogans": [{SLOGAN_ITEM_SCHEMA}]
+            }}
 
             确保每个口号都体现樊振东的特点和球迷的热情支持。
             """
-            
-            response = await asyncio.to_thread(
-                self.gemini_model.generate_content, enhanced_prompt
+        
+        if settings.MODEL_STREAMING and task_id:
+            response_text = await self.model_guard.call(
+                lambda: self._stream_slogans(task_id, enhanced_prompt), hedge=False
             )
-            
-            try:
-                # 尝试解析JSON响应
-                import re
-                json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
-                if json_match:
-                    slogans_data = json.loads(json_match.group())
-                else:
-                    raise ValueError("无法解析AI响应")
-            except:
-                # 如果解析失败，使用默认格式
-                slogans_data = {
-                    "slogans": [
-                        {"type": "简短有力", "text": response.text.strip()[:20]}
-                    ]
-                }
         else:
-            # 模拟模式
-            await asyncio.sleep(2)
+            response_text = await self._call_model(enhanced_prompt)
+        
+        slogans_data = json_extractor.extract(response_text, is_valid_slogans, 'slogan')
+        if slogans_data is None:
+            # 如果解析失败，使用默认格式
             slogans_data = {
                 "slogans": [
-                    {"type": "简短有力", "text": "樊振东必胜！"},
-                    {"type": "朗朗上口", "text": "东哥威武，球技超群！"},
-                    {"type": "押韵节拍", "text": "樊振东，真英雄，乒乓场上显神通！"},
-                    {"type": "激励鼓舞", "text": "永不放弃，勇往直前，樊振东加油！"},
-                    {"type": "胜利祝愿", "text": "愿你每球都精彩，每赛都夺冠！"}
+                    {"type": "简短有力", "text": response_text.strip()[:20]}
                 ]
             }
+        return slogans_data
+    
+    async def _generate_slogan_batch(self, prompts: List[str]) -> List[Any]:
+        """一次模型调用为多个需求生成口号，按顺序返回各需求的结果或异常"""
+        requests_text = "\n".join(
+            f"            [{index}] {json.dumps(prompt, ensure_ascii=False)}"
+            for index, prompt in enumerate(prompts)
+        )
+        batch_prompt = f"""
+            为樊振东球迷创建应援口号和视觉呈现方案。
+            下面是{len(prompts)}个相互独立的用户需求，请分别为每个需求生成结果：
+{requests_text}
+
+{SLOGAN_REQUIREMENTS}
+
+            请以JSON格式返回，results中每一项对应一个需求，id与需求编号一致：
+            {{
+                "results": [
+                    {{
+                        "id": 0,
+                        "slogans": [{SLOGAN_ITEM_SCHEMA}]
+                    }}
+                ]
+            }}
+
+            确保每个口号都体现樊振东的特点和球迷的热情支持。
+            """
         
-        return {
-            'type': 'slogan',
-            'slogans': slogans_data['slogans'],
-            'parameters': parameters
-        }
+        response_text = await self._call_model(batch_prompt)
+        
+        batch_data = json_extractor.extract(response_text, is_valid_slogan_batch, 'slogan_batch')
+        if batch_data is None:
+            raise BatchItemError("无法解析AI批量响应")
+        
+        by_id = {}
+        for item in batch_data['results']:
+            if isinstance(item, dict) and isinstance(item.get('id'), int):
+                by_id[item['id']] = item.get('slogans')
+        
+        outputs = []
+        for index in range(len(prompts)):
+            slogans = by_id.get(index)
+            if is_valid_slogans({'slogans': slogans}):
+                outputs.append({'slogans': slogans})
+            else:
+                outputs.append(BatchItemError(f"批量响应缺少第{index}个需求的有效口号"))
+        return outputs
     
     async def _generate_emoji(self, task_data: Dict[str, Any]) -> Dict[str, Any]:
         """生成表情包"""
@@ -368,50 +653,23 @@ class AIService:
         await asyncio.sleep(3)
         
         # 创建简单的表情包图片
-        emoji_path = await self._create_emoji_image(task_id, prompt, parameters)
+        emoji = await self._create_emoji_image(task_id, prompt, parameters)
         
         return {
             'type': 'emoji',
-            'image_path': emoji_path,
+            **self._image_fields(emoji),
             'prompt': prompt,
             'parameters': parameters
         }
     
     async def _create_banner_image(self, task_id: str, text: str, 
-                                 parameters: Dict[str, Any]) -> str:
+                                 parameters: Dict[str, Any]) -> RenderResult:
         """创建横幅图片"""
-        # 图片尺寸
-        width = parameters.get('width', 800)
-        height = parameters.get('height', 300)
-        
-        # 创建图片
-        img = Image.new('RGB', (width, height), color='red')
-        draw = ImageDraw.Draw(img)
-        
-        # 尝试加载字体
-        try:
-            font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 48)
-        except:
-            font = ImageFont.load_default()
-        
-        # 计算文字位置
-        bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        x = (width - text_width) // 2
-        y = (height - text_height) // 2
-        
-        # 绘制文字
-        draw.text((x, y), text, fill='white', font=font)
-        
-        # 保存图片
-        output_dir = os.path.join(settings.GENERATED_PATH, 'banners')
-        os.makedirs(output_dir, exist_ok=True)
-        
-        image_path = os.path.join(output_dir, f"{task_id}.png")
-        img.save(image_path)
-        
-        return f"generated/banners/{task_id}.png"
+        return await self._render(RenderJob(
+            kind='banner',
+            task_id=task_id,
+            payload={'text': text, 'parameters': parameters}
+        ))
 
     def _get_default_banner_design(self, prompt: str) -> Dict[str, Any]:
         """获取默认横幅设计方案"""
@@ -459,169 +717,58 @@ class AIService:
         }
 
     async def _create_enhanced_banner_image(self, task_id: str, design_data: Dict[str, Any],
-                                          parameters: Dict[str, Any]) -> str:
+                                          parameters: Dict[str, Any]) -> RenderResult:
         """创建增强版横幅图片"""
         try:
-            width = parameters.get('width', 800)
-            height = parameters.get('height', 300)
-            img = Image.new('RGBA', (width, height), (255, 255, 255, 0))
-            
-            # 1. 绘制背景
-            primary_color = design_data.get('colors', {}).get('primary', '#FF0000')
-            secondary_color = design_data.get('colors', {}).get('secondary', '#FFD700')
-            
-            # 创建一个可绘制的背景层
-            background_layer = Image.new('RGBA', (width, height), primary_color)
-            draw_bg = ImageDraw.Draw(background_layer)
-            
-            # 简单的线性渐变
-            for y in range(height):
-                alpha = y / height
-                r = int(int(primary_color[1:3], 16) * (1 - alpha) + int(secondary_color[1:3], 16) * alpha)
-                g = int(int(primary_color[3:5], 16) * (1 - alpha) + int(secondary_color[3:5], 16) * alpha)
-                b = int(int(primary_color[5:7], 16) * (1 - alpha) + int(secondary_color[5:7], 16) * alpha)
-                draw_bg.line([(0, y), (width, y)], fill=(r, g, b))
-            
-            img.paste(background_layer, (0, 0))
-
-            # 2. 绘制视觉元素
-            elements = design_data.get('visualElements', [])
-            elements.sort(key=lambda e: e.get('zIndex', 1)) # 按zIndex排序
-
-            for element in elements:
-                element_id = element.get('id')
-                element_path = os.path.join(settings.BASE_DIR, 'app', 'assets', 'elements', f"{element_id}.png")
-                
-                if os.path.exists(element_path):
-                    try:
-                        element_img = Image.open(element_path).convert("RGBA")
-                        
-                        size = element.get('size', {})
-                        el_width = size.get('width', 80)
-                        el_height = size.get('height', 80)
-                        element_img = element_img.resize((el_width, el_height), Image.Resampling.LANCZOS)
-                        
-                        position = element.get('position', {})
-                        pos_x = position.get('x', 0)
-                        pos_y = position.get('y', 0)
-                        
-                        # 粘贴元素
-                        img.paste(element_img, (pos_x, pos_y), element_img)
-                    except Exception as e:
-                        logger.warning(f"处理元素失败 {element_id}: {e}")
-                else:
-                    logger.warning(f"元素文件不存在: {element_path}")
-
-            # 3. 绘制文字
-            draw = ImageDraw.Draw(img)
-            font_path = os.path.join(settings.BASE_DIR, 'app', 'assets', 'fonts', 'SourceHanSans-Bold.otf')
-            
-            try:
-                font_size = parameters.get('fontSize', 48)
-                font = ImageFont.truetype(font_path, font_size)
-            except IOError:
-                logger.warning("字体文件加载失败，使用默认字体")
-                font = ImageFont.load_default()
-
-            main_title = design_data.get('mainTitle', '樊振东加油！')
-            text_color = design_data.get('colors', {}).get('textColor', '#FFFFFF')
-
-            # 计算文字位置
-            bbox = draw.textbbox((0, 0), main_title, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            text_x = (width - text_width) // 2
-            text_y = (height - text_height) // 2
-
-            # 绘制阴影
-            shadow_offset = 3
-            draw.text((text_x + shadow_offset, text_y + shadow_offset), main_title, font=font, fill=(0, 0, 0, 128))
-            # 绘制主文字
-            draw.text((text_x, text_y), main_title, font=font, fill=text_color)
-
-            # 4. 保存图片
-            output_dir = os.path.join(settings.GENERATED_PATH, 'banners')
-            os.makedirs(output_dir, exist_ok=True)
-            output_path = os.path.join(output_dir, f"{task_id}.png")
-            img.save(output_path)
-
-            logger.info(f"横幅图片已生成: {output_path}")
-            return f"generated/banners/{task_id}.png"
+            return await self._render(RenderJob(
+                kind='enhanced_banner',
+                task_id=task_id,
+                payload={'design_data': design_data, 'parameters': parameters}
+            ))
 
         except Exception as e:
             logger.error(f"生成横幅图片失败: {e}")
             raise
     
     async def _create_emoji_image(self, task_id: str, prompt: str, 
-                                parameters: Dict[str, Any]) -> str:
+                                parameters: Dict[str, Any]) -> RenderResult:
         """创建表情包图片"""
-        # 创建简单的表情包
-        img = Image.new('RGB', (300, 300), color='yellow')
-        draw = ImageDraw.Draw(img)
-        
-        # 绘制简单的笑脸
-        draw.ellipse([50, 50, 100, 100], fill='black')  # 左眼
-        draw.ellipse([200, 50, 250, 100], fill='black')  # 右眼
-        draw.arc([75, 150, 225, 225], 0, 180, fill='black', width=5)  # 嘴巴
-        
-        # 添加文字
-        try:
-            font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 24)
-        except:
-            font = ImageFont.load_default()
-        
-        draw.text((50, 250), prompt[:10], fill='black', font=font)
-        
-        # 保存图片
-        output_dir = os.path.join(settings.GENERATED_PATH, 'emojis')
-        os.makedirs(output_dir, exist_ok=True)
-        
-        image_path = os.path.join(output_dir, f"{task_id}.png")
-        img.save(image_path)
-        
-        return f"generated/emojis/{task_id}.png"
+        return await self._render(RenderJob(
+            kind='emoji',
+            task_id=task_id,
+            payload={'prompt': prompt, 'parameters': parameters}
+        ))
+    
+    @staticmethod
+    def _image_fields(render: RenderResult) -> Dict[str, Any]:
+        """任务结果中的图片信息，终态写库时记录文件大小、尺寸与缩略图"""
+        return {
+            'image_path': render.image_path,
+            'thumbnail_path': render.thumbnail_path,
+            'format': render.output_format,
+            'file_size': render.file_size,
+            'dimensions': f"{render.width}x{render.height}"
+        }
+    
+    async def _render(self, job: RenderJob) -> RenderResult:
+        """提交渲染任务，并把渲染进程中各阶段的耗时记录为子span"""
+        with tracer.span('render', kind=job.kind, mode=self.render_executor.mode) as span:
+            result = await self.render_executor.submit(job)
+            for name, start, end in result.stages:
+                tracer.record(f"render.{name}", start, end)
+            if span is not None:
+                span.set_attribute('file_size', result.file_size)
+                span.set_attribute('format', result.output_format)
+            return result
     
     async def _update_task_status(self, task_id: str, status: str, 
                                 progress: int, result: Optional[Dict] = None):
         """更新任务状态"""
+        STATUS_UPDATES.inc(status=status)
         try:
-            db = await get_db()
-            redis = await get_redis()
-            
-            # 更新数据库
-            update_query = """
-                UPDATE fazd_generation_records 
-                SET status = %s, progress = %s
-            """
-            params = [status, progress]
-            
-            if result:
-                update_query += ", output_image_path = %s"
-                params.append(result.get('image_path'))
-                
-                if status == 'completed':
-                    update_query += ", completed_at = NOW(), generation_time = TIMESTAMPDIFF(SECOND, created_at, NOW())"
-                elif status == 'failed':
-                    update_query += ", error_message = %s"
-                    params.append(result.get('error'))
-            
-            update_query += " WHERE task_id = %s"
-            params.append(task_id)
-            
-            await db.execute_update(update_query, tuple(params))
-            
-            # 更新Redis缓存
-            cache_key = f"task:{task_id}"
-            task_info = {
-                'status': status,
-                'progress': progress,
-                'updated_at': time.time()
-            }
-            if result:
-                task_info['result'] = result
-            
-            await redis.set(cache_key, task_info, expire=3600)  # 缓存1小时
-            
+            with tracer.span('status_update', task_id=task_id, status=status, progress=progress), \
+                    STATUS_UPDATE_LATENCY.time():
+                await self.status_writer.write(task_id, status, progress, result)
             logger.info(f"任务状态更新: {task_id} -> {status} ({progress}%)")
             
         except Exception as e:
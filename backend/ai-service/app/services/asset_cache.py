@@ -0,0 +1,116 @@
+"""
+视觉元素素材缓存
+启动时索引素材目录，并以LRU方式缓存解码、缩放后的RGBA元素
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from loguru import logger
+from PIL import Image
+
+from app.core.config import settings, BASE_DIR
+
+
+ELEMENTS_DIR = os.path.join(BASE_DIR, 'app', 'assets', 'elements')
+ELEMENT_EXTENSIONS = ('.png',)
+
+
+class ElementCache:
+    """视觉元素缓存"""
+
+    def __init__(self, elements_dir: str = ELEMENTS_DIR, max_size: Optional[int] = None,
+                 max_width: Optional[int] = None, max_height: Optional[int] = None):
+        self.elements_dir = elements_dir
+        self.max_size = settings.ELEMENT_CACHE_SIZE if max_size is None else max_size
+        # 元素尺寸来自模型输出，按图片尺寸上限截断，避免缩放出超大图片占满缓存
+        self.max_width = settings.MAX_IMAGE_WIDTH if max_width is None else max_width
+        self.max_height = settings.MAX_IMAGE_HEIGHT if max_height is None else max_height
+        self.index: Dict[str, str] = {}
+        self.is_indexed = False
+        self._cache: "OrderedDict[Tuple[str, int, int], Image.Image]" = OrderedDict()
+        # 进程内渲染时多个线程共享同一缓存
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejections = 0
+
+    def build_index(self):
+        """扫描素材目录，建立 元素ID -> 文件路径 的索引"""
+        index = {}
+        if os.path.isdir(self.elements_dir):
+            for filename in os.listdir(self.elements_dir):
+                element_id, ext = os.path.splitext(filename)
+                if ext.lower() in ELEMENT_EXTENSIONS:
+                    index[element_id] = os.path.join(self.elements_dir, filename)
+        else:
+            logger.warning(f"素材目录不存在: {self.elements_dir}")
+
+        with self._lock:
+            self.index = index
+            self.is_indexed = True
+            self._cache.clear()
+        logger.info(f"视觉元素索引完成，共{len(index)}个元素")
+
+    def is_known(self, element_id: Any) -> bool:
+        """检查元素ID是否在索引中"""
+        if not self.is_indexed:
+            self.build_index()
+        return isinstance(element_id, str) and element_id in self.index
+
+    def get(self, element_id: str, width: int, height: int) -> Optional[Image.Image]:
+        """
+        获取指定尺寸的RGBA元素图片，未知元素返回None
+
+        宽高限制在1到MAX_IMAGE_WIDTH/MAX_IMAGE_HEIGHT之间；返回的图片为缓存共享对象，调用方不得修改
+        """
+        if not self.is_known(element_id):
+            with self._lock:
+                self.rejections += 1
+            return None
+
+        width = min(max(int(width), 1), self.max_width)
+        height = min(max(int(height), 1), self.max_height)
+        key = (element_id, width, height)
+        with self._lock:
+            element_img = self._cache.get(key)
+            if element_img is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return element_img
+            self.misses += 1
+
+        # 解码和缩放放在锁外执行
+        with Image.open(self.index[element_id]) as source:
+            element_img = source.convert("RGBA").resize((width, height), Image.Resampling.LANCZOS)
+
+        with self._lock:
+            self._cache[key] = element_img
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+
+        return element_img
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'indexed_elements': len(self.index),
+                'cached_items': len(self._cache),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'rejections': self.rejections,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# 全局视觉元素缓存实例（每个渲染进程各自持有一份）
+element_cache = ElementCache()
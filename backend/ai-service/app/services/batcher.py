@@ -0,0 +1,100 @@
+"""
+请求微批处理
+在短时间窗口内收集请求，合并为一次批量调用后再把结果分发给各个请求
+"""
+
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+class BatchItemError(Exception):
+    """批量调用中单个请求的结果不可用"""
+
+
+class MicroBatcher:
+    """
+    微批处理器
+
+    handler接收一批请求，按顺序返回每个请求的结果；某个结果为异常实例时只有该请求失败
+    """
+
+    def __init__(self, handler: Callable[[List[Any]], Awaitable[List[Any]]],
+                 window: float, max_batch_size: int, name: str = 'batcher'):
+        self.handler = handler
+        self.window = window
+        self.max_batch_size = max(max_batch_size, 1)
+        self.name = name
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._running: set = set()
+        self.counters = {'requests': 0, 'batches': 0, 'item_errors': 0, 'batch_errors': 0}
+
+    async def submit(self, item: Any) -> Any:
+        """提交请求并等待其结果"""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        self.counters['requests'] += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_after_window())
+
+        return await future
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        self._timer = None
+        self._flush()
+
+    def _flush(self):
+        """取出当前批次并在后台执行"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # 批次由多个请求共享，不继承触发提交者的上下文（如追踪span）
+            task = asyncio.create_task(self._run(batch), context=contextvars.Context())
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        self.counters['batches'] += 1
+        items = [item for item, _ in batch]
+        try:
+            results = await self.handler(items)
+            if len(results) != len(batch):
+                raise BatchItemError(f"批量结果数量不匹配: {len(results)} != {len(batch)}")
+        except Exception as e:
+            self.counters['batch_errors'] += 1
+            logger.error(f"{self.name} 批量调用失败 ({len(batch)}个请求): {e}")
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                # 请求方已取消
+                continue
+            if isinstance(result, Exception):
+                self.counters['item_errors'] += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def close(self):
+        """处理剩余请求并等待进行中的批次"""
+        self._flush()
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """批处理统计"""
+        batches = self.counters['batches']
+        return {
+            **self.counters,
+            'pending': len(self._pending),
+            'avg_batch_size': round(self.counters['requests'] / batches, 2) if batches else 0.0
+        }
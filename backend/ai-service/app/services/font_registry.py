@@ -0,0 +1,100 @@
+"""
+字体注册表
+启动时校验配置的字体文件，并以LRU方式按 (字体族, 字号) 缓存FreeType字体对象
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from loguru import logger
+from PIL import ImageFont
+
+from app.core.config import settings
+
+
+class FontRegistry:
+    """字体注册表"""
+
+    def __init__(self, families: Optional[Dict[str, str]] = None,
+                 default_family: Optional[str] = None,
+                 max_size: Optional[int] = None,
+                 max_font_size: Optional[int] = None):
+        self.families = settings.font_families if families is None else dict(families)
+        self.default_family = default_family or settings.DEFAULT_FONT_FAMILY
+        self.max_size = settings.FONT_CACHE_SIZE if max_size is None else max_size
+        self.max_font_size = settings.MAX_FONT_SIZE if max_font_size is None else max_font_size
+        self.is_loaded = False
+        # 可用的字体族 -> 字体文件路径；按路径加载时FreeType映射同一文件，不会为每个字号复制一份字体数据
+        self._font_paths: Dict[str, str] = {}
+        self._fonts: "OrderedDict[Tuple[str, int], Any]" = OrderedDict()
+        # 进程内渲染时多个线程共享同一注册表
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def load(self):
+        """校验所有配置的字体文件可被FreeType解析"""
+        font_paths = {}
+        for family, path in self.families.items():
+            try:
+                ImageFont.truetype(path, 12)
+                font_paths[family] = path
+                logger.info(f"字体加载成功: {family} ({path})")
+            except (OSError, ValueError) as e:
+                logger.warning(f"字体加载失败 {family}: {path}, {e}，将使用默认字体")
+
+        with self._lock:
+            self._font_paths = font_paths
+            self._fonts.clear()
+            self.is_loaded = True
+
+    def get(self, size: Any, family: Optional[str] = None):
+        """获取指定字体族和字号的字体，字号限制在1到MAX_FONT_SIZE之间，字体不可用时返回Pillow默认字体"""
+        if not self.is_loaded:
+            self.load()
+
+        try:
+            size = min(max(int(size), 1), self.max_font_size)
+        except (TypeError, ValueError):
+            size = 48
+        family = family if family in self.families else self.default_family
+
+        key = (family, size)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                return font
+
+        path = self._font_paths.get(family)
+        if path is not None:
+            font = ImageFont.truetype(path, size)
+        else:
+            try:
+                font = ImageFont.load_default(size)
+            except TypeError:
+                # 旧版本Pillow的默认字体不支持字号
+                font = ImageFont.load_default()
+
+        with self._lock:
+            font = self._fonts.setdefault(key, font)
+            self._fonts.move_to_end(key)
+            while len(self._fonts) > self.max_size:
+                self._fonts.popitem(last=False)
+                self.evictions += 1
+            return font
+
+    def stats(self) -> Dict[str, Any]:
+        """字体注册表统计"""
+        with self._lock:
+            return {
+                'families': list(self.families),
+                'loaded_families': list(self._font_paths),
+                'cached_fonts': len(self._fonts),
+                'max_size': self.max_size,
+                'evictions': self.evictions
+            }
+
+
+# 全局字体注册表实例（每个渲染进程各自持有一份）
+font_registry = FontRegistry()
@@ -0,0 +1,167 @@
+"""
+渐变背景生成
+基于NumPy一次性计算整幅背景，支持线性、径向和多色标渐变
+"""
+
+import math
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageColor
+
+
+DEFAULT_PRIMARY = '#FF0000'
+DEFAULT_SECONDARY = '#FFD700'
+GRADIENT_TYPES = ('linear', 'radial')
+PALETTE_SIZE = 256
+
+
+def parse_color(value: Any, default: str = DEFAULT_PRIMARY) -> Tuple[int, int, int, int]:
+    """解析颜色为RGBA元组，无法解析时使用默认颜色"""
+    try:
+        color = ImageColor.getcolor(str(value), 'RGBA')
+    except (ValueError, AttributeError):
+        color = ImageColor.getcolor(default, 'RGBA')
+    return color
+
+
+def _as_float(value: Any, default: float) -> float:
+    """转换为浮点数，失败时返回默认值"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _gradient_spec(colors: Dict[str, Any]) -> Dict[str, Any]:
+    """读取gradient字段，兼容直接写成类型字符串的情况"""
+    gradient = colors.get('gradient') or {}
+    if isinstance(gradient, str):
+        gradient = {'type': gradient}
+    return gradient if isinstance(gradient, dict) else {}
+
+
+def _normalize_stops(colors: Dict[str, Any]) -> List[Tuple[float, Tuple[int, int, int, int]]]:
+    """从颜色方案中提取色标，按位置排序"""
+    raw_stops = _gradient_spec(colors).get('stops') or colors.get('stops')
+
+    if not raw_stops:
+        return [
+            (0.0, parse_color(colors.get('primary', DEFAULT_PRIMARY), DEFAULT_PRIMARY)),
+            (1.0, parse_color(colors.get('secondary', DEFAULT_SECONDARY), DEFAULT_SECONDARY)),
+        ]
+
+    stops = []
+    count = len(raw_stops)
+    for index, stop in enumerate(raw_stops):
+        # 色标可以是颜色字符串，也可以是 {"color": ..., "position": ...}
+        if isinstance(stop, dict):
+            color = stop.get('color')
+            position = stop.get('position')
+        else:
+            color, position = stop, None
+
+        default_position = index / (count - 1) if count > 1 else 0.0
+        position = min(max(_as_float(position, default_position), 0.0), 1.0)
+        stops.append((position, parse_color(color)))
+
+    stops.sort(key=lambda s: s[0])
+    if len(stops) == 1:
+        stops.append((1.0, stops[0][1]))
+    return stops
+
+
+def _interpolate(values: np.ndarray, stops: List[Tuple[float, Tuple[int, int, int, int]]]) -> np.ndarray:
+    """按色标对参数值插值，返回 (..., 4) 的uint8颜色数组"""
+    positions = np.array([s[0] for s in stops], dtype=np.float64)
+    stop_colors = np.array([s[1] for s in stops], dtype=np.float64)
+
+    colors = np.empty(values.shape + (4,), dtype=np.uint8)
+    for channel in range(4):
+        # 与原逐行实现一致，按int截断
+        colors[..., channel] = np.interp(values, positions, stop_colors[:, channel])
+    return colors
+
+
+def _linear_gradient(width: int, height: int, angle: float, stops) -> Image.Image:
+    """生成线性渐变，angle为渐变方向（度，90表示从上到下）"""
+    radians = math.radians(angle)
+    dx, dy = math.cos(radians), math.sin(radians)
+    if abs(dx) < 1e-9:
+        dx = 0.0
+    if abs(dy) < 1e-9:
+        dy = 0.0
+
+    # 轴对齐的渐变只需计算一行/一列颜色，再由Pillow最近邻拉伸
+    if dx == 0.0 or dy == 0.0:
+        vertical = dx == 0.0
+        length = height if vertical else width
+        # 与原逐行实现保持一致：第i行取 i/length
+        t = np.arange(length, dtype=np.float64) / length
+        if (dy if vertical else dx) < 0:
+            t = t[::-1]
+        line = _interpolate(t, stops)
+        line = line[:, np.newaxis, :] if vertical else line[np.newaxis, :, :]
+        strip = Image.fromarray(np.ascontiguousarray(line))
+        return strip.resize((width, height), Image.Resampling.NEAREST)
+
+    xs = np.arange(width, dtype=np.float32) * dx
+    ys = np.arange(height, dtype=np.float32) * dy
+    projection = ys[:, np.newaxis] + xs[np.newaxis, :]
+    low, high = projection.min(), projection.max()
+    return _palette_image((projection - low) / (high - low + 1), stops)
+
+
+def _radial_gradient(width: int, height: int, center: Tuple[float, float],
+                     radius: float, stops) -> Image.Image:
+    """生成径向渐变，center为相对位置，radius为相对最远角点距离的比例"""
+    cx = center[0] * (width - 1)
+    cy = center[1] * (height - 1)
+    farthest = max(math.hypot(x - cx, y - cy) for x in (0, width - 1) for y in (0, height - 1))
+    r = max(radius * farthest, 1.0)
+
+    xs = (np.arange(width, dtype=np.float32) - cx) ** 2
+    ys = (np.arange(height, dtype=np.float32) - cy) ** 2
+    distance = np.sqrt(ys[:, np.newaxis] + xs[np.newaxis, :])
+    return _palette_image(np.minimum(distance / r, 1.0), stops)
+
+
+def _palette_image(field: np.ndarray, stops) -> Image.Image:
+    """将二维参数场量化为调色板索引，由Pillow完成查表着色"""
+    palette = _interpolate(np.linspace(0.0, 1.0, PALETTE_SIZE), stops)
+    index = (field * (PALETTE_SIZE - 1) + 0.5).astype(np.uint8)
+
+    height, width = field.shape
+    img = Image.frombytes('P', (width, height), index.tobytes())
+    img.putpalette(palette.tobytes(), 'RGBA')
+    return img.convert('RGBA')
+
+
+def create_gradient(width: int, height: int, colors: Dict[str, Any]) -> Image.Image:
+    """
+    根据设计方案的colors块生成RGBA渐变背景
+
+    colors 支持的字段：
+        primary / secondary: 默认的两色渐变
+        stops: 多色标列表，元素为颜色字符串或 {"color", "position"}
+        gradient: {"type": "linear"|"radial", "angle": 90, "center": [0.5, 0.5],
+                   "radius": 1.0, "stops": [...]}
+    """
+    colors = colors or {}
+    gradient = _gradient_spec(colors)
+    gradient_type = gradient.get('type', 'linear')
+    if gradient_type not in GRADIENT_TYPES:
+        gradient_type = 'linear'
+
+    stops = _normalize_stops(colors)
+
+    if gradient_type == 'radial':
+        center = gradient.get('center') or (0.5, 0.5)
+        try:
+            center = (_as_float(center[0], 0.5), _as_float(center[1], 0.5))
+        except (TypeError, KeyError, IndexError):
+            center = (0.5, 0.5)
+        radius = _as_float(gradient.get('radius'), 1.0) or 1.0
+        return _radial_gradient(width, height, center, radius, stops)
+    return _linear_gradient(width, height, _as_float(gradient.get('angle'), 90.0), stops)
+
@@ -0,0 +1,108 @@
+"""
+图片输出编码
+把渲染好的图片编码为优化的PNG、有损/无损WebP或AVIF，并生成缩略图，在渲染进程（或渲染线程）中执行
+"""
+
+import io
+import os
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+
+from loguru import logger
+from PIL import Image, features
+
+from app.core.config import settings
+
+
+# 输出格式 -> (扩展名, Pillow格式)
+OUTPUT_FORMATS = {
+    'png': ('png', 'PNG'),
+    'webp': ('webp', 'WEBP'),
+    'webp_lossless': ('webp', 'WEBP'),
+    'avif': ('avif', 'AVIF'),
+}
+
+# 不支持AVIF编码（Pillow未带libavif）时使用的格式
+AVIF_FALLBACK = 'webp'
+
+# WebP编码速度与压缩率的折中（0最快，6最慢）
+WEBP_METHOD = 4
+
+# 缩略图文件名后缀，与原图放在同一目录
+THUMBNAIL_SUFFIX = '_thumb'
+
+
+@dataclass
+class EncodedImage:
+    """编码结果"""
+    data: bytes
+    format: str
+    extension: str
+
+
+def avif_supported() -> bool:
+    """当前Pillow是否支持AVIF编码"""
+    return features.check('avif')
+
+
+def resolve_format(parameters: Optional[Dict[str, Any]] = None) -> str:
+    """由请求参数format或IMAGE_FORMAT确定输出格式，无法使用时退回默认格式"""
+    requested = str((parameters or {}).get('format') or settings.IMAGE_FORMAT).lower()
+    if requested not in OUTPUT_FORMATS:
+        logger.warning(f"不支持的输出格式: {requested}，使用 {settings.IMAGE_FORMAT}")
+        requested = settings.IMAGE_FORMAT if settings.IMAGE_FORMAT in OUTPUT_FORMATS else 'png'
+    if requested == 'avif' and not avif_supported():
+        logger.warning(f"当前环境不支持AVIF编码，使用 {AVIF_FALLBACK}")
+        requested = AVIF_FALLBACK
+    return requested
+
+
+def resolve_quality(parameters: Optional[Dict[str, Any]] = None) -> int:
+    """由请求参数quality或IMAGE_QUALITY确定编码质量，限制在1-100"""
+    try:
+        quality = int((parameters or {}).get('quality') or settings.IMAGE_QUALITY)
+    except (TypeError, ValueError):
+        quality = settings.IMAGE_QUALITY
+    return min(max(quality, 1), 100)
+
+
+def _save_options(output_format: str, quality: int) -> Dict[str, Any]:
+    if output_format == 'png':
+        return {'optimize': True}
+    if output_format == 'webp':
+        return {'quality': quality, 'method': WEBP_METHOD}
+    if output_format == 'webp_lossless':
+        return {'lossless': True, 'quality': quality, 'method': WEBP_METHOD}
+    return {'quality': quality}
+
+
+def encode_image(img: Image.Image, output_format: str, quality: int) -> EncodedImage:
+    """编码图片；完全不透明的RGBA图片先去掉透明通道"""
+    if img.mode == 'RGBA' and img.getchannel('A').getextrema() == (255, 255):
+        img = img.convert('RGB')
+
+    extension, pil_format = OUTPUT_FORMATS[output_format]
+    buffer = io.BytesIO()
+    img.save(buffer, format=pil_format, **_save_options(output_format, quality))
+    return EncodedImage(data=buffer.getvalue(), format=output_format, extension=extension)
+
+
+def make_thumbnail(img: Image.Image, size: Optional[int] = None) -> Optional[Image.Image]:
+    """
+    按THUMBNAIL_SIZE等比缩小图片
+
+    size不大于0时不生成，返回None；原图不超过该尺寸时不放大，直接返回原图
+    """
+    size = settings.THUMBNAIL_SIZE if size is None else size
+    if size <= 0:
+        return None
+    if img.width <= size and img.height <= size:
+        return img
+    thumbnail = img.copy()
+    thumbnail.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return thumbnail
+
+
+def thumbnail_path(image_path: str, extension: str) -> str:
+    """原图路径对应的缩略图路径"""
+    return f"{os.path.splitext(image_path)[0]}{THUMBNAIL_SUFFIX}.{extension}"
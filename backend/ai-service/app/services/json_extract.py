@@ -0,0 +1,260 @@
+"""
+模型响应JSON提取
+按起始位置依次从每个左括号解析（正确处理字符串中的括号与转义），返回第一个通过校验的JSON对象；
+解析失败时修复常见问题（代码块标记、尾随逗号）后重试，并统计提取结果
+"""
+
+import json
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from loguru import logger
+
+
+Validator = Callable[[Dict[str, Any]], bool]
+
+_decoder = json.JSONDecoder()
+
+# JSON对象的左括号之后只能是键或右括号
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+# 解析窗口的初始长度；出错位置靠近窗口末尾（可能由截断造成）时加倍后重试
+_DECODE_WINDOW = 1024
+_TRUNCATION_MARGIN = 16
+
+_CODE_FENCE = re.compile(r"```[ \t]*(?:json|JSON)?[ \t]*\r?\n?(.*?)```", re.DOTALL)
+
+
+def iter_object_spans(text: str, start: int = 0,
+                      stop: Optional[int] = None) -> Iterator[Tuple[int, Optional[int]]]:
+    """
+    按起始位置依次返回大括号对象的(起始, 结束)位置，包括嵌套在其他括号中的对象，未闭合时结束位置为None
+
+    单次扫描到stop（默认文本末尾）：只在对象内部识别字符串，对象之外的引号不会影响扫描；
+    最外层括号闭合（或扫描结束）时，按起始位置返回其中的全部对象
+    """
+    opened = []
+    spans = []
+    in_string = False
+    escape = False
+    for pos in range(start, len(text) if stop is None else stop):
+        char = text[pos]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '{':
+            opened.append(pos)
+        elif opened:
+            if char == '"':
+                in_string = True
+            elif char == '}':
+                spans.append((opened.pop(), pos + 1))
+                if not opened:
+                    spans.sort()
+                    yield from spans
+                    spans = []
+    spans.extend((begin, None) for begin in opened)
+    spans.sort()
+    yield from spans
+
+
+def _decode(text: str, start: int) -> Tuple[Any, Optional[int], Optional[int]]:
+    """
+    从start处解析一个JSON值，返回(结果, 结束位置, 出错位置)
+
+    在逐步加倍的窗口中解析：构造解析错误时要统计出错位置之前的行数，
+    直接在全文上解析时每次失败的开销与起始位置成正比
+    """
+    size = _DECODE_WINDOW
+    while True:
+        window = text[start:start + size]
+        try:
+            data, end = _decoder.raw_decode(window)
+            return data, start + end, None
+        except json.JSONDecodeError as e:
+            truncated = (e.pos >= len(window) - _TRUNCATION_MARGIN
+                         or e.msg.startswith('Unterminated string'))
+            if not truncated or start + size >= len(text):
+                return None, None, start + e.pos
+        size *= 2
+
+
+def _object_end(text: str, start: int) -> Optional[int]:
+    """start处的左括号配平后的结束位置，未闭合时为None"""
+    return next(iter_object_spans(text, start))[1]
+
+
+def _unclosed_braces(text: str, start: int, stop: Optional[int] = None) -> List[int]:
+    """从start处的左括号扫描到stop时仍未闭合的左括号位置"""
+    return [begin for begin, end in iter_object_spans(text, start, stop) if end is None]
+
+
+def _at_trailing_comma(text: str, pos: int) -> bool:
+    """解析错误位置是否为紧跟在逗号之后的 } 或 ]"""
+    if text[pos:pos + 1] not in ('}', ']'):
+        return False
+    pos -= 1
+    while pos >= 0 and text[pos].isspace():
+        pos -= 1
+    return pos >= 0 and text[pos] == ','
+
+
+def remove_trailing_commas(text: str, replacement: str = '') -> str:
+    """删除字符串之外、紧跟在 } 或 ] 之前的逗号；replacement为空格时各字符位置保持不变"""
+    out = []
+    in_string = False
+    escape = False
+    pending_comma = -1
+    for char in text:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char in '}]' and pending_comma >= 0:
+            out[pending_comma] = replacement
+            pending_comma = -1
+        elif char == ',':
+            pending_comma = len(out)
+        elif not char.isspace():
+            pending_comma = -1
+        if char == '"':
+            in_string = True
+        out.append(char)
+    return ''.join(out)
+
+
+class JSONExtractor:
+    """模型响应JSON提取器"""
+
+    def __init__(self):
+        self.counters = {
+            'calls': 0, 'extracted': 0, 'repaired': 0, 'fenced': 0,
+            'schema_rejected': 0, 'failures': 0
+        }
+        # 按调用方统计的失败次数
+        self.failures_by_name: Dict[str, int] = {}
+
+    def _parse(self, text: str, start: int, failed: Set[int]) -> Tuple[Any, bool, Optional[int]]:
+        """
+        解析从start处开始的对象，返回(结果, 是否经过修复, 结束位置)
+
+        无法解析时结果为None，并把嵌套其中、跨过出错位置的左括号加入failed：
+        它们与该对象按同样方式读取，会在同一位置出错；
+        嵌套超过解析器递归深度时抛出RecursionError
+        """
+        if not _OBJECT_START.match(text, start):
+            # 正文中的括号，不必交给解析器（构造解析错误需要统计此前的行数）
+            return None, False, None
+        data, end, error = _decode(text, start)
+        if error is None:
+            return data, False, end
+
+        # 只有错误出在尾随逗号处时才值得修复，避免对每个失败的候选都做一次完整扫描
+        if not _at_trailing_comma(text, error):
+            failed.update(_unclosed_braces(text, start, error))
+            return None, False, None
+        end = _object_end(text, start)
+        if end is None:
+            # 其中同样未闭合的对象也无法修复
+            failed.update(_unclosed_braces(text, start))
+            return None, False, None
+        # 用空格替换尾随逗号，出错位置仍对应原文
+        candidate = remove_trailing_commas(text[start:end], ' ')
+        data, stop, error = _decode(candidate, 0)
+        if error is not None:
+            failed.update(start + pos for pos in _unclosed_braces(candidate, 0, error))
+            return None, False, None
+        return (data, True, end) if stop == len(candidate) else (None, False, None)
+
+    def _search(self, text: str, validate: Optional[Validator]) -> Tuple[Optional[Dict[str, Any]], bool, bool]:
+        """
+        在文本中查找对象，返回(对象, 是否经过修复, 是否有对象未通过校验)
+
+        每个左括号都从头解析，正文中括号之后的引号不会让后面的对象被当作字符串；
+        已知会失败的左括号和未通过校验的对象内部不再尝试，总耗时与文本长度成线性
+        """
+        rejected = False
+        failed: Set[int] = set()
+        pos = 0
+        while True:
+            start = text.find('{', pos)
+            if start < 0:
+                return None, False, rejected
+            pos = start + 1
+            if start in failed:
+                continue
+
+            try:
+                data, repaired, end = self._parse(text, start, failed)
+            except RecursionError:
+                # 嵌套过深，其中的对象也不再尝试；未闭合时只跳过同样未闭合的括号
+                end = _object_end(text, start)
+                if end is None:
+                    failed.update(_unclosed_braces(text, start))
+                else:
+                    pos = end
+                continue
+            if data is None:
+                # 可能是正文中的括号包住了真正的对象，继续尝试其后的括号
+                continue
+            if isinstance(data, dict) and (validate is None or validate(data)):
+                return data, repaired, rejected
+            rejected = True
+            # 未通过校验的对象内部的对象不再单独尝试
+            pos = end
+
+    def extract(self, text: Optional[str], validate: Optional[Validator] = None,
+                name: str = 'default') -> Optional[Dict[str, Any]]:
+        """
+        提取第一个通过校验的JSON对象
+
+        validate: 校验函数，返回False的对象会被跳过
+        name: 调用方名称，用于分别统计失败次数
+        返回None表示没有可用的对象
+        """
+        self.counters['calls'] += 1
+        if text:
+            # 优先查找代码块中的内容
+            for match in _CODE_FENCE.finditer(text):
+                data, repaired, rejected = self._search(match.group(1), validate)
+                if data is not None:
+                    self.counters['fenced'] += 1
+                    return self._found(data, repaired)
+            data, repaired, rejected = self._search(text, validate)
+            if data is not None:
+                return self._found(data, repaired)
+            if rejected:
+                self.counters['schema_rejected'] += 1
+
+        self.counters['failures'] += 1
+        self.failures_by_name[name] = self.failures_by_name.get(name, 0) + 1
+        logger.warning(f"无法从模型响应中提取JSON: {name}，响应长度{len(text or '')}")
+        return None
+
+    def _found(self, data: Dict[str, Any], repaired: bool) -> Dict[str, Any]:
+        self.counters['extracted'] += 1
+        if repaired:
+            self.counters['repaired'] += 1
+        return data
+
+    def stats(self) -> Dict[str, Any]:
+        """提取统计"""
+        calls = self.counters['calls']
+        return {
+            **self.counters,
+            'failure_rate': round(self.counters['failures'] / calls, 4) if calls else 0.0,
+            'failures_by_name': dict(self.failures_by_name)
+        }
+
+
+# 全局JSON提取器实例
+json_extractor = JSONExtractor()
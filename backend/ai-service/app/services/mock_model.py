@@ -0,0 +1,63 @@
+"""
+模拟生成模型
+接口与google.generativeai的GenerativeModel一致，用于测试和本地压测
+"""
+
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+
+class MockResponse:
+    """模拟模型响应（或流式响应中的一段）"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class MockStreamingModel:
+    """
+    模拟流式模型
+
+    response: 固定响应文本，或根据提示词生成响应文本的函数
+    latency: 首段输出前的等待时间（秒），或每次调用时返回等待时间的函数（用于模拟延迟分布）
+    chunk_size: 流式输出时每段的字符数
+    chunk_delay: 流式输出时每段之间的等待时间（秒）
+    """
+
+    def __init__(self, response: Union[str, Callable[[str], str]],
+                 latency: Union[float, Callable[[], float]] = 0.0,
+                 chunk_size: int = 16, chunk_delay: float = 0.0):
+        self.response = response
+        self.latency = latency
+        self.chunk_size = max(chunk_size, 1)
+        self.chunk_delay = chunk_delay
+        self.prompts: List[str] = []
+
+    def _text(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return self.response(prompt) if callable(self.response) else self.response
+
+    def _wait(self, timeout: Optional[float] = None):
+        latency = max(self.latency() if callable(self.latency) else self.latency, 0.0)
+        if timeout is not None and latency > timeout:
+            # 与SDK一致，超过request_options中的超时时中止请求
+            time.sleep(timeout)
+            raise TimeoutError("模型请求超时")
+        time.sleep(latency)
+
+    def generate_content(self, prompt: str, stream: bool = False,
+                         request_options: Optional[Dict[str, Any]] = None):
+        """生成内容，stream为True时返回逐段输出的迭代器"""
+        text = self._text(prompt)
+        timeout = (request_options or {}).get('timeout')
+        if stream:
+            return self._stream(text, timeout)
+        self._wait(timeout)
+        return MockResponse(text)
+
+    def _stream(self, text: str, timeout: Optional[float] = None) -> Iterator[MockResponse]:
+        self._wait(timeout)
+        for start in range(0, len(text), self.chunk_size):
+            if start:
+                time.sleep(self.chunk_delay)
+            yield MockResponse(text[start:start + self.chunk_size])
@@ -0,0 +1,290 @@
+"""
+模型调用保护
+为每次模型调用设置截止时间，并在错误率或慢调用比例过高时熔断，熔断期间直接走降级逻辑；
+可选对冲请求：调用超过近期延迟的指定分位数仍未返回时，再发起一次相同请求，取先完成的结果
+"""
+
+import asyncio
+import functools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import MODEL_CALL_ERRORS, MODEL_CALL_LATENCY, MODEL_HEDGES
+from app.core.tracing import tracer
+
+
+class ModelCallError(Exception):
+    """模型调用被保护逻辑拒绝或中止"""
+
+
+class CircuitOpenError(ModelCallError):
+    """熔断器打开，未发起调用"""
+
+
+class ModelTimeoutError(ModelCallError):
+    """模型调用超过截止时间"""
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    closed: 正常放行，按最近window次调用统计失败率与慢调用比例，超过阈值时打开
+    open: 拒绝调用，reset_timeout秒后进入half_open
+    half_open: 只放行一次探测调用，成功则关闭，失败则重新打开
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window: Optional[int] = None, min_calls: Optional[int] = None,
+                 failure_rate: Optional[float] = None, slow_call_seconds: Optional[float] = None,
+                 slow_call_rate: Optional[float] = None, reset_timeout: Optional[float] = None):
+        self.window = window or settings.MODEL_BREAKER_WINDOW
+        self.min_calls = min_calls or settings.MODEL_BREAKER_MIN_CALLS
+        self.failure_rate = failure_rate or settings.MODEL_BREAKER_FAILURE_RATE
+        self.slow_call_seconds = slow_call_seconds or settings.MODEL_BREAKER_SLOW_CALL_SECONDS
+        self.slow_call_rate = slow_call_rate or settings.MODEL_BREAKER_SLOW_CALL_RATE
+        self.reset_timeout = (settings.MODEL_BREAKER_RESET_TIMEOUT
+                              if reset_timeout is None else reset_timeout)
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._probing = False
+        # 最近的调用结果：(是否失败, 是否慢调用)
+        self._calls: deque = deque(maxlen=self.window)
+        self.counters = {'opened': 0, 'rejected': 0}
+
+    def allow(self) -> bool:
+        """是否允许发起调用"""
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.counters['rejected'] += 1
+                return False
+            self.state = self.HALF_OPEN
+            self._probing = False
+
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                self.counters['rejected'] += 1
+                return False
+            self._probing = True
+        return True
+
+    def record(self, failed: bool, latency: float):
+        """记录一次调用结果"""
+        slow = latency >= self.slow_call_seconds
+        if self.state == self.HALF_OPEN:
+            self._probing = False
+            if failed or slow:
+                self._open("探测调用失败")
+            else:
+                self.state = self.CLOSED
+                self._calls.clear()
+                logger.info("模型熔断器已关闭")
+            return
+
+        self._calls.append((failed, slow))
+        if len(self._calls) < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self._calls if failed) / len(self._calls)
+        slow_calls = sum(1 for _, slow in self._calls if slow) / len(self._calls)
+        if failures >= self.failure_rate:
+            self._open(f"失败率{failures:.0%}")
+        elif slow_calls >= self.slow_call_rate:
+            self._open(f"慢调用比例{slow_calls:.0%}")
+
+    def release(self):
+        """调用被取消、未产生结果时释放探测名额"""
+        self._probing = False
+
+    def _open(self, reason: str):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._calls.clear()
+        self.counters['opened'] += 1
+        logger.warning(f"模型熔断器已打开: {reason}，{self.reset_timeout}秒后尝试恢复")
+
+    def stats(self) -> Dict[str, Any]:
+        """熔断器状态"""
+        calls = len(self._calls)
+        return {
+            'state': self.state,
+            'recent_calls': calls,
+            'failure_rate': round(sum(1 for failed, _ in self._calls if failed) / calls, 3) if calls else 0.0,
+            'slow_call_rate': round(sum(1 for _, slow in self._calls if slow) / calls, 3) if calls else 0.0,
+            **self.counters
+        }
+
+
+class Hedger:
+    """
+    对冲请求
+
+    对冲延迟取最近成功调用耗时的percentile分位数；每次调用积累budget个对冲名额（上限burst），
+    每次对冲消耗一个，从而把额外请求量限制在调用量的budget比例以内
+    """
+
+    def __init__(self, percentile: Optional[float] = None, budget: Optional[float] = None,
+                 min_samples: Optional[int] = None, min_delay: Optional[float] = None,
+                 window: int = 200, burst: float = 5.0):
+        self.percentile = settings.MODEL_HEDGE_PERCENTILE if percentile is None else percentile
+        self.budget = settings.MODEL_HEDGE_BUDGET if budget is None else budget
+        self.min_samples = settings.MODEL_HEDGE_MIN_SAMPLES if min_samples is None else min_samples
+        self.min_delay = settings.MODEL_HEDGE_MIN_DELAY if min_delay is None else min_delay
+        self.burst = burst
+        self._latencies: deque = deque(maxlen=window)
+        self._tokens = 0.0
+        self.counters = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'budget_exhausted': 0}
+
+    def delay(self) -> Optional[float]:
+        """当前的对冲延迟，样本不足时返回None（不对冲）"""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(int(len(ordered) * self.percentile / 100), len(ordered) - 1)
+        return max(ordered[index], self.min_delay)
+
+    def _take_token(self) -> bool:
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        self.counters['budget_exhausted'] += 1
+        return False
+
+    async def _timed(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.monotonic()
+        result = await func()
+        self._latencies.append(time.monotonic() - start)
+        return result
+
+    async def run(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        """执行调用，超过对冲延迟时发起第二个相同请求，返回先成功的结果"""
+        self.counters['calls'] += 1
+        self._tokens = min(self._tokens + self.budget, self.burst)
+
+        primary = asyncio.ensure_future(self._timed(func))
+        delay = self.delay()
+        if delay is None:
+            return await primary
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self._take_token():
+            return await primary
+
+        self.counters['hedged'] += 1
+        hedge = asyncio.ensure_future(self._timed(func))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.counters['hedge_wins'] += 1
+                        MODEL_HEDGES.inc(result='won' if task is hedge else 'lost')
+                        return task.result()
+            # 两个请求都失败，抛出原始请求的异常
+            MODEL_HEDGES.inc(result='failed')
+            return primary.result()
+        finally:
+            # 线程中的同步调用无法中断，取消后其结果被丢弃
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """对冲统计"""
+        calls, hedged = self.counters['calls'], self.counters['hedged']
+        delay = self.delay()
+        return {
+            **self.counters,
+            'delay': round(delay, 3) if delay is not None else None,
+            'hedge_rate': round(hedged / calls, 4) if calls else 0.0,
+            'win_rate': round(self.counters['hedge_wins'] / hedged, 4) if hedged else 0.0
+        }
+
+
+class ModelGuard:
+    """模型调用保护：截止时间加熔断"""
+
+    def __init__(self, timeout: Optional[float] = None, breaker: Optional[CircuitBreaker] = None,
+                 hedger: Optional[Hedger] = None, threads: Optional[int] = None):
+        self.timeout = timeout or settings.AI_REQUEST_TIMEOUT
+        self.breaker = breaker or CircuitBreaker()
+        self.hedger = hedger if hedger is not None else (Hedger() if settings.MODEL_HEDGING else None)
+        # 同步的模型SDK调用在专用线程池中执行，卡住的调用不会占满渲染与数据库共用的默认线程池
+        self.executor = ThreadPoolExecutor(max_workers=threads or settings.MODEL_CALL_THREADS,
+                                           thread_name_prefix='model-call')
+        self.counters = {'calls': 0, 'timeouts': 0, 'errors': 0}
+
+    @property
+    def request_options(self) -> Dict[str, Any]:
+        """传给模型SDK的请求选项，由SDK在截止时间中止请求并释放线程"""
+        return {'timeout': self.timeout}
+
+    async def run_in_thread(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """在模型调用线程池中执行同步调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def close(self):
+        """关闭模型调用线程池"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def available(self) -> bool:
+        """熔断器是否处于打开状态之外"""
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    async def call(self, func: Callable[[], Awaitable[Any]], hedge: bool = True) -> Any:
+        """
+        在截止时间内执行模型调用，熔断器打开时抛出CircuitOpenError
+
+        hedge: 启用对冲时是否允许对该调用发起对冲请求（有副作用的调用应传False）
+        """
+        if not self.breaker.allow():
+            MODEL_CALL_ERRORS.inc(reason='circuit_open')
+            raise CircuitOpenError("模型熔断中，跳过调用")
+
+        with tracer.span('model_call', hedging=bool(self.hedger and hedge)):
+            self.counters['calls'] += 1
+            start = time.monotonic()
+            try:
+                # 超时只释放等待的协程，线程中的同步调用由SDK按request_options中的超时中止
+                call = self.hedger.run(func) if self.hedger and hedge else func()
+                result = await asyncio.wait_for(call, timeout=self.timeout)
+            except asyncio.TimeoutError:
+                self.counters['timeouts'] += 1
+                self._record(True, start, 'timeout')
+                raise ModelTimeoutError(f"模型调用超过{self.timeout}秒")
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception:
+                self.counters['errors'] += 1
+                self._record(True, start, 'error')
+                raise
+
+            self._record(False, start, 'success')
+            return result
+
+    def _record(self, failed: bool, start: float, outcome: str):
+        latency = time.monotonic() - start
+        self.breaker.record(failed, latency)
+        MODEL_CALL_LATENCY.observe(latency, outcome=outcome)
+        if failed:
+            MODEL_CALL_ERRORS.inc(reason=outcome)
+
+    def stats(self) -> Dict[str, Any]:
+        """调用统计与熔断器状态"""
+        return {
+            'timeout': self.timeout,
+            **self.counters,
+            'breaker': self.breaker.stats(),
+            'hedging': self.hedger.stats() if self.hedger else None
+        }
@@ -0,0 +1,109 @@
+"""
+渲染执行器
+在独立的进程池中执行Pillow渲染，避免阻塞事件循环
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import RENDER_LATENCY
+from app.services.asset_cache import element_cache
+from app.services.renderer import RenderJob, RenderResult, run_render_job, warm_up
+
+
+def _init_worker():
+    """渲染进程初始化：预加载字体和素材"""
+    try:
+        warm_up()
+    except Exception as e:
+        logger.warning(f"渲染进程预热失败: {e}")
+
+
+class RenderExecutor:
+    """渲染执行器"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = settings.RENDER_WORKERS if max_workers is None else max_workers
+        self.pool: Optional[ProcessPoolExecutor] = None
+        # 各渲染进程最近一次上报的统计信息，按进程ID记录
+        self.worker_stats: Dict[int, Dict[str, Any]] = {}
+
+    def start(self):
+        """启动渲染进程池，进程数为0时在当前进程的线程中渲染"""
+        if self.max_workers <= 0:
+            logger.info("渲染进程池未启用，将在进程内渲染")
+            return
+
+        try:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            )
+            logger.info(f"渲染进程池启动，进程数: {self.max_workers}")
+        except (OSError, ValueError) as e:
+            logger.warning(f"渲染进程池启动失败: {e}，将在进程内渲染")
+            self.pool = None
+
+    @property
+    def mode(self) -> str:
+        """当前渲染模式"""
+        return "process_pool" if self.pool else "in_process"
+
+    async def submit(self, job: RenderJob) -> RenderResult:
+        """提交渲染任务并等待结果"""
+        with RENDER_LATENCY.time(mode=self.mode):
+            return await self._submit(job)
+
+    async def _submit(self, job: RenderJob) -> RenderResult:
+        result = None
+        pool = self.pool
+        if pool:
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(pool, run_render_job, job)
+            except BrokenProcessPool as e:
+                # 同一进程池上在途的任务都会收到异常，只由第一个重建，避免关闭已重建的进程池
+                if self.pool is pool:
+                    logger.error(f"渲染进程池异常: {e}，重建进程池并在进程内完成当前任务")
+                    self.pool = None
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self.worker_stats.clear()
+                    self.start()
+
+        if result is None:
+            result = await asyncio.to_thread(run_render_job, job)
+
+        if result.stats.get('pid'):
+            self.worker_stats[result.stats['pid']] = result.stats
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """渲染统计，汇总各渲染进程的元素缓存计数"""
+        totals = {'hits': 0, 'misses': 0, 'evictions': 0, 'rejections': 0, 'cached_items': 0}
+        for worker in self.worker_stats.values():
+            for key in totals:
+                totals[key] += worker.get('element_cache', {}).get(key, 0)
+
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = round(totals['hits'] / lookups, 4) if lookups else 0.0
+        totals['indexed_elements'] = len(element_cache.index)
+
+        return {
+            'mode': self.mode,
+            'workers': self.max_workers if self.pool else 0,
+            'element_cache': totals
+        }
+
+    async def shutdown(self):
+        """关闭渲染进程池"""
+        if self.pool:
+            pool, self.pool = self.pool, None
+            await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+            logger.info("渲染进程池已关闭")
@@ -0,0 +1,252 @@
+"""
+图片渲染
+同步的Pillow渲染函数，可在渲染进程池或当前进程中执行
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+from loguru import logger
+from PIL import Image, ImageDraw
+
+from app.core.config import settings
+from app.services.asset_cache import element_cache
+from app.services.font_registry import font_registry
+from app.services.gradient import create_gradient
+from app.services.image_encoding import (
+    encode_image, make_thumbnail, resolve_format, resolve_quality, thumbnail_path
+)
+
+
+# 预加载的常用字号
+PRELOAD_FONT_SIZES = (24, 48)
+
+
+@dataclass
+class RenderJob:
+    """渲染任务（需可序列化，以便发送到渲染进程）"""
+    kind: str
+    task_id: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RenderResult:
+    """渲染结果"""
+    image_path: str
+    width: int
+    height: int
+    file_size: int = 0
+    output_format: str = 'png'
+    thumbnail_path: Optional[str] = None
+    render_time: float = 0.0
+    stats: Dict[str, Any] = field(default_factory=dict)
+    # 各渲染阶段：(阶段名, 开始时间, 结束时间)，使用墙上时钟以便与主进程的记录对齐
+    stages: List[Tuple[str, float, float]] = field(default_factory=list)
+
+
+class StageTimer:
+    """记录渲染各阶段的起止时间"""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, float, float]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.stages.append((name, start, time.time()))
+
+
+def _save_image(img: Image.Image, task_id: str, category: str, timer: StageTimer,
+                parameters: Dict[str, Any]) -> RenderResult:
+    """按请求参数或默认设置编码图片并保存到生成目录，同时由内存中的图片生成缩略图，返回结果"""
+    output_dir = os.path.join(settings.GENERATED_PATH, category)
+    os.makedirs(output_dir, exist_ok=True)
+
+    quality = resolve_quality(parameters)
+    with timer.stage('encode'):
+        encoded = encode_image(img, resolve_format(parameters), quality)
+    image_path = f"generated/{category}/{task_id}.{encoded.extension}"
+
+    # 缩略图与原图同格式；原图不超过缩略图尺寸时直接作为缩略图
+    encoded_thumbnail = None
+    thumbnail = None
+    with timer.stage('thumbnail'):
+        small = make_thumbnail(img)
+        if small is img:
+            thumbnail = image_path
+        elif small is not None:
+            encoded_thumbnail = encode_image(small, encoded.format, quality)
+            thumbnail = thumbnail_path(image_path, encoded_thumbnail.extension)
+
+    with timer.stage('write'):
+        with open(os.path.join(output_dir, os.path.basename(image_path)), 'wb') as f:
+            f.write(encoded.data)
+        if encoded_thumbnail is not None:
+            with open(os.path.join(output_dir, os.path.basename(thumbnail)), 'wb') as f:
+                f.write(encoded_thumbnail.data)
+
+    return RenderResult(
+        image_path=image_path,
+        width=img.width,
+        height=img.height,
+        file_size=len(encoded.data),
+        output_format=encoded.format,
+        thumbnail_path=thumbnail,
+        stages=timer.stages
+    )
+
+
+def render_banner(task_id: str, text: str, parameters: Dict[str, Any]) -> RenderResult:
+    """创建横幅图片"""
+    timer = StageTimer()
+    # 图片尺寸
+    width = parameters.get('width', 800)
+    height = parameters.get('height', 300)
+
+    with timer.stage('compose'):
+        # 创建图片
+        img = Image.new('RGB', (width, height), color='red')
+        draw = ImageDraw.Draw(img)
+
+        font = font_registry.get(48)
+
+        # 计算文字位置
+        bbox = draw.textbbox((0, 0), text, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        x = (width - text_width) // 2
+        y = (height - text_height) // 2
+
+        # 绘制文字
+        draw.text((x, y), text, fill='white', font=font)
+
+    return _save_image(img, task_id, 'banners', timer, parameters)
+
+
+def render_enhanced_banner(task_id: str, design_data: Dict[str, Any],
+                           parameters: Dict[str, Any]) -> RenderResult:
+    """创建增强版横幅图片"""
+    timer = StageTimer()
+    width = parameters.get('width', 800)
+    height = parameters.get('height', 300)
+    img = Image.new('RGBA', (width, height), (255, 255, 255, 0))
+
+    # 1. 绘制背景（线性/径向/多色标渐变）
+    with timer.stage('background'):
+        background_layer = create_gradient(width, height, design_data.get('colors', {}))
+        img.paste(background_layer, (0, 0))
+
+    # 2. 绘制视觉元素
+    elements = sorted(design_data.get('visualElements', []),
+                      key=lambda e: e.get('zIndex', 1))  # 按zIndex排序
+
+    for element in elements:
+        element_id = element.get('id')
+
+        try:
+            size = element.get('size', {})
+            el_width = size.get('width', 80)
+            el_height = size.get('height', 80)
+            with timer.stage('element_load'):
+                element_img = element_cache.get(element_id, el_width, el_height)
+
+            # 未在素材索引中的元素（如模型臆造的ID）直接忽略
+            if element_img is None:
+                logger.warning(f"未知视觉元素，已忽略: {element_id}")
+                continue
+
+            position = element.get('position', {})
+            pos_x = position.get('x', 0)
+            pos_y = position.get('y', 0)
+
+            # 粘贴元素
+            with timer.stage('composite'):
+                img.paste(element_img, (pos_x, pos_y), element_img)
+        except Exception as e:
+            logger.warning(f"处理元素失败 {element_id}: {e}")
+
+    # 3. 绘制文字
+    with timer.stage('text'):
+        draw = ImageDraw.Draw(img)
+
+        font = font_registry.get(parameters.get('fontSize', 48), parameters.get('fontFamily'))
+
+        main_title = design_data.get('mainTitle', '樊振东加油！')
+        text_color = design_data.get('colors', {}).get('textColor', '#FFFFFF')
+
+        # 计算文字位置
+        bbox = draw.textbbox((0, 0), main_title, font=font)
+        text_width = bbox[2] - bbox[0]
+        text_height = bbox[3] - bbox[1]
+        text_x = (width - text_width) // 2
+        text_y = (height - text_height) // 2
+
+        # 绘制阴影
+        shadow_offset = 3
+        draw.text((text_x + shadow_offset, text_y + shadow_offset), main_title, font=font, fill=(0, 0, 0, 128))
+        # 绘制主文字
+        draw.text((text_x, text_y), main_title, font=font, fill=text_color)
+
+    # 4. 保存图片
+    result = _save_image(img, task_id, 'banners', timer, parameters)
+    logger.info(f"横幅图片已生成: {result.image_path}")
+    return result
+
+
+def render_emoji(task_id: str, prompt: str, parameters: Dict[str, Any]) -> RenderResult:
+    """创建表情包图片"""
+    timer = StageTimer()
+    with timer.stage('compose'):
+        # 创建简单的表情包
+        img = Image.new('RGB', (300, 300), color='yellow')
+        draw = ImageDraw.Draw(img)
+
+        # 绘制简单的笑脸
+        draw.ellipse([50, 50, 100, 100], fill='black')  # 左眼
+        draw.ellipse([200, 50, 250, 100], fill='black')  # 右眼
+        draw.arc([75, 150, 225, 225], 0, 180, fill='black', width=5)  # 嘴巴
+
+        # 添加文字
+        font = font_registry.get(24)
+
+        draw.text((50, 250), prompt[:10], fill='black', font=font)
+
+    return _save_image(img, task_id, 'emojis', timer, parameters)
+
+
+# 渲染任务类型 -> (渲染函数, 参数名)
+RENDERERS = {
+    'banner': (render_banner, ('text', 'parameters')),
+    'enhanced_banner': (render_enhanced_banner, ('design_data', 'parameters')),
+    'emoji': (render_emoji, ('prompt', 'parameters')),
+}
+
+
+def run_render_job(job: RenderJob) -> RenderResult:
+    """执行渲染任务（渲染进程的入口）"""
+    if job.kind not in RENDERERS:
+        raise ValueError(f"不支持的渲染类型: {job.kind}")
+
+    render_func, arg_names = RENDERERS[job.kind]
+    start_time = time.perf_counter()
+    result = render_func(job.task_id, *(job.payload.get(name) for name in arg_names))
+    result.render_time = time.perf_counter() - start_time
+    result.stats = {'pid': os.getpid(), 'element_cache': element_cache.stats()}
+    return result
+
+
+def warm_up():
+    """预热渲染依赖（在渲染进程启动时调用）"""
+    Image.init()
+    create_gradient(8, 8, {})
+    element_cache.build_index()
+    font_registry.load()
+    for size in PRELOAD_FONT_SIZES:
+        font_registry.get(size)
@@ -0,0 +1,292 @@
+"""
+生成结果缓存
+按（生成类型, 规范化提示词, 参数）的哈希缓存生成结果，相同内容的并发任务只生成一次
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+import unicodedata
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple
+
+from loguru import logger
+from redis.exceptions import WatchError
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+
+def normalize_prompt(prompt: str) -> str:
+    """规范化提示词：统一全角半角、合并空白"""
+    return ' '.join(unicodedata.normalize('NFKC', prompt).split())
+
+
+class ResultCache:
+    """
+    Redis生成结果缓存
+
+    {prefix}:{digest} 生成结果（带TTL）
+    {prefix}:index    缓存键 -> 写入时间（有序集合），超过条数上限时淘汰最早写入的结果
+    {prefix}:{digest}:inflight 正在生成该结果的副本标记（带短TTL），其他副本等待结果写入
+    """
+
+    def __init__(self, redis_client=None, prefix: Optional[str] = None,
+                 ttl: Optional[int] = None, max_entries: Optional[int] = None,
+                 max_result_bytes: Optional[int] = None, lock_ttl: Optional[int] = None,
+                 poll_interval: Optional[float] = None):
+        self.client = redis_client
+        self.prefix = prefix or settings.RESULT_CACHE_PREFIX
+        self.ttl = settings.RESULT_CACHE_TTL if ttl is None else ttl
+        self.max_entries = settings.RESULT_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_result_bytes = (settings.RESULT_CACHE_MAX_BYTES
+                                 if max_result_bytes is None else max_result_bytes)
+        self.lock_ttl = settings.RESULT_CACHE_LOCK_TTL if lock_ttl is None else lock_ttl
+        self.poll_interval = (settings.RESULT_CACHE_POLL_INTERVAL
+                              if poll_interval is None else poll_interval)
+        self.index_key = f"{self.prefix}:index"
+        # 进程内正在生成的缓存键 -> 生成结果
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.counters = {
+            'hits': 0,
+            'misses': 0,
+            'shared': 0,
+            'stores': 0,
+            'evictions': 0,
+            'oversized': 0,
+            'stale': 0,
+            'errors': 0
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def key(self, generation_type: str, prompt: str, parameters: Dict[str, Any]) -> str:
+        """计算结果缓存键"""
+        content = json.dumps(
+            [generation_type, normalize_prompt(prompt), parameters],
+            ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str
+        )
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    async def _client(self):
+        if self.client is None:
+            redis = await get_redis()
+            self.client = redis.redis_client
+        return self.client
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存结果，未命中或结果失效时返回None（未命中在实际生成时计数）"""
+        if not self.enabled:
+            return None
+        try:
+            client = await self._client()
+            value = await client.get(key)
+            if value is None:
+                return None
+            result = json.loads(value)
+        except Exception as e:
+            # 读取失败或缓存内容损坏时按未命中处理，重新生成后覆盖
+            self.counters['errors'] += 1
+            logger.error(f"读取结果缓存失败: {e}")
+            return None
+
+        if not self._files_exist(result):
+            # 生成的图片已被清理，缓存结果不再可用
+            self.counters['stale'] += 1
+            await self.delete(key)
+            return None
+
+        self.counters['hits'] += 1
+        return result
+
+    async def set(self, key: str, result: Dict[str, Any]):
+        """写入缓存结果，超过条数上限时淘汰最早写入的结果"""
+        if not self.enabled or result.get('fallback'):
+            # 模型不可用时的降级结果不缓存
+            return
+        value = json.dumps(result, ensure_ascii=False)
+        if len(value.encode('utf-8')) > self.max_result_bytes:
+            self.counters['oversized'] += 1
+            return
+
+        try:
+            client = await self._client()
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.set(key, value, ex=self.ttl)
+                pipe.zadd(self.index_key, {key: time.time()})
+                pipe.zcard(self.index_key)
+                *_, size = await pipe.execute()
+            self.counters['stores'] += 1
+
+            if size > self.max_entries:
+                await self._evict(client, size - self.max_entries)
+        except Exception as e:
+            self.counters['errors'] += 1
+            logger.error(f"写入结果缓存失败: {e}")
+
+    async def delete(self, key: str):
+        """删除缓存结果"""
+        try:
+            client = await self._client()
+            async with client.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                pipe.zrem(self.index_key, key)
+                await pipe.execute()
+        except Exception as e:
+            self.counters['errors'] += 1
+            logger.error(f"删除结果缓存失败: {e}")
+
+    async def _evict(self, client, count: int):
+        """淘汰最早写入的结果，同时清理索引中已过期的键"""
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(self.index_key, '-inf', time.time() - self.ttl)
+            pipe.zpopmin(self.index_key, count)
+            _, evicted = await pipe.execute()
+        if evicted:
+            await client.delete(*(key for key, _ in evicted))
+            self.counters['evictions'] += len(evicted)
+
+    async def get_or_generate(self, key: str,
+                              generate: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        读取缓存结果，未命中时生成并写入缓存
+
+        同一进程内相同缓存键的任务正在生成时，等待该任务的结果而不重复生成；
+        其他副本正在生成时（Redis中存在生成标记），轮询等待其写入缓存，标记过期后自行生成
+        """
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                cached = await self.get(key)
+                if cached is not None:
+                    return cached
+                # 读取缓存期间可能已有相同任务开始生成
+                inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+
+            self.counters['shared'] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # 负责生成的任务被取消，重新尝试
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        token = None
+        try:
+            # 其他副本生成的结果读取缓存时已计为命中
+            result, token = await self._claim(key)
+            if result is None:
+                self.counters['misses'] += 1
+                result = await self._generate(key, token, generate)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 避免无人等待时出现未获取异常的警告
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            if token is not None:
+                await self._release(key, token)
+
+        future.set_result(result)
+        return result
+
+    async def _claim(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        在Redis中设置生成标记
+
+        返回 (其他副本生成的结果, None) 或 (None, 标记令牌)；Redis不可用时不设标记，直接由本进程生成
+        """
+        if not self.enabled:
+            return None, None
+        token = uuid.uuid4().hex
+        while True:
+            try:
+                client = await self._client()
+                if await client.set(f"{key}:inflight", token, nx=True, ex=self.lock_ttl):
+                    return None, token
+            except Exception as e:
+                self.counters['errors'] += 1
+                logger.error(f"设置结果生成标记失败: {e}")
+                return None, None
+
+            # 其他副本正在生成，等待结果写入或标记释放（生成失败）、过期（副本退出）
+            await asyncio.sleep(self.poll_interval)
+            cached = await self.get(key)
+            if cached is not None:
+                return cached, None
+
+    async def _generate(self, key: str, token: Optional[str],
+                        generate: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """生成并写入缓存，生成期间定期续期生成标记"""
+        renew = asyncio.create_task(self._renew(key, token)) if token is not None else None
+        try:
+            result = await generate()
+        finally:
+            if renew is not None:
+                renew.cancel()
+                await asyncio.gather(renew, return_exceptions=True)
+        await self.set(key, result)
+        return result
+
+    async def _renew(self, key: str, token: str):
+        """生成耗时超过标记有效期时续期，避免其他副本重复生成"""
+        lock_key = f"{key}:inflight"
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                client = await self._client()
+                if await client.get(lock_key) != token:
+                    return
+                await client.expire(lock_key, self.lock_ttl)
+            except Exception as e:
+                logger.warning(f"续期结果生成标记失败: {e}")
+
+    async def _release(self, key: str, token: str):
+        """删除本进程设置的生成标记，标记已过期并被其他副本重新设置时保留"""
+        lock_key = f"{key}:inflight"
+        try:
+            client = await self._client()
+            async with client.pipeline(transaction=True) as pipe:
+                await pipe.watch(lock_key)
+                if await pipe.get(lock_key) != token:
+                    return
+                pipe.multi()
+                pipe.delete(lock_key)
+                await pipe.execute()
+        except WatchError:
+            pass
+        except Exception as e:
+            self.counters['errors'] += 1
+            logger.error(f"删除结果生成标记失败: {e}")
+
+    @staticmethod
+    def _files_exist(result: Dict[str, Any]) -> bool:
+        image_path = result.get('image_path')
+        if not image_path:
+            return True
+        return os.path.exists(os.path.join(settings.STORAGE_PATH, image_path))
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        # 命中缓存或复用进行中的生成都不需要重新生成
+        served = self.counters['hits'] + self.counters['shared']
+        lookups = served + self.counters['misses']
+        return {
+            **self.counters,
+            'enabled': self.enabled,
+            'inflight': len(self._inflight),
+            'hit_rate': round(served / lookups, 4) if lookups else 0.0
+        }
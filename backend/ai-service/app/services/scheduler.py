@@ -0,0 +1,104 @@
+"""
+生成任务调度
+按生成类型划分加权车道，车道之间平滑加权轮询，车道内按用户轮询保证公平
+"""
+
+from collections import OrderedDict, deque
+from typing import Dict, Any, Iterable, Optional
+
+from app.core.config import settings
+
+
+DEFAULT_USER = 'anonymous'
+
+
+def task_lane(task_data: Dict[str, Any]) -> str:
+    """任务所属车道（生成类型）"""
+    return task_data.get('type') or 'default'
+
+
+def task_user(task_data: Dict[str, Any]) -> str:
+    """任务所属用户"""
+    return str(task_data.get('user_id') or DEFAULT_USER)
+
+
+class LaneSelector:
+    """平滑加权轮询选择车道"""
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None):
+        self.weights = settings.lane_weights if weights is None else dict(weights)
+        self.current: Dict[str, int] = {}
+
+    def weight(self, lane: str) -> int:
+        """车道权重，未配置的车道权重为1"""
+        return max(self.weights.get(lane, 1), 1)
+
+    def select(self, candidates: Iterable[str]) -> Optional[str]:
+        """从有任务的车道中选出下一个车道"""
+        candidates = list(candidates)
+        if not candidates:
+            return None
+
+        total = 0
+        for lane in candidates:
+            weight = self.weight(lane)
+            self.current[lane] = self.current.get(lane, 0) + weight
+            total += weight
+
+        selected = max(candidates, key=lambda lane: self.current[lane])
+        self.current[selected] -= total
+        return selected
+
+
+class _Lane:
+    """车道：按用户分组的任务队列"""
+
+    def __init__(self):
+        self.users: "OrderedDict[str, deque]" = OrderedDict()
+        self.size = 0
+
+    def push(self, user: str, task_data: Dict[str, Any], front: bool = False):
+        tasks = self.users.setdefault(user, deque())
+        if front:
+            tasks.appendleft(task_data)
+        else:
+            tasks.append(task_data)
+        self.size += 1
+
+    def pop(self) -> Dict[str, Any]:
+        # 取队首用户的一个任务，该用户仍有任务时移到队尾
+        user, tasks = next(iter(self.users.items()))
+        task_data = tasks.popleft()
+        if tasks:
+            self.users.move_to_end(user)
+        else:
+            del self.users[user]
+        self.size -= 1
+        return task_data
+
+
+class FairScheduler:
+    """进程内公平调度器"""
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None):
+        self.selector = LaneSelector(weights)
+        self.lanes: Dict[str, _Lane] = {}
+
+    def push(self, task_data: Dict[str, Any], front: bool = False):
+        """加入任务，front为True时放到该用户队列的最前面"""
+        lane = self.lanes.setdefault(task_lane(task_data), _Lane())
+        lane.push(task_user(task_data), task_data, front)
+
+    def pop(self) -> Optional[Dict[str, Any]]:
+        """按调度策略取出下一个任务，没有任务时返回None"""
+        lane = self.selector.select(name for name, lane in self.lanes.items() if lane.size)
+        if lane is None:
+            return None
+        return self.lanes[lane].pop()
+
+    def depths(self) -> Dict[str, int]:
+        """各车道等待的任务数"""
+        return {name: lane.size for name, lane in self.lanes.items()}
+
+    def __len__(self) -> int:
+        return sum(lane.size for lane in self.lanes.values())
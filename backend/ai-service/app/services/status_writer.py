@@ -0,0 +1,174 @@
+"""
+任务状态写入
+中间进度只即时写入Redis并发布进度事件，MySQL写入先合并缓冲再批量刷新；终态立即落库
+"""
+
+import asyncio
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.redis_client import get_redis
+from app.services.task_events import task_channel
+
+
+TERMINAL_STATUSES = ('completed', 'failed')
+
+# 各终态任务数累计（Redis哈希）
+TASK_TOTALS_KEY = 'ai:task_totals'
+
+# 批量刷新中间进度；已进入终态的记录不会被较早的进度覆盖
+PROGRESS_UPDATE_QUERY = """
+    UPDATE fazd_generation_records
+    SET status = %s, progress = %s
+    WHERE task_id = %s AND status NOT IN ('completed', 'failed')
+"""
+
+
+class TaskStatusWriter:
+    """任务状态写入器（write-behind）"""
+
+    def __init__(self, flush_interval: Optional[float] = None, batch_size: Optional[int] = None):
+        self.flush_interval = settings.STATUS_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.batch_size = settings.STATUS_FLUSH_BATCH_SIZE if batch_size is None else batch_size
+        # task_id -> (status, progress)，同一任务只保留最新的进度
+        self._pending: Dict[str, Tuple[str, int]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.counters = {
+            'writes': 0,
+            'buffered': 0,
+            'coalesced': 0,
+            'immediate_writes': 0,
+            'flushes': 0,
+            'flushed_rows': 0,
+            'flush_errors': 0
+        }
+
+    def start(self):
+        """启动后台刷新任务"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """停止后台刷新并写出剩余的缓冲记录"""
+        if self._flush_task:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+        logger.info(f"任务状态缓冲已刷新: {self.stats()}")
+
+    async def write(self, task_id: str, status: str, progress: int,
+                    result: Optional[Dict] = None):
+        """写入任务状态：Redis立即更新，MySQL按状态决定立即写入或缓冲"""
+        self.counters['writes'] += 1
+
+        # 更新Redis缓存、推送进度并累计终态数，一次往返完成
+        redis = await get_redis()
+        cache_key = f"task:{task_id}"
+        task_info = {
+            'status': status,
+            'progress': progress,
+            'updated_at': time.time()
+        }
+        if result:
+            task_info['result'] = result
+
+        try:
+            async with redis.pipeline() as pipe:
+                pipe.set(cache_key, task_info, expire=3600)  # 缓存1小时
+                # 推送给订阅该任务进度的客户端
+                pipe.publish(task_channel(task_id), {'task_id': task_id, **task_info})
+                if status in TERMINAL_STATUSES:
+                    pipe.hincrby(TASK_TOTALS_KEY, status, 1)
+        except Exception as e:
+            logger.error(f"更新任务状态缓存失败: {task_id} ({e})")
+
+        if status in TERMINAL_STATUSES:
+            # 终态立即落库，缓冲中的中间进度随之作废
+            if self._pending.pop(task_id, None) is not None:
+                self.counters['coalesced'] += 1
+            self.counters['immediate_writes'] += 1
+            await self._write_terminal(task_id, status, progress, result)
+            return
+
+        if task_id in self._pending:
+            self.counters['coalesced'] += 1
+        else:
+            self.counters['buffered'] += 1
+        self._pending[task_id] = (status, progress)
+
+        if len(self._pending) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        """批量写出缓冲的中间进度"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            pending, self._pending = self._pending, {}
+            params_list = [(status, progress, task_id)
+                           for task_id, (status, progress) in pending.items()]
+            try:
+                db = await get_db()
+                await db.execute_many(PROGRESS_UPDATE_QUERY, params_list)
+                self.counters['flushes'] += 1
+                self.counters['flushed_rows'] += len(params_list)
+            except Exception as e:
+                self.counters['flush_errors'] += 1
+                logger.error(f"批量写入任务状态失败: {e}")
+                # 放回未被更新状态覆盖的记录，等待下次刷新
+                for task_id, state in pending.items():
+                    self._pending.setdefault(task_id, state)
+
+    async def _flush_loop(self):
+        """定时刷新缓冲"""
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"任务状态刷新循环出错: {e}")
+
+    async def _write_terminal(self, task_id: str, status: str, progress: int,
+                              result: Optional[Dict]):
+        """立即写入终态"""
+        update_query = """
+            UPDATE fazd_generation_records
+            SET status = %s, progress = %s
+        """
+        params = [status, progress]
+
+        if result:
+            update_query += ", output_image_path = %s"
+            params.append(result.get('image_path'))
+
+            if result.get('file_size'):
+                update_query += ", file_size = %s, dimensions = %s"
+                params.extend([result['file_size'], result.get('dimensions')])
+            if result.get('thumbnail_path'):
+                update_query += ", thumbnail_path = %s"
+                params.append(result['thumbnail_path'])
+
+            if status == 'completed':
+                update_query += ", completed_at = NOW(), generation_time = TIMESTAMPDIFF(SECOND, created_at, NOW())"
+            elif status == 'failed':
+                update_query += ", error_message = %s"
+                params.append(result.get('error'))
+
+        update_query += " WHERE task_id = %s"
+        params.append(task_id)
+
+        db = await get_db()
+        await db.execute_update(update_query, tuple(params))
+
+    def stats(self) -> Dict[str, Any]:
+        """写入统计"""
+        return {**self.counters, 'pending': len(self._pending)}
@@ -0,0 +1,122 @@
+"""
+模型流式输出处理
+增量读取模型输出，在完整响应返回前提取已完成的JSON片段
+"""
+
+import asyncio
+import json
+import re
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+
+class StreamingJSONScanner:
+    """
+    增量JSON扫描器
+
+    array_key: 数组字段名，该数组中的对象一旦闭合即返回
+    fields: 需要尽早取得的字符串字段名
+    """
+
+    def __init__(self, array_key: Optional[str] = None, fields: Iterable[str] = ()):
+        self.array_key = array_key
+        self.fields = tuple(fields)
+        self.found: Dict[str, str] = {}
+        self.text = ''
+        self._pos = 0
+        # 容器栈：(类型, 所属字段名, 对象起始位置或None)
+        self._stack: List[tuple] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """读入一段输出，返回新闭合的数组元素对象"""
+        self.text += chunk
+        items = []
+        text = self.text
+
+        while self._pos < len(text):
+            char = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start:self._pos]
+            elif not self._stack:
+                # 忽略JSON之前的说明文字和代码块标记
+                if char == '{':
+                    self._stack.append(('{', None, None))
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos + 1
+            elif char == ':':
+                self._current_key = self._last_string
+            elif char == ',':
+                self._current_key = None
+            elif char == '[':
+                self._stack.append(('[', self._current_key, None))
+                self._current_key = None
+            elif char == '{':
+                parent = self._stack[-1]
+                is_item = parent[0] == '[' and parent[1] == self.array_key
+                self._stack.append(('{', self._current_key, self._pos if is_item else None))
+                self._current_key = None
+            elif char in '}]':
+                _, _, start = self._stack.pop()
+                if start is not None:
+                    try:
+                        items.append(json.loads(text[start:self._pos + 1]))
+                    except json.JSONDecodeError:
+                        pass
+            self._pos += 1
+
+        self._find_fields()
+        return items
+
+    def _find_fields(self):
+        for field in self.fields:
+            if field in self.found:
+                continue
+            match = re.search(rf'"{re.escape(field)}"\s*:\s*"((?:[^"\\]|\\.)*)"', self.text)
+            if match:
+                try:
+                    self.found[field] = json.loads(f'"{match.group(1)}"')
+                except json.JSONDecodeError:
+                    continue
+
+
+async def stream_model_text(model, prompt: str, executor: Optional[Executor] = None,
+                            request_options: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """在线程中（默认线程池或executor）读取模型的流式响应，逐段产出文本"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def produce():
+        try:
+            options = {'request_options': request_options} if request_options else {}
+            for chunk in model.generate_content(prompt, stream=True, **options):
+                loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    producer = asyncio.ensure_future(loop.run_in_executor(executor, produce))
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        if producer.done():
+            await producer
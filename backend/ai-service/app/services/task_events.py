@@ -0,0 +1,124 @@
+"""
+任务进度推送
+任务状态更新时通过Redis发布事件；每个进程只为同一任务订阅一次，再分发给本进程内的所有订阅者
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+
+
+TERMINAL_STATUSES = ('completed', 'failed')
+
+
+def task_channel(task_id: str) -> str:
+    """任务事件频道"""
+    return f"{settings.TASK_EVENTS_CHANNEL_PREFIX}:{task_id}"
+
+
+class TaskEventHub:
+    """任务事件分发中心"""
+
+    def __init__(self, redis_client=None, queue_size: int = 64):
+        self.client = redis_client
+        self.queue_size = queue_size
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._closing = False
+        self._lock = asyncio.Lock()
+        # task_id -> 本进程内的订阅者队列
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.counters = {'events': 0, 'deliveries': 0, 'dropped': 0, 'redis_subscriptions': 0}
+
+    async def _ensure_started(self):
+        if self._pubsub is not None:
+            return
+        if self.client is None:
+            redis = await get_redis()
+            self.client = redis.redis_client
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+
+    @asynccontextmanager
+    async def subscribe(self, task_id: str) -> AsyncIterator[asyncio.Queue]:
+        """订阅任务事件，返回接收事件的队列"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        async with self._lock:
+            await self._ensure_started()
+            subscribers = self._subscribers.setdefault(task_id, set())
+            if not subscribers:
+                await self._pubsub.subscribe(task_channel(task_id))
+                self.counters['redis_subscriptions'] += 1
+            subscribers.add(queue)
+            if self._reader is None:
+                self._reader = asyncio.create_task(self._read_loop())
+        try:
+            yield queue
+        finally:
+            async with self._lock:
+                subscribers = self._subscribers.get(task_id)
+                if subscribers is not None:
+                    subscribers.discard(queue)
+                    if not subscribers:
+                        del self._subscribers[task_id]
+                        try:
+                            await self._pubsub.unsubscribe(task_channel(task_id))
+                        except Exception as e:
+                            logger.warning(f"取消订阅任务事件失败: {task_id} ({e})")
+
+    async def _read_loop(self):
+        """读取Redis消息并分发给本进程的订阅者"""
+        # 取消可能被读取消息时的超时处理吞掉，因此同时检查关闭标记
+        while not self._closing:
+            try:
+                if not self._subscribers:
+                    await asyncio.sleep(0.1)
+                    continue
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message.get('type') != 'message':
+                    continue
+                self._dispatch(json.loads(message['data']))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"读取任务事件失败: {e}")
+                await asyncio.sleep(1)
+
+    def _dispatch(self, event: Dict[str, Any]):
+        self.counters['events'] += 1
+        for queue in self._subscribers.get(event.get('task_id'), ()):
+            if queue.full():
+                # 订阅者消费过慢时丢弃最旧的事件，保留最新状态
+                queue.get_nowait()
+                self.counters['dropped'] += 1
+            queue.put_nowait(event)
+            self.counters['deliveries'] += 1
+
+    async def close(self):
+        """停止读取并关闭订阅连接"""
+        if self._reader:
+            self._closing = True
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+            self._closing = False
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    def stats(self) -> Dict[str, Any]:
+        """推送统计"""
+        return {
+            **self.counters,
+            'tasks': len(self._subscribers),
+            'subscribers': sum(len(queues) for queues in self._subscribers.values())
+        }
+
+
+# 全局任务事件分发中心实例
+task_event_hub = TaskEventHub()
@@ -0,0 +1,418 @@
+"""
+生成任务队列
+memory: 进程内公平调度队列；redis: 基于Redis列表的分布式队列，支持可见性超时与确认
+两种后端都按生成类型分车道，车道之间按配置的权重调度，车道内按用户轮询
+"""
+
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional
+
+from loguru import logger
+from redis.exceptions import ResponseError, WatchError
+
+from app.core.config import settings
+from app.core.redis_client import get_redis
+from app.services.scheduler import FairScheduler, LaneSelector, task_lane, task_user
+
+
+# 入队通知列表的最大长度
+SIGNAL_MAX_LENGTH = 1024
+
+# 从车道的用户轮转列表左侧取出用户，把该用户最早的任务移入处理中列表，用户仍有任务时放回轮转列表末尾
+# KEYS: 用户轮转列表, 处理中列表, 车道深度; ARGV: 用户队列键前缀, 车道（用户队列键在脚本内拼出，不适用于Redis Cluster）
+POP_SCRIPT = """
+local user = redis.call('LPOP', KEYS[1])
+if not user then
+    return false
+end
+local pending = ARGV[1] .. user
+local task_id = redis.call('LMOVE', pending, KEYS[2], 'RIGHT', 'LEFT')
+if redis.call('LLEN', pending) > 0 then
+    redis.call('RPUSH', KEYS[1], user)
+end
+if task_id then
+    redis.call('HINCRBY', KEYS[3], ARGV[2], -1)
+end
+return task_id
+"""
+
+
+class TaskQueue(ABC):
+    """任务队列接口"""
+
+    backend = 'base'
+
+    async def start(self):
+        """启动队列"""
+
+    async def close(self):
+        """关闭队列"""
+
+    @abstractmethod
+    async def put(self, task_data: Dict[str, Any]):
+        """加入任务"""
+
+    @abstractmethod
+    async def get(self) -> Dict[str, Any]:
+        """取出任务，队列为空时等待"""
+
+    @abstractmethod
+    async def ack(self, task_data: Dict[str, Any]):
+        """确认任务已处理完成（成功或失败）"""
+
+    @abstractmethod
+    async def nack(self, task_data: Dict[str, Any]):
+        """放弃处理任务，使其可以被重新投递"""
+
+    async def size(self) -> int:
+        """等待处理的任务数"""
+        return sum((await self.lane_depths()).values())
+
+    @abstractmethod
+    async def lane_depths(self) -> Dict[str, int]:
+        """各车道等待处理的任务数"""
+
+    def stats(self) -> Dict[str, Any]:
+        """队列统计"""
+        return {'backend': self.backend}
+
+
+class MemoryTaskQueue(TaskQueue):
+    """进程内任务队列：车道间加权、车道内按用户轮询"""
+
+    backend = 'memory'
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None):
+        self.scheduler = FairScheduler(weights)
+        self._available = asyncio.Condition()
+
+    async def put(self, task_data: Dict[str, Any]):
+        async with self._available:
+            self.scheduler.push(task_data)
+            self._available.notify()
+
+    async def get(self) -> Dict[str, Any]:
+        async with self._available:
+            await self._available.wait_for(lambda: len(self.scheduler) > 0)
+            return self.scheduler.pop()
+
+    async def ack(self, task_data: Dict[str, Any]):
+        # 进程内队列取出即移除，无需确认
+        pass
+
+    async def nack(self, task_data: Dict[str, Any]):
+        # 进程内队列随进程退出而丢失，无需重新投递
+        pass
+
+    async def size(self) -> int:
+        return len(self.scheduler)
+
+    async def lane_depths(self) -> Dict[str, int]:
+        return self.scheduler.depths()
+
+
+class RedisTaskQueue(TaskQueue):
+    """
+    Redis分布式任务队列
+
+    {prefix}:pending:{lane}:{user} 车道内各用户的待处理任务ID列表（LPUSH入队，从右侧取出）
+    {prefix}:users:{lane} 车道内有待处理任务的用户轮转列表（从左侧取出，仍有任务时放回右侧）
+    {prefix}:depths     车道 -> 待处理任务数
+    {prefix}:signal     入队通知，空闲的消费者在此阻塞等待
+    {prefix}:processing 处理中任务ID列表
+    {prefix}:deadlines  处理中任务的可见性截止时间（有序集合）
+    {prefix}:payloads   任务ID -> 任务数据
+    {prefix}:deliveries 任务ID -> 投递次数
+    {prefix}:dead       超过最大投递次数的任务ID
+
+    出队由Lua脚本原子完成，Redis不支持脚本时改用WATCH事务；入队与重新入队使用WATCH事务，
+    保证用户在轮转列表中当且仅当其队列非空
+    """
+
+    backend = 'redis'
+
+    def __init__(self, redis_client=None, prefix: Optional[str] = None,
+                 visibility_timeout: Optional[int] = None,
+                 max_deliveries: Optional[int] = None,
+                 poll_timeout: Optional[float] = None,
+                 weights: Optional[Dict[str, int]] = None,
+                 use_scripts: Optional[bool] = None):
+        self.client = redis_client
+        self.selector = LaneSelector(weights)
+        self.prefix = prefix or settings.QUEUE_KEY_PREFIX
+        self.visibility_timeout = visibility_timeout or settings.QUEUE_VISIBILITY_TIMEOUT
+        self.max_deliveries = max_deliveries or settings.QUEUE_MAX_DELIVERIES
+        self.poll_timeout = poll_timeout or settings.QUEUE_POLL_TIMEOUT
+        # None表示首次出队时检测Redis是否支持Lua脚本
+        self.use_scripts = use_scripts
+        self.depths_key = f"{self.prefix}:depths"
+        self.signal_key = f"{self.prefix}:signal"
+        self.processing_key = f"{self.prefix}:processing"
+        self.deadlines_key = f"{self.prefix}:deadlines"
+        self.payloads_key = f"{self.prefix}:payloads"
+        self.deliveries_key = f"{self.prefix}:deliveries"
+        self.dead_key = f"{self.prefix}:dead"
+        self._pop_script = None
+        self._reaper_task: Optional[asyncio.Task] = None
+        self.counters = {'enqueued': 0, 'delivered': 0, 'acked': 0, 'redelivered': 0, 'dead': 0}
+
+    async def start(self):
+        """获取Redis连接并启动超时任务回收"""
+        if self.client is None:
+            redis = await get_redis()
+            self.client = redis.redis_client
+        if self._reaper_task is None:
+            self._reaper_task = asyncio.create_task(self._reaper_loop())
+        logger.info(f"Redis任务队列已启动: {self.prefix}")
+
+    async def close(self):
+        """停止超时任务回收"""
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            await asyncio.gather(self._reaper_task, return_exceptions=True)
+            self._reaper_task = None
+
+    def users_key(self, lane: str) -> str:
+        """车道的用户轮转列表键"""
+        return f"{self.prefix}:users:{lane}"
+
+    def pending_prefix(self, lane: str) -> str:
+        """车道内用户待处理列表键的前缀"""
+        return f"{self.prefix}:pending:{lane}:"
+
+    def pending_key(self, lane: str, user: str) -> str:
+        """车道内用户的待处理列表键"""
+        return self.pending_prefix(lane) + user
+
+    def _push(self, pipe, task_id: str, lane: str, user: str, waiting: int, front: bool = False):
+        """
+        在事务中把任务加入用户队列，waiting为WATCH后读取的用户队列长度
+
+        用户原本没有等待的任务时加入轮转列表；front为True时任务和用户都排在最前面
+        """
+        pending = self.pending_key(lane, user)
+        if front:
+            pipe.rpush(pending, task_id)
+        else:
+            pipe.lpush(pending, task_id)
+        if not waiting:
+            if front:
+                pipe.lpush(self.users_key(lane), user)
+            else:
+                pipe.rpush(self.users_key(lane), user)
+        pipe.hincrby(self.depths_key, lane, 1)
+
+    async def put(self, task_data: Dict[str, Any]):
+        task_id = task_data['task_id']
+        lane, user = task_lane(task_data), task_user(task_data)
+        pending = self.pending_key(lane, user)
+        payload = json.dumps(task_data, ensure_ascii=False)
+
+        async def enqueue(pipe):
+            waiting = await pipe.llen(pending)
+            pipe.multi()
+            pipe.hset(self.payloads_key, task_id, payload)
+            self._push(pipe, task_id, lane, user, waiting)
+            pipe.lpush(self.signal_key, 1)
+            pipe.ltrim(self.signal_key, 0, SIGNAL_MAX_LENGTH - 1)
+
+        await self.client.transaction(enqueue, pending)
+        self.counters['enqueued'] += 1
+
+    async def get(self) -> Dict[str, Any]:
+        while True:
+            depths = await self.lane_depths()
+            lane = self.selector.select(name for name, depth in depths.items() if depth > 0)
+            if lane is None:
+                # 所有车道为空时等待入队通知，超时需小于Redis客户端的socket超时
+                await self.client.blpop(self.signal_key, self.poll_timeout)
+                continue
+
+            task_id = await self._pop(lane)
+            if task_id is None:
+                # 已被其他消费者取走
+                continue
+
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.zadd(self.deadlines_key, {task_id: time.time() + self.visibility_timeout})
+                pipe.hget(self.payloads_key, task_id)
+                pipe.hincrby(self.deliveries_key, task_id, 1)
+                _, payload, deliveries = await pipe.execute()
+
+            if payload is None:
+                # 任务已被确认（例如回收与确认并发时的重复投递）
+                await self._remove(task_id)
+                continue
+
+            self.counters['delivered'] += 1
+            if deliveries > 1:
+                self.counters['redelivered'] += 1
+                logger.warning(f"任务重新投递: {task_id} (第{deliveries}次)")
+            return json.loads(payload)
+
+    async def _pop(self, lane: str) -> Optional[str]:
+        """按用户轮转从车道取出一个任务ID并移入处理中列表，车道已空时返回None"""
+        if self.use_scripts is not False:
+            if self._pop_script is None:
+                self._pop_script = self.client.register_script(POP_SCRIPT)
+            try:
+                task_id = await self._pop_script(
+                    keys=[self.users_key(lane), self.processing_key, self.depths_key],
+                    args=[self.pending_prefix(lane), lane]
+                )
+            except ResponseError as e:
+                if self.use_scripts or 'unknown command' not in str(e).lower():
+                    raise
+                logger.warning(f"Redis不支持Lua脚本，任务出队改用WATCH事务: {e}")
+                self.use_scripts = False
+            else:
+                self.use_scripts = True
+                return task_id
+        return await self._pop_watched(lane)
+
+    async def _pop_watched(self, lane: str) -> Optional[str]:
+        """以WATCH事务完成与出队脚本相同的操作"""
+        users_key = self.users_key(lane)
+        async with self.client.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(users_key)
+                    user = await pipe.lindex(users_key, 0)
+                    if user is None:
+                        return None
+                    pending = self.pending_key(lane, user)
+                    await pipe.watch(pending)
+                    waiting = await pipe.llen(pending)
+
+                    pipe.multi()
+                    pipe.lmove(pending, self.processing_key, 'RIGHT', 'LEFT')
+                    pipe.lpop(users_key)
+                    if waiting > 1:
+                        pipe.rpush(users_key, user)
+                    if waiting:
+                        pipe.hincrby(self.depths_key, lane, -1)
+                    task_id, *_ = await pipe.execute()
+                    return task_id
+                except WatchError:
+                    # 轮转列表或用户队列在读取后被修改，重新读取
+                    continue
+
+    async def ack(self, task_data: Dict[str, Any]):
+        await self._remove(task_data['task_id'])
+        self.counters['acked'] += 1
+
+    async def nack(self, task_data: Dict[str, Any]):
+        task_id = task_data['task_id']
+        lane, user = task_lane(task_data), task_user(task_data)
+        pending = self.pending_key(lane, user)
+
+        async def requeue(pipe):
+            waiting = await pipe.llen(pending)
+            pipe.multi()
+            pipe.lrem(self.processing_key, 1, task_id)
+            pipe.zrem(self.deadlines_key, task_id)
+            self._push(pipe, task_id, lane, user, waiting, front=True)
+            pipe.lpush(self.signal_key, 1)
+
+        await self.client.transaction(requeue, pending)
+
+    async def lane_depths(self) -> Dict[str, int]:
+        depths = await self.client.hgetall(self.depths_key)
+        return {lane: int(depths[lane]) for lane in sorted(depths)}
+
+    async def _remove(self, task_id: str):
+        """从处理中列表移除任务并删除任务数据"""
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key, 1, task_id)
+            pipe.zrem(self.deadlines_key, task_id)
+            pipe.hdel(self.payloads_key, task_id)
+            pipe.hdel(self.deliveries_key, task_id)
+            await pipe.execute()
+
+    async def requeue_expired(self) -> int:
+        """将超过可见性超时仍未确认的任务放回待处理队列，返回处理数量"""
+        now = time.time()
+
+        # 取出后尚未记录截止时间的任务（消费者在两步之间退出），补记截止时间
+        processing = await self.client.lrange(self.processing_key, 0, -1)
+        if processing:
+            scores = await self.client.zmscore(self.deadlines_key, processing)
+            orphans = {task_id: now + self.visibility_timeout
+                       for task_id, score in zip(processing, scores) if score is None}
+            if orphans:
+                await self.client.zadd(self.deadlines_key, orphans, nx=True)
+
+        expired = await self.client.zrangebyscore(self.deadlines_key, '-inf', now)
+        reclaimed = 0
+        for task_id in expired:
+            outcome = await self._reclaim(task_id, now)
+            if outcome is None:
+                continue
+            reclaimed += 1
+            if outcome == 'dead':
+                self.counters['dead'] += 1
+                logger.error(f"任务超过最大投递次数，已放弃: {task_id}")
+            elif outcome == 'requeued':
+                logger.warning(f"任务处理超时，重新入队: {task_id}")
+        return reclaimed
+
+    async def _reclaim(self, task_id: str, now: float) -> Optional[str]:
+        """
+        回收单个超时任务，返回 requeued、dead 或 acked（已确认，只需清理）
+
+        在WATCH截止时间集合的事务中确认任务仍然超时后再移出处理中列表，
+        多个回收者并发或任务已被重新投递时不会重复入队，此时返回None
+        """
+        async def reclaim(pipe):
+            deadline = await pipe.zscore(self.deadlines_key, task_id)
+            if deadline is None or deadline > now:
+                return None
+            deliveries = int(await pipe.hget(self.deliveries_key, task_id) or 0)
+            payload = await pipe.hget(self.payloads_key, task_id)
+            if payload is not None and deliveries < self.max_deliveries:
+                task_data = json.loads(payload)
+                lane, user = task_lane(task_data), task_user(task_data)
+                await pipe.watch(self.pending_key(lane, user))
+                waiting = await pipe.llen(self.pending_key(lane, user))
+
+            pipe.multi()
+            pipe.lrem(self.processing_key, 1, task_id)
+            pipe.zrem(self.deadlines_key, task_id)
+            if payload is None:
+                return 'acked'
+            if deliveries >= self.max_deliveries:
+                pipe.lpush(self.dead_key, task_id)
+                pipe.hdel(self.payloads_key, task_id)
+                pipe.hdel(self.deliveries_key, task_id)
+                return 'dead'
+            # 排在该用户与车道的最前面，优先于新任务被取出
+            self._push(pipe, task_id, lane, user, waiting, front=True)
+            pipe.lpush(self.signal_key, 1)
+            return 'requeued'
+
+        return await self.client.transaction(reclaim, self.deadlines_key, value_from_callable=True)
+
+    async def _reaper_loop(self):
+        """定期回收超时任务"""
+        interval = max(self.visibility_timeout / 10, 1)
+        while True:
+            try:
+                await asyncio.sleep(interval)
+                await self.requeue_expired()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"回收超时任务失败: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.backend, **self.counters}
+
+
+def create_task_queue() -> TaskQueue:
+    """根据配置创建任务队列"""
+    if settings.QUEUE_BACKEND == 'redis':
+        return RedisTaskQueue()
+    return MemoryTaskQueue()
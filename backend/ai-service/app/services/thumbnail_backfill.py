@@ -0,0 +1,143 @@
+"""
+缩略图补全
+为已完成但缺少缩略图的生成记录批量生成缩略图，并回写 thumbnail_path：
+    python -m app.services.thumbnail_backfill [--batch-size 100] [--concurrency 4] [--limit 1000]
+"""
+
+import argparse
+import asyncio
+import os
+from typing import Dict, Any, Optional
+
+from loguru import logger
+from PIL import Image
+
+from app.core.config import settings
+from app.core.database import close_db, get_db, init_db
+from app.services.image_encoding import (
+    encode_image, make_thumbnail, resolve_format, resolve_quality, thumbnail_path
+)
+
+
+# 按主键分页，缩略图生成失败的记录不会被重复读取
+MISSING_THUMBNAILS_QUERY = """
+    SELECT id, task_id, output_image_path
+    FROM fazd_generation_records
+    WHERE status = 'completed' AND output_image_path IS NOT NULL
+      AND thumbnail_path IS NULL AND id > %s
+    ORDER BY id
+    LIMIT %s
+"""
+
+THUMBNAIL_UPDATE_QUERY = """
+    UPDATE fazd_generation_records
+    SET thumbnail_path = %s
+    WHERE id = %s
+"""
+
+# output_image_path 的前缀，对应 GENERATED_PATH
+GENERATED_PREFIX = 'generated/'
+
+
+def local_path(image_path: str) -> str:
+    """记录中的图片路径对应的本地文件路径"""
+    if image_path.startswith(GENERATED_PREFIX):
+        image_path = image_path[len(GENERATED_PREFIX):]
+    return os.path.join(settings.GENERATED_PATH, image_path)
+
+
+def create_thumbnail_file(image_path: str) -> Optional[str]:
+    """
+    读取原图生成缩略图文件，返回缩略图路径
+
+    缩略图使用默认输出格式；原图不存在或不生成缩略图时返回None
+    """
+    source = local_path(image_path)
+    if not os.path.exists(source):
+        return None
+
+    with Image.open(source) as img:
+        thumbnail = make_thumbnail(img)
+        if thumbnail is None:
+            return None
+        if thumbnail is img:
+            return image_path
+        encoded = encode_image(thumbnail, resolve_format(), resolve_quality())
+
+    path = thumbnail_path(image_path, encoded.extension)
+    with open(local_path(path), 'wb') as f:
+        f.write(encoded.data)
+    return path
+
+
+class ThumbnailBackfill:
+    """缩略图补全任务"""
+
+    def __init__(self, batch_size: int = 100, concurrency: int = 4):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.counters = {'scanned': 0, 'created': 0, 'missing': 0, 'failed': 0}
+
+    async def run(self, limit: Optional[int] = None) -> Dict[str, Any]:
+        """处理缺少缩略图的记录，limit为最多处理的记录数"""
+        if settings.THUMBNAIL_SIZE <= 0:
+            logger.warning("THUMBNAIL_SIZE 不大于0，不生成缩略图")
+            return dict(self.counters)
+
+        db = await get_db()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        last_id = 0
+
+        while limit is None or self.counters['scanned'] < limit:
+            batch_size = self.batch_size
+            if limit is not None:
+                batch_size = min(batch_size, limit - self.counters['scanned'])
+            records = await db.execute_query(MISSING_THUMBNAILS_QUERY, (last_id, batch_size))
+            if not records:
+                break
+            last_id = records[-1]['id']
+            self.counters['scanned'] += len(records)
+
+            paths = await asyncio.gather(*(self._process(record, semaphore) for record in records))
+            updates = [(path, record['id']) for record, path in zip(records, paths) if path]
+            await db.execute_many(THUMBNAIL_UPDATE_QUERY, updates)
+            logger.info(f"缩略图补全进度: {self.counters}")
+
+        return dict(self.counters)
+
+    async def _process(self, record: Dict[str, Any], semaphore: asyncio.Semaphore) -> Optional[str]:
+        """在线程中生成单条记录的缩略图"""
+        async with semaphore:
+            try:
+                path = await asyncio.to_thread(create_thumbnail_file, record['output_image_path'])
+            except Exception as e:
+                self.counters['failed'] += 1
+                logger.warning(f"生成缩略图失败: {record['task_id']} ({e})")
+                return None
+
+        if path is None:
+            self.counters['missing'] += 1
+        else:
+            self.counters['created'] += 1
+        return path
+
+
+async def _main(args):
+    await init_db()
+    try:
+        stats = await ThumbnailBackfill(args.batch_size, args.concurrency).run(args.limit)
+    finally:
+        await close_db()
+    logger.info(f"缩略图补全完成: {stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为缺少缩略图的生成记录补全缩略图")
+    parser.add_argument('--batch-size', type=int, default=100, help="每批读取的记录数")
+    parser.add_argument('--concurrency', type=int, default=4, help="同时生成缩略图的数量")
+    parser.add_argument('--limit', type=int, default=None, help="最多处理的记录数")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Redis编解码基准测试
+
+用实际任务状态数据比较各编码方式的编解码耗时与存储大小：
+    python -m benchmarks.codec_benchmark [--number 2000] [--json]
+"""
+
+import argparse
+import json
+import time
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.core.redis_client import RedisCodec, msgpack
+from app.services.ai_service import AIService
+
+
+def task_payloads() -> Dict[str, Dict[str, Any]]:
+    """典型的任务状态缓存数据（task:{task_id}）"""
+    service = AIService()
+    parameters = {'width': 800, 'height': 300, 'style': '激励', 'backgroundColor': '#ff0000'}
+    design = service._get_default_banner_design("樊振东必胜横幅")
+    return {
+        'progress': {'status': 'processing', 'progress': 30, 'updated_at': time.time()},
+        'banner': {
+            'status': 'completed', 'progress': 100, 'updated_at': time.time(),
+            'result': {
+                'type': 'banner', 'content': design['mainTitle'], 'design_data': design,
+                'image_path': 'generated/banners/task-0001.png', 'parameters': parameters
+            }
+        },
+        'slogan': {
+            'status': 'completed', 'progress': 100, 'updated_at': time.time(),
+            'result': {
+                'type': 'slogan', 'parameters': parameters,
+                'slogans': [
+                    {'type': '简短有力', 'text': '樊振东必胜！', 'description': '适用于赛场应援',
+                     'visualStyle': {'presentationType': 'card', 'backgroundColor': '#FF0000',
+                                     'textColor': '#FFFFFF', 'fontSize': 'large',
+                                     'elements': ['star', 'lightning'], 'effects': ['glow']}}
+                ] * 5
+            }
+        }
+    }
+
+
+def legacy_codec() -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    """引入编解码器之前的方式：json文本，读取时尝试解析"""
+    def encode(value):
+        return json.dumps(value, ensure_ascii=False).encode('utf-8')
+
+    def decode(data):
+        try:
+            return json.loads(data.decode('utf-8'))
+        except json.JSONDecodeError:
+            return data.decode('utf-8')
+
+    return encode, decode
+
+
+def codecs() -> Dict[str, Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]]:
+    """参与比较的编码方式"""
+    candidates = {'legacy-json': legacy_codec()}
+    formats = ['json'] + (['msgpack'] if msgpack is not None else [])
+    for fmt in formats:
+        for threshold in (0, 1024):
+            codec = RedisCodec(fmt=fmt, compress_threshold=threshold)
+            name = f"{fmt}{'+zlib' if threshold else ''}"
+            candidates[name] = (codec.encode, codec.decode)
+    return candidates
+
+
+def run(number: int) -> List[Dict[str, Any]]:
+    """运行基准测试，返回每个（编码方式, 数据）的结果"""
+    results = []
+    for payload_name, payload in task_payloads().items():
+        for codec_name, (encode, decode) in codecs().items():
+            data = encode(payload)
+            assert decode(data) == payload
+            encode_time = min(timeit.repeat(lambda: encode(payload), number=number, repeat=3)) / number
+            decode_time = min(timeit.repeat(lambda: decode(data), number=number, repeat=3)) / number
+            results.append({
+                'payload': payload_name,
+                'codec': codec_name,
+                'bytes': len(data),
+                'encode_us': round(encode_time * 1e6, 2),
+                'decode_us': round(decode_time * 1e6, 2)
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redis编解码基准测试")
+    parser.add_argument('--number', type=int, default=2000, help="每轮执行次数")
+    parser.add_argument('--json', action='store_true', help="以JSON输出结果")
+    args = parser.parse_args()
+
+    results = run(args.number)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'payload':<10}{'codec':<16}{'bytes':>8}{'encode(us)':>12}{'decode(us)':>12}")
+    for row in results:
+        print(f"{row['payload']:<10}{row['codec']:<16}{row['bytes']:>8}"
+              f"{row['encode_us']:>12}{row['decode_us']:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+基准测试公共工具
+
+计时、统计，以及基准结果的保存与比较。基准文件为JSON：
+    {"meta": {...}, "results": {"名称": {"mean_ms": ..., "p50_ms": ..., "p95_ms": ..., "ops_per_sec": ...}}}
+"""
+
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from loguru import logger
+
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# 默认允许的变慢比例，超过即视为回退
+DEFAULT_TOLERANCE = 0.25
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """已排序样本的第q百分位（最近秩）"""
+    return ordered[min(int(len(ordered) * q / 100), len(ordered) - 1)]
+
+
+def summarize(samples: List[float], operations: int = 1) -> Dict[str, float]:
+    """
+    汇总耗时样本（秒）
+
+    operations: 每个样本包含的操作数，用于计算吞吐量
+    """
+    ordered = sorted(samples)
+    mean = statistics.fmean(ordered)
+    return {
+        'mean_ms': round(mean * 1000, 4),
+        'p50_ms': round(percentile(ordered, 50) * 1000, 4),
+        'p95_ms': round(percentile(ordered, 95) * 1000, 4),
+        'ops_per_sec': round(operations / mean, 2) if mean else 0.0,
+        'samples': len(ordered)
+    }
+
+
+def measure(func: Callable[[], Any], repeat: int, warmup: int = 1, operations: int = 1) -> Dict[str, float]:
+    """多次执行同步函数并汇总耗时"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, operations)
+
+
+async def measure_async(func: Callable[[], Awaitable[Any]], repeat: int, warmup: int = 1,
+                        operations: int = 1) -> Dict[str, float]:
+    """多次执行协程函数并汇总耗时"""
+    for _ in range(warmup):
+        await func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, operations)
+
+
+def quiet_logs():
+    """只输出警告以上的日志，避免逐次渲染的日志影响计时与输出"""
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+
+def run_async(coro):
+    """在新的事件循环中运行协程"""
+    return asyncio.run(coro)
+
+
+def metadata() -> Dict[str, Any]:
+    """基准运行环境，比较不同机器的结果时作参考"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+
+
+def baseline_path(suite: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{suite}.json")
+
+
+def save_baseline(path: str, results: Dict[str, Dict[str, float]]):
+    """保存基准结果"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': metadata(), 'results': results}, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Dict[str, float]]]:
+    """读取基准结果，文件不存在时返回None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['results']
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float = DEFAULT_TOLERANCE, metric: str = 'p50_ms') -> List[Dict[str, Any]]:
+    """
+    与基准比较，返回每项的变化
+
+    status: regression（慢于基准超过tolerance）/ improved（快于基准超过tolerance）/ ok / new
+    """
+    rows = []
+    for name, current in sorted(results.items()):
+        previous = baseline.get(name)
+        if previous is None or not previous.get(metric):
+            rows.append({'name': name, 'current': current[metric], 'baseline': None,
+                         'change': None, 'status': 'new'})
+            continue
+        change = current[metric] / previous[metric] - 1
+        if change > tolerance:
+            status = 'regression'
+        elif change < -tolerance:
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append({'name': name, 'current': current[metric], 'baseline': previous[metric],
+                     'change': round(change, 4), 'status': status})
+    return rows
+
+
+def print_results(results: Dict[str, Dict[str, float]]):
+    print(f"{'benchmark':<48}{'mean(ms)':>12}{'p50(ms)':>12}{'p95(ms)':>12}{'ops/s':>12}")
+    for name, row in sorted(results.items()):
+        print(f"{name:<48}{row['mean_ms']:>12}{row['p50_ms']:>12}{row['p95_ms']:>12}{row['ops_per_sec']:>12}")
+
+
+def print_comparison(rows: List[Dict[str, Any]]):
+    print(f"{'benchmark':<48}{'baseline':>12}{'current':>12}{'change':>10}  status")
+    for row in rows:
+        change = f"{row['change']:+.1%}" if row['change'] is not None else '-'
+        baseline = row['baseline'] if row['baseline'] is not None else '-'
+        print(f"{row['name']:<48}{baseline:>12}{row['current']:>12}{change:>10}  {row['status']}")
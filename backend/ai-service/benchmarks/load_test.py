@@ -0,0 +1,430 @@
+"""
+端到端压测
+
+以开环方式（按到达率发出请求，不等待之前的请求完成）调用 POST /api/v1/generate，
+再轮询任务状态或订阅SSE进度直到任务结束，按类型统计吞吐量、排队时间与p50/p95/p99延迟，
+用于确定 MAX_CONCURRENT_REQUESTS 与数据库连接池大小。
+
+默认在进程内启动完整应用并通过HTTP访问：模型为按延迟分布等待的模拟模型，Redis使用fakeredis，
+MySQL使用内存SQLite连接池替身（可设置连接数与每条SQL的往返延迟）；也可用 --url 压测已运行的服务：
+    python -m benchmarks.load_test --rate 1,2,4 --duration 30 --mix banner=1,slogan=3,emoji=1
+    python -m benchmarks.load_test --workers 20 --db-pool-size 5 --db-latency 0.002 --model-latency lognormal:1.5,0.4
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --rate 2 --mode stream
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+from unittest.mock import patch
+
+import httpx
+import uvicorn
+
+from app.core.config import settings
+from app.core.database import db_manager
+from app.core.metrics import DB_LATENCY
+from app.core.redis_client import redis_manager
+from app.services.mock_model import MockStreamingModel
+from app.services.status_writer import TERMINAL_STATUSES
+from benchmarks.harness import percentile, quiet_logs
+from benchmarks.storage_benchmark import fake_redis_manager, fakeredis, sqlite_db_manager
+
+
+GENERATION_TYPES = ('banner', 'slogan', 'emoji')
+
+DB_OPERATIONS = ('query', 'update', 'insert', 'many')
+
+SLOGAN = {'type': '简短有力', 'text': '樊振东必胜！', 'description': '赛场应援'}
+
+
+def parse_latency(spec: str, rng: random.Random) -> Callable[[], float]:
+    """
+    解析延迟分布（秒）
+
+        1.5                 固定延迟
+        uniform:0.5,2       均匀分布
+        lognormal:1.5,0.4   对数正态分布，参数为中位数与sigma
+        exp:1.5             指数分布，参数为均值
+    """
+    name, _, args = spec.partition(':')
+    if not args:
+        value = float(name)
+        return lambda: value
+
+    values = [float(value) for value in args.split(',')]
+    if name == 'uniform' and len(values) == 2:
+        return lambda: rng.uniform(*values)
+    if name == 'lognormal' and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda: rng.lognormvariate(mu, values[1])
+    if name == 'exp' and len(values) == 1:
+        return lambda: rng.expovariate(1 / values[0])
+    raise ValueError(f"无法解析延迟分布: {spec}")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """解析任务类型比例，如 banner=1,slogan=3,emoji=1"""
+    mix = {}
+    for item in spec.split(','):
+        task_type, _, weight = item.partition('=')
+        task_type = task_type.strip()
+        if task_type not in GENERATION_TYPES:
+            raise ValueError(f"不支持的生成类型: {task_type}")
+        mix[task_type] = float(weight or 1)
+    return mix
+
+
+def mock_response(banner_design: Dict[str, Any]) -> Callable[[str], str]:
+    """按提示词类型返回横幅设计、单个或批量口号的模拟响应"""
+    def respond(prompt: str) -> str:
+        if '"results"' in prompt:
+            count = len(re.findall(r'^\s*\[\d+\]', prompt, re.MULTILINE))
+            return json.dumps({'results': [{'id': index, 'slogans': [SLOGAN] * 5} for index in range(count)]},
+                              ensure_ascii=False)
+        if '"slogans"' in prompt:
+            return json.dumps({'slogans': [SLOGAN] * 5}, ensure_ascii=False)
+        return json.dumps(banner_design, ensure_ascii=False)
+    return respond
+
+
+@dataclass
+class TaskSample:
+    """单个任务的客户端观测结果"""
+    task_id: str
+    type: str
+    status: str
+    submit_latency: float
+    latency: Optional[float] = None
+    queue_wait: Optional[float] = None
+
+
+class LoadGenerator:
+    """
+    开环负载生成器
+
+    mode: poll（轮询 /task/{task_id}）或 stream（订阅 /task/{task_id}/events）
+    timeout: 单个任务从提交到结束的最长等待时间（秒），超过记为timeout
+    """
+
+    def __init__(self, client: httpx.AsyncClient, mix: Dict[str, float], mode: str = 'poll',
+                 poll_interval: float = 0.5, timeout: float = 120.0, rng: Optional[random.Random] = None):
+        self.client = client
+        self.types = list(mix)
+        self.weights = [mix[task_type] for task_type in self.types]
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.rng = rng or random.Random()
+        self.max_queue_depth = 0
+        self._runs = 0
+
+    async def run(self, rate: float, duration: float) -> Dict[str, Any]:
+        """按泊松到达以rate（个/秒）持续duration秒发出请求，等待全部任务结束后汇总"""
+        self._runs += 1
+        self.max_queue_depth = 0
+        sampler = asyncio.create_task(self._sample_queue())
+        sessions = []
+        start = time.perf_counter()
+        next_at = 0.0
+        try:
+            while True:
+                next_at += self.rng.expovariate(rate)
+                if next_at > duration:
+                    break
+                await asyncio.sleep(max(start + next_at - time.perf_counter(), 0))
+                task_type = self.rng.choices(self.types, self.weights)[0]
+                sessions.append(asyncio.create_task(self._session(len(sessions), task_type)))
+            samples = list(await asyncio.gather(*sessions))
+        finally:
+            sampler.cancel()
+            await asyncio.gather(sampler, return_exceptions=True)
+        elapsed = time.perf_counter() - start
+
+        await self._fetch_queue_waits(samples)
+        return {
+            'rate': rate,
+            'duration': duration,
+            'elapsed': round(elapsed, 3),
+            'max_queue_depth': self.max_queue_depth,
+            'types': summarize_samples(samples, elapsed)
+        }
+
+    async def _session(self, index: int, task_type: str) -> TaskSample:
+        task_id = f"load-{self._runs}-{index}"
+        payload = {
+            'task_id': task_id,
+            'type': task_type,
+            # 提示词各不相同，避免命中结果缓存
+            'prompt': f"为樊振东加油 {task_id}",
+            'parameters': {'style': '激励'},
+            'user_id': f"fan-{index % 50}"
+        }
+        start = time.perf_counter()
+        try:
+            response = await self.client.post('/api/v1/generate', json=payload)
+        except httpx.HTTPError:
+            return TaskSample(task_id, task_type, 'error', time.perf_counter() - start)
+        sample = TaskSample(task_id, task_type, 'error', time.perf_counter() - start)
+        if response.status_code == 429:
+            sample.status = 'rejected'
+            return sample
+        if response.status_code != 200:
+            return sample
+
+        try:
+            if response.json().get('status') == 'completed':
+                sample.status = 'completed'
+            elif self.mode == 'stream':
+                sample.status = await asyncio.wait_for(self._stream(task_id), self.timeout)
+            else:
+                sample.status = await asyncio.wait_for(self._poll(task_id), self.timeout)
+        except asyncio.TimeoutError:
+            sample.status = 'timeout'
+            return sample
+        except httpx.HTTPError:
+            return sample
+        sample.latency = time.perf_counter() - start
+        return sample
+
+    async def _poll(self, task_id: str) -> str:
+        while True:
+            response = await self.client.get(f'/api/v1/task/{task_id}')
+            # 工作线程写入第一个状态之前任务还查不到
+            if response.status_code == 200:
+                status = response.json()['status']
+                if status in TERMINAL_STATUSES:
+                    return status
+            await asyncio.sleep(self.poll_interval)
+
+    async def _stream(self, task_id: str) -> str:
+        while True:
+            async with self.client.stream('GET', f'/api/v1/task/{task_id}/events') as response:
+                # 直接调用本服务时没有上游创建的生成记录，工作线程写入第一个状态之前任务还查不到
+                if response.status_code == 404:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                async for line in response.aiter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    status = json.loads(line[5:]).get('status')
+                    if status in TERMINAL_STATUSES:
+                        return status
+            raise httpx.StreamError("进度流在任务结束前关闭")
+
+    async def _sample_queue(self):
+        """定期读取队列深度，记录最大值"""
+        while True:
+            try:
+                response = await self.client.get('/api/v1/queue/status')
+                if response.status_code == 200:
+                    self.max_queue_depth = max(self.max_queue_depth, response.json()['queue_size'])
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+
+    async def _fetch_queue_waits(self, samples: List[TaskSample], concurrency: int = 20):
+        """压测结束后从任务追踪数据读取排队时间，避免额外请求干扰压测本身"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(sample: TaskSample):
+            async with semaphore:
+                try:
+                    response = await self.client.get(f'/api/v1/debug/trace/{sample.task_id}')
+                except httpx.HTTPError:
+                    return
+                if response.status_code == 200:
+                    sample.queue_wait = response.json()['stages'].get('queue_wait')
+
+        await asyncio.gather(*(fetch(sample) for sample in samples if sample.latency is not None))
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    if not ordered:
+        return {'p50': None, 'p95': None, 'p99': None}
+    return {f'p{q}': round(percentile(ordered, q), 3) for q in (50, 95, 99)}
+
+
+def summarize_samples(samples: List[TaskSample], elapsed: float) -> Dict[str, Dict[str, Any]]:
+    """按类型（及all）汇总任务数、各结果数量、吞吐量与延迟分位（秒）"""
+    groups: Dict[str, List[TaskSample]] = {'all': samples}
+    for sample in samples:
+        groups.setdefault(sample.type, []).append(sample)
+
+    summary = {}
+    for name, group in groups.items():
+        statuses = [sample.status for sample in group]
+        completed = statuses.count('completed')
+        summary[name] = {
+            'sent': len(group),
+            'completed': completed,
+            'failed': statuses.count('failed'),
+            'rejected': statuses.count('rejected'),
+            'timeout': statuses.count('timeout'),
+            'error': statuses.count('error'),
+            'throughput': round(completed / elapsed, 3) if elapsed else 0.0,
+            'submit': _percentiles([sample.submit_latency for sample in group]),
+            'latency': _percentiles([sample.latency for sample in group if sample.latency is not None]),
+            'queue_wait': _percentiles([sample.queue_wait for sample in group if sample.queue_wait is not None])
+        }
+    return summary
+
+
+def _db_totals() -> Dict[str, tuple]:
+    return {operation: (DB_LATENCY.count(operation=operation), DB_LATENCY.sum(operation=operation))
+            for operation in DB_OPERATIONS}
+
+
+def db_stats(before: Dict[str, tuple], after: Dict[str, tuple]) -> Dict[str, Dict[str, float]]:
+    """两次读数之间各类SQL的执行次数与平均耗时（含等待连接的时间）"""
+    stats = {}
+    for operation in DB_OPERATIONS:
+        count = after[operation][0] - before[operation][0]
+        if count:
+            total = after[operation][1] - before[operation][1]
+            stats[operation] = {'count': count, 'mean_ms': round(total / count * 1000, 3)}
+    return stats
+
+
+@asynccontextmanager
+async def local_app(workers: int, db_pool_size: int, db_latency: float, model: MockStreamingModel):
+    """在进程内启动使用本地替身的完整应用，返回其地址"""
+    from app.main import app
+
+    async def init_db():
+        db = sqlite_db_manager(db_pool_size, db_latency)
+        db_manager.pool, db_manager.driver = db.pool, db.driver
+
+    async def init_redis():
+        redis = fake_redis_manager()
+        redis_manager.redis_client, redis_manager.binary_client = redis.redis_client, redis.binary_client
+
+    async with AsyncExitStack() as stack:
+        workdir = stack.enter_context(tempfile.TemporaryDirectory())
+        paths = {
+            'STORAGE_PATH': workdir,
+            'GENERATED_PATH': f"{workdir}/generated",
+            'TEMP_PATH': f"{workdir}/temp",
+        }
+        overrides = {
+            'MAX_CONCURRENT_REQUESTS': workers,
+            'DB_POOL_SIZE': db_pool_size,
+            'GEMINI_API_KEY': '',
+            'ENABLE_METRICS': False,
+            **paths,
+        }
+        for name, value in overrides.items():
+            stack.enter_context(patch.object(settings, name, value))
+        # 渲染进程以spawn方式启动，从环境变量重新读取配置，存储路径需同时写入环境变量
+        stack.enter_context(patch.dict(os.environ, paths))
+        stack.enter_context(patch('app.main.init_db', init_db))
+        stack.enter_context(patch('app.main.init_redis', init_redis))
+
+        server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=0, log_level='warning',
+                                               access_log=False, lifespan='on'))
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            if serving.done():
+                serving.result()
+                raise RuntimeError("应用启动失败")
+            await asyncio.sleep(0.05)
+        app.state.ai_service.gemini_model = model
+        port = server.servers[0].sockets[0].getsockname()[1]
+        try:
+            yield f"http://127.0.0.1:{port}"
+        finally:
+            server.should_exit = True
+            try:
+                await asyncio.wait_for(serving, timeout=30)
+            except asyncio.TimeoutError:
+                print("应用未能在30秒内关闭")
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\nrate {report['rate']}/s  duration {report['duration']}s  elapsed {report['elapsed']}s  "
+          f"max queue depth {report['max_queue_depth']}")
+    print(f"{'type':<8}{'sent':>6}{'done':>6}{'fail':>6}{'rej':>6}{'tmo':>6}{'err':>6}{'thr/s':>8}"
+          f"{'e2e p50':>10}{'p95':>8}{'p99':>8}{'wait p50':>10}{'p95':>8}{'p99':>8}")
+
+    def cell(value, width):
+        return f"{'-' if value is None else value:>{width}}"
+
+    for name, row in sorted(report['types'].items(), key=lambda item: item[0] == 'all'):
+        latency, wait = row['latency'], row['queue_wait']
+        print(f"{name:<8}{row['sent']:>6}{row['completed']:>6}{row['failed']:>6}{row['rejected']:>6}"
+              f"{row['timeout']:>6}{row['error']:>6}{row['throughput']:>8}"
+              f"{cell(latency['p50'], 10)}{cell(latency['p95'], 8)}{cell(latency['p99'], 8)}"
+              f"{cell(wait['p50'], 10)}{cell(wait['p95'], 8)}{cell(wait['p99'], 8)}")
+    for operation, row in report.get('db', {}).items():
+        print(f"db.{operation:<8}{row['count']:>8} 次  平均 {row['mean_ms']} ms")
+
+
+async def _run(args) -> List[Dict[str, Any]]:
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+    rates = [float(rate) for rate in args.rate.split(',')]
+    reports = []
+
+    async with AsyncExitStack() as stack:
+        base_url = args.url
+        if base_url is None:
+            from app.services.ai_service import AIService
+            design = AIService()._get_default_banner_design("樊振东必胜")
+            model = MockStreamingModel(mock_response(design), latency=parse_latency(args.model_latency, rng))
+            base_url = await stack.enter_async_context(
+                local_app(args.workers, args.db_pool_size, args.db_latency, model)
+            )
+
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits)
+        )
+        generator = LoadGenerator(client, mix, args.mode, args.poll_interval, args.timeout, rng)
+        for rate in rates:
+            before = _db_totals()
+            report = await generator.run(rate, args.duration)
+            if args.url is None:
+                report['db'] = db_stats(before, _db_totals())
+            reports.append(report)
+            if not args.json:
+                print_report(report)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测")
+    parser.add_argument('--url', default=None, help="已运行服务的地址，不指定时在进程内启动应用")
+    parser.add_argument('--rate', default='2', help="到达率（个/秒），逗号分隔时依次压测")
+    parser.add_argument('--duration', type=float, default=30.0, help="每个到达率持续发出请求的秒数")
+    parser.add_argument('--mix', default='banner=1,slogan=3,emoji=1', help="任务类型比例")
+    parser.add_argument('--mode', choices=('poll', 'stream'), default='poll', help="轮询状态或订阅SSE进度")
+    parser.add_argument('--poll-interval', type=float, default=0.5, help="轮询间隔（秒）")
+    parser.add_argument('--timeout', type=float, default=120.0, help="单个任务的最长等待时间（秒）")
+    parser.add_argument('--model-latency', default='lognormal:1.5,0.4', help="模拟模型的延迟分布")
+    parser.add_argument('--workers', type=int, default=settings.MAX_CONCURRENT_REQUESTS, help="工作线程数")
+    parser.add_argument('--db-pool-size', type=int, default=settings.DB_POOL_SIZE, help="数据库连接数")
+    parser.add_argument('--db-latency', type=float, default=0.001, help="每条SQL的往返延迟（秒）")
+    parser.add_argument('--seed', type=int, default=None, help="随机种子")
+    parser.add_argument('--json', action='store_true', help="以JSON输出结果")
+    args = parser.parse_args()
+
+    if args.url is None and fakeredis is None:
+        parser.error("进程内压测需要fakeredis，或用 --url 指定已运行的服务")
+
+    quiet_logs()
+    reports = asyncio.run(_run(args))
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+任务流水线基准测试
+
+测量内存队列的入队/出队吞吐，以及工作线程在零延迟模拟模型下处理口号任务的吞吐
+（含结果缓存、JSON解析与链路追踪，状态写入替换为计数）。Redis使用fakeredis：
+    python -m benchmarks.pipeline_benchmark [--tasks 200] [--repeat 5] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Dict, Optional
+from unittest.mock import AsyncMock, patch
+
+from app.core.config import settings
+from app.services.ai_service import AIService
+from app.services.mock_model import MockStreamingModel
+from app.services.task_queue import MemoryTaskQueue
+from benchmarks.harness import measure_async, print_results, quiet_logs, run_async
+from benchmarks.storage_benchmark import fake_redis_manager, fakeredis
+
+
+SLOGAN_RESPONSE = json.dumps({
+    'slogans': [{'type': '简短有力', 'text': '樊振东必胜！', 'description': '赛场应援'}] * 5
+}, ensure_ascii=False)
+
+
+def task(index: int, task_type: str = 'slogan') -> Dict[str, Any]:
+    return {
+        'task_id': f"bench-{index}",
+        'type': task_type,
+        'prompt': f"为樊振东加油 {index}",
+        'parameters': {'style': '激励'},
+        'user_id': f"user-{index % 10}",
+        'created_at': time.time()
+    }
+
+
+async def queue_round_trip(count: int):
+    """入队count个任务后全部取出并确认"""
+    queue = MemoryTaskQueue()
+    await queue.start()
+    for index in range(count):
+        await queue.put(task(index, ('slogan', 'banner', 'emoji')[index % 3]))
+    for _ in range(count):
+        await queue.ack(await queue.get())
+    await queue.close()
+
+
+class _CountingService(AIService):
+    """状态写入只计数的AI服务，全部任务完成后置位事件"""
+
+    def __init__(self):
+        super().__init__()
+        self.generation_queue = MemoryTaskQueue()
+        self.gemini_model = MockStreamingModel(SLOGAN_RESPONSE)
+        # 每个任务单独调用模型，只测量流水线本身
+        self.slogan_batcher.max_batch_size = 1
+        self.expected = 0
+        self.completed = 0
+        self.done: Optional[asyncio.Event] = None
+
+    async def _update_task_status(self, task_id, status, progress, result=None):
+        if status in ('completed', 'failed'):
+            self.completed += 1
+            if self.completed >= self.expected:
+                self.done.set()
+
+
+async def stop_workers(tasks):
+    """取消工作线程；Redis客户端执行命令时可能吞掉取消，未退出的继续取消"""
+    pending = set(tasks)
+    while pending:
+        for worker in pending:
+            worker.cancel()
+        _, pending = await asyncio.wait(pending, timeout=0.1)
+
+
+async def worker_throughput(count: int, workers: int, run_id: int):
+    """count个口号任务经workers个工作线程处理完成的总耗时"""
+    service = _CountingService()
+    service.expected = count
+    service.done = asyncio.Event()
+    await service.generation_queue.start()
+    tasks = [asyncio.create_task(service._generation_worker(f"bench-{i}")) for i in range(workers)]
+    try:
+        for index in range(count):
+            # 提示词各不相同，避免命中结果缓存
+            await service.generation_queue.put(task(run_id * count + index))
+        await service.done.wait()
+    finally:
+        await stop_workers(tasks)
+        await service.generation_queue.close()
+        await service.slogan_batcher.close()
+
+
+async def _run(tasks: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {
+        f'queue.memory.round_trip.{tasks}': await measure_async(
+            lambda: queue_round_trip(tasks), repeat, operations=tasks
+        )
+    }
+    if fakeredis is None:
+        print("未安装fakeredis，跳过工作线程基准", file=sys.stderr)
+        return results
+
+    redis = fake_redis_manager()
+    runs = iter(range(repeat + 1))
+    workers = settings.MAX_CONCURRENT_REQUESTS
+    get_redis = AsyncMock(return_value=redis)
+    with patch('app.services.result_cache.get_redis', get_redis), \
+            patch('app.core.tracing.get_redis', get_redis):
+        results[f'pipeline.slogan.mock_model.{tasks}'] = await measure_async(
+            lambda: worker_throughput(tasks, workers, next(runs)), repeat, operations=tasks
+        )
+    return results
+
+
+def run(tasks: int = 200, repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """运行流水线基准测试"""
+    return run_async(_run(tasks, repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任务流水线基准测试")
+    parser.add_argument('--tasks', type=int, default=200, help="每轮任务数")
+    parser.add_argument('--repeat', type=int, default=5, help="轮数")
+    parser.add_argument('--json', action='store_true', help="以JSON输出结果")
+    args = parser.parse_args()
+
+    quiet_logs()
+    results = run(args.tasks, args.repeat)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+渲染基准测试
+
+测量 _create_enhanced_banner_image 在不同尺寸与元素数量下的耗时、_create_emoji_image 的耗时，
+以及各输出格式的编码耗时与文件大小。渲染在进程内执行，素材为临时生成的PNG，输出写到临时目录：
+    python -m benchmarks.render_benchmark [--repeat 10] [--json]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from typing import Any, Dict
+from unittest.mock import patch
+
+from PIL import Image, ImageDraw
+
+from app.services.ai_service import AIService
+from app.services.asset_cache import element_cache
+from app.services.gradient import create_gradient
+from app.services.image_encoding import OUTPUT_FORMATS, avif_supported, encode_image
+from app.services.render_executor import RenderExecutor
+from benchmarks.harness import measure, measure_async, print_results, quiet_logs, run_async
+
+
+SIZES = ((400, 150), (800, 300), (1600, 600))
+ELEMENT_COUNTS = (0, 5, 20)
+ELEMENT_IDS = ('star', 'crown', 'medal', 'ping-pong-ball', 'lightning')
+GRADIENT = {'gradient': {'type': 'radial', 'stops': [
+    {'color': '#FF0000', 'position': 0}, {'color': '#FFD700', 'position': 0.6}, {'color': '#8B0000', 'position': 1}
+]}}
+
+
+def make_elements(directory: str):
+    """生成基准用的视觉元素素材"""
+    for index, element_id in enumerate(ELEMENT_IDS):
+        img = Image.new('RGBA', (256, 256), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(img)
+        draw.ellipse([16, 16, 240, 240], fill=(255, 200 - index * 30, 0, 255))
+        img.save(os.path.join(directory, f"{element_id}.png"))
+
+
+def banner_design(width: int, height: int, element_count: int) -> Dict[str, Any]:
+    """带指定数量视觉元素的横幅设计方案"""
+    service = AIService()
+    design = service._get_default_banner_design("樊振东必胜")
+    design['visualElements'] = [
+        {
+            'id': ELEMENT_IDS[index % len(ELEMENT_IDS)],
+            'position': {'x': (index * 67) % max(width - 80, 1), 'y': (index * 41) % max(height - 80, 1)},
+            'size': {'width': 80, 'height': 80},
+            'zIndex': index
+        }
+        for index in range(element_count)
+    ]
+    return design
+
+
+async def _run(repeat: int) -> Dict[str, Dict[str, float]]:
+    service = AIService()
+    # 进程内渲染，只测量渲染本身，不含进程间传输
+    service.render_executor = RenderExecutor(max_workers=0)
+    results = {}
+
+    for width, height in SIZES:
+        for element_count in ELEMENT_COUNTS:
+            design = banner_design(width, height, element_count)
+            parameters = {'width': width, 'height': height}
+            results[f"render.enhanced_banner.{width}x{height}.e{element_count}"] = await measure_async(
+                lambda: service._create_enhanced_banner_image('bench-banner', design, parameters),
+                repeat=repeat
+            )
+
+    results['render.emoji'] = await measure_async(
+        lambda: service._create_emoji_image('bench-emoji', '樊振东加油', {}), repeat=repeat
+    )
+    results.update(encode_benchmarks(repeat))
+    return results
+
+
+def encode_benchmarks(repeat: int) -> Dict[str, Dict[str, float]]:
+    """各输出格式编码最大尺寸横幅背景的耗时，bytes为编码后的大小"""
+    width, height = SIZES[-1]
+    img = create_gradient(width, height, GRADIENT)
+    results = {}
+    for output_format in OUTPUT_FORMATS:
+        if output_format == 'avif' and not avif_supported():
+            continue
+        size = len(encode_image(img, output_format, 85).data)
+        results[f"encode.{output_format}.{width}x{height}"] = {
+            **measure(lambda: encode_image(img, output_format, 85), repeat=repeat),
+            'bytes': size
+        }
+    return results
+
+
+def run(repeat: int = 10) -> Dict[str, Dict[str, float]]:
+    """运行渲染基准测试"""
+    with tempfile.TemporaryDirectory() as workdir:
+        elements_dir = os.path.join(workdir, 'elements')
+        os.makedirs(elements_dir)
+        make_elements(elements_dir)
+
+        original_dir = element_cache.elements_dir
+        element_cache.elements_dir = elements_dir
+        element_cache.build_index()
+        try:
+            with patch('app.services.renderer.settings.GENERATED_PATH', os.path.join(workdir, 'generated')):
+                return run_async(_run(repeat))
+        finally:
+            element_cache.elements_dir = original_dir
+            element_cache.build_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="渲染基准测试")
+    parser.add_argument('--repeat', type=int, default=10, help="每项执行次数")
+    parser.add_argument('--json', action='store_true', help="以JSON输出结果")
+    args = parser.parse_args()
+
+    quiet_logs()
+    results = run(args.repeat)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == '__main__':
+    main()
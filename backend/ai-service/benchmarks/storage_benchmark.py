@@ -0,0 +1,246 @@
+"""
+存储层基准测试
+
+测量 RedisManager 与 DatabaseManager 常用操作的耗时。Redis使用fakeredis，数据库使用
+内存SQLite替身（经mysql-connector线程池模式的代码路径），只反映本服务自身的开销：
+    python -m benchmarks.storage_benchmark [--repeat 200] [--json]
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.core.database import DatabaseManager
+from app.core.redis_client import RedisCodec, RedisManager
+from benchmarks.codec_benchmark import task_payloads
+from benchmarks.harness import measure_async, print_results, quiet_logs, run_async
+
+try:
+    import fakeredis
+except ImportError:  # 未安装时跳过Redis基准
+    fakeredis = None
+
+
+BATCH_SIZE = 50
+
+
+# 与MySQL上的 fazd_generation_records 对应的列
+RECORDS_SCHEMA = """
+    CREATE TABLE fazd_generation_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, task_id TEXT UNIQUE, status TEXT, progress INTEGER,
+        output_image_path TEXT, thumbnail_path TEXT, file_size INTEGER, dimensions TEXT,
+        error_message TEXT, generation_time INTEGER, created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        completed_at TEXT
+    )
+"""
+
+
+def _timestampdiff(unit: str, start: Optional[str], end: Optional[str]) -> Optional[int]:
+    if start is None or end is None:
+        return None
+    seconds = (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+    return int(seconds)
+
+
+class SQLiteCursor:
+    """mysql-connector游标接口的SQLite实现，执行时独占共享连接"""
+
+    def __init__(self, pool: 'SQLitePool', dictionary: bool):
+        self.pool = pool
+        self.dictionary = dictionary
+        self._rows: List[Any] = []
+        self.lastrowid: Optional[int] = None
+        self.rowcount = -1
+
+    @staticmethod
+    def _sql(query: str) -> str:
+        # TIMESTAMPDIFF的单位参数在SQLite中作为字符串传入
+        query = re.sub(r'TIMESTAMPDIFF\((\w+),', r"TIMESTAMPDIFF('\1',", query)
+        return query.replace('%s', '?')
+
+    def _run(self, method: str, query: str, params):
+        if self.pool.latency:
+            # 模拟到数据库的网络往返
+            time.sleep(self.pool.latency)
+        with self.pool.lock:
+            cursor = self.pool.connection.cursor()
+            try:
+                getattr(cursor, method)(self._sql(query), params)
+                rows = cursor.fetchall()
+                if self.dictionary and cursor.description:
+                    columns = [column[0] for column in cursor.description]
+                    rows = [dict(zip(columns, row)) for row in rows]
+                self._rows = rows
+                self.lastrowid = cursor.lastrowid
+                self.rowcount = cursor.rowcount
+            finally:
+                cursor.close()
+
+    def execute(self, query: str, params: tuple = ()):
+        self._run('execute', query, params)
+
+    def executemany(self, query: str, params_list: List[tuple]):
+        self._run('executemany', query, params_list)
+
+    def fetchall(self) -> List[Any]:
+        return self._rows
+
+    def close(self):
+        pass
+
+
+class SQLiteConnection:
+    """mysql-connector连接接口的SQLite实现，close时归还到连接池"""
+
+    def __init__(self, pool: 'SQLitePool'):
+        self.pool = pool
+        self._closed = False
+
+    def cursor(self, dictionary: bool = False) -> SQLiteCursor:
+        return SQLiteCursor(self.pool, dictionary)
+
+    def commit(self):
+        with self.pool.lock:
+            self.pool.connection.commit()
+
+    def rollback(self):
+        with self.pool.lock:
+            self.pool.connection.rollback()
+
+    def is_connected(self) -> bool:
+        return not self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.pool.slots.release()
+
+
+class SQLitePool:
+    """
+    内存SQLite连接池替身
+
+    size: 可同时借出的连接数，用尽时等待归还（与aiomysql连接池一致）
+    latency: 每条SQL额外等待的时间（秒），模拟到MySQL的往返
+    """
+
+    def __init__(self, size: int = 1, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(':memory:', check_same_thread=False)
+        # 与CURRENT_TIMESTAMP一致使用UTC
+        self.connection.create_function('NOW', 0, lambda: datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'))
+        self.connection.create_function('TIMESTAMPDIFF', 3, _timestampdiff)
+        self.connection.execute(RECORDS_SCHEMA)
+
+    def get_connection(self) -> SQLiteConnection:
+        self.slots.acquire()
+        return SQLiteConnection(self)
+
+
+def sqlite_db_manager(pool_size: int = 1, latency: float = 0.0) -> DatabaseManager:
+    db = DatabaseManager()
+    db.pool = SQLitePool(pool_size, latency)
+    db.driver = 'mysql-connector'
+    return db
+
+
+def fake_redis_manager(server=None, codec: Optional[RedisCodec] = None) -> RedisManager:
+    """基于fakeredis的RedisManager，文本与二进制连接共享同一服务器"""
+    redis = RedisManager(codec=codec)
+    server = server or fakeredis.FakeServer()
+    redis.redis_client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    redis.binary_client = fakeredis.aioredis.FakeRedis(server=server)
+    return redis
+
+
+async def _redis_benchmarks(repeat: int) -> Dict[str, Dict[str, float]]:
+    redis = fake_redis_manager()
+    payload = task_payloads()['banner']
+    keys = [f"task:bench-{index}" for index in range(BATCH_SIZE)]
+    await redis.mset({key: payload for key in keys}, expire=3600)
+
+    async def pipeline_write():
+        async with redis.pipeline() as pipe:
+            for key in keys:
+                pipe.set(key, payload, expire=3600)
+                pipe.publish('task-events:bench', {'task_id': key, 'status': 'completed'})
+
+    return {
+        'redis.set': await measure_async(lambda: redis.set('task:bench', payload, expire=3600), repeat),
+        'redis.get': await measure_async(lambda: redis.get('task:bench-0'), repeat),
+        f'redis.mget.{BATCH_SIZE}': await measure_async(lambda: redis.mget(keys), repeat,
+                                                      operations=BATCH_SIZE),
+        f'redis.pipeline.{BATCH_SIZE}': await measure_async(pipeline_write, repeat, operations=BATCH_SIZE),
+    }
+
+
+async def _db_benchmarks(repeat: int) -> Dict[str, Dict[str, float]]:
+    db = sqlite_db_manager()
+    rows = [(f"bench-{index}", 'processing', 10) for index in range(BATCH_SIZE)]
+    await db.execute_many(
+        "INSERT INTO fazd_generation_records (task_id, status, progress) VALUES (%s, %s, %s)", rows
+    )
+    task_ids = tuple(row[0] for row in rows)
+    placeholders = ', '.join(['%s'] * len(task_ids))
+    updates = [('completed', 100, task_id) for task_id in task_ids]
+
+    return {
+        'db.query.by_id': await measure_async(
+            lambda: db.execute_query("SELECT * FROM fazd_generation_records WHERE task_id = %s", ('bench-0',)),
+            repeat
+        ),
+        f'db.query.in.{BATCH_SIZE}': await measure_async(
+            lambda: db.execute_query(f"SELECT * FROM fazd_generation_records WHERE task_id IN ({placeholders})",
+                                     task_ids),
+            repeat, operations=BATCH_SIZE
+        ),
+        'db.update': await measure_async(
+            lambda: db.execute_update("UPDATE fazd_generation_records SET progress = %s WHERE task_id = %s",
+                                      (50, 'bench-0')),
+            repeat
+        ),
+        f'db.execute_many.{BATCH_SIZE}': await measure_async(
+            lambda: db.execute_many("UPDATE fazd_generation_records SET status = %s, progress = %s "
+                                    "WHERE task_id = %s", updates),
+            repeat, operations=BATCH_SIZE
+        ),
+    }
+
+
+def run(repeat: int = 200) -> Dict[str, Dict[str, float]]:
+    """运行存储层基准测试"""
+    async def _run():
+        results = await _db_benchmarks(repeat)
+        if fakeredis is not None:
+            results.update(await _redis_benchmarks(repeat))
+        return results
+    return run_async(_run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="存储层基准测试")
+    parser.add_argument('--repeat', type=int, default=200, help="每项执行次数")
+    parser.add_argument('--json', action='store_true', help="以JSON输出结果")
+    args = parser.parse_args()
+
+    quiet_logs()
+    if fakeredis is None:
+        print("未安装fakeredis，跳过Redis基准", file=sys.stderr)
+    results = run(args.repeat)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == '__main__':
+    main()
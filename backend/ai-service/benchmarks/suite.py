@@ -0,0 +1,92 @@
+"""
+基准测试套件
+
+依次运行渲染、流水线与存储层基准，保存为基准文件或与已保存的基准比较：
+    python -m benchmarks.suite --save                 # 记录基准到 benchmarks/baselines/suite.json
+    python -m benchmarks.suite --compare              # 与基准比较，存在回退时退出码为1
+    python -m benchmarks.suite --quick --only render  # 减少次数，只运行部分基准
+
+基准与机器相关，比较应在同一台机器上进行。
+"""
+
+import argparse
+import json
+import sys
+from typing import Callable, Dict, List
+
+from benchmarks import pipeline_benchmark, render_benchmark, storage_benchmark
+from benchmarks.harness import (
+    DEFAULT_TOLERANCE, baseline_path, compare, load_baseline, print_comparison, print_results,
+    quiet_logs, save_baseline
+)
+
+
+# 各基准的完整与快速运行方式
+SUITES: Dict[str, Dict[str, Callable[[], Dict[str, Dict[str, float]]]]] = {
+    'render': {
+        'full': lambda: render_benchmark.run(repeat=10),
+        'quick': lambda: render_benchmark.run(repeat=3),
+    },
+    'pipeline': {
+        'full': lambda: pipeline_benchmark.run(tasks=200, repeat=5),
+        'quick': lambda: pipeline_benchmark.run(tasks=50, repeat=2),
+    },
+    'storage': {
+        'full': lambda: storage_benchmark.run(repeat=200),
+        'quick': lambda: storage_benchmark.run(repeat=30),
+    },
+}
+
+
+def run(only: List[str], quick: bool = False) -> Dict[str, Dict[str, float]]:
+    """运行所选基准并合并结果"""
+    results = {}
+    for name in only:
+        results.update(SUITES[name]['quick' if quick else 'full']())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基准测试套件")
+    parser.add_argument('--only', default=','.join(SUITES), help="逗号分隔的基准名称")
+    parser.add_argument('--quick', action='store_true', help="减少执行次数")
+    parser.add_argument('--save', action='store_true', help="保存为基准")
+    parser.add_argument('--compare', action='store_true', help="与基准比较")
+    parser.add_argument('--baseline', default=baseline_path('suite'), help="基准文件路径")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="允许的变慢比例")
+    parser.add_argument('--json', action='store_true', help="以JSON输出结果")
+    args = parser.parse_args()
+
+    only = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = [name for name in only if name not in SUITES]
+    if unknown:
+        parser.error(f"未知的基准: {', '.join(unknown)}")
+
+    quiet_logs()
+    results = run(only, args.quick)
+
+    rows = None
+    if args.compare:
+        baseline = load_baseline(args.baseline)
+        if baseline is None:
+            print(f"基准文件不存在: {args.baseline}", file=sys.stderr)
+            sys.exit(2)
+        rows = compare(results, baseline, args.tolerance)
+
+    if args.json:
+        print(json.dumps({'results': results, 'comparison': rows}, ensure_ascii=False, indent=2))
+    elif rows is not None:
+        print_comparison(rows)
+    else:
+        print_results(results)
+
+    if args.save:
+        save_baseline(args.baseline, results)
+        print(f"基准已保存: {args.baseline}", file=sys.stderr)
+
+    if rows is not None and any(row['status'] == 'regression' for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
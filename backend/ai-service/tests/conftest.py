@@ -0,0 +1,26 @@
+"""
+测试公共夹具
+"""
+
+import fakeredis
+import pytest
+
+from benchmarks.storage_benchmark import fake_redis_manager
+
+
+@pytest.fixture
+def redis_server():
+    """fakeredis服务器，同一测试内的连接共享数据"""
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_manager(redis_server):
+    """基于fakeredis的RedisManager"""
+    return fake_redis_manager(server=redis_server)
+
+
+@pytest.fixture
+def redis_client(redis_manager):
+    """基于fakeredis的文本Redis客户端，与redis_manager共享数据"""
+    return redis_manager.redis_client
@@ -0,0 +1,120 @@
+"""
+准入控制测试
+"""
+
+import pytest
+
+from app.services.admission import AdmissionController, RedisCompletionWindow
+
+
+def make_controller(**kwargs):
+    options = dict(max_depth=100, wait_slo=20, rate_window=10, workers=2, default_service_time=4)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+class TestAdmissionController:
+    """准入控制器测试"""
+
+    def test_estimate_without_samples(self):
+        """测试无样本时按默认处理耗时估算"""
+        controller = make_controller()
+        decision = controller.check(queue_depth=3, now=0)
+
+        # 2个工作线程、每个任务4秒 -> 每秒0.5个
+        assert decision.admitted
+        assert decision.predicted_wait == 8
+        assert decision.estimated_time == 12
+
+    def test_rejects_when_wait_exceeds_slo(self):
+        """测试预计排队时间超过上限时拒绝并给出重试间隔"""
+        controller = make_controller()
+        for i in range(5):
+            controller.record_completion(4.0, now=100 + i)
+
+        # 2个工作线程、每个任务4秒 -> 每秒0.5个，排队29个需要60秒
+        decision = controller.check(queue_depth=29, now=105)
+        assert not decision.admitted
+        assert decision.reason == 'wait_slo'
+        assert decision.retry_after == 40
+
+    def test_rejects_when_queue_full(self):
+        """测试队列达到上限时拒绝"""
+        controller = make_controller(max_depth=5, wait_slo=1000)
+        decision = controller.check(queue_depth=5, now=0)
+
+        assert not decision.admitted
+        assert decision.reason == 'queue_full'
+        assert decision.retry_after >= 1
+        assert controller.stats()['rejected_depth'] == 1
+
+    def test_burst_after_light_load(self):
+        """测试低负载后的突发请求按处理能力而不是到达速率估算"""
+        controller = make_controller(workers=10, rate_window=60)
+        for i in range(20):
+            controller.record_completion(3.0, now=i * 3)
+
+        # 60秒内只完成20个（每秒0.33个），但10个工作线程每秒可处理3.3个，排队40个约12秒
+        decision = controller.check(queue_depth=40, now=60)
+        assert decision.admitted
+        assert round(decision.predicted_wait, 1) == 12.3
+
+    def test_old_samples_expire(self):
+        """测试窗口外的样本不再参与速率计算"""
+        controller = make_controller()
+        for i in range(4):
+            controller.record_completion(2.0, now=i)
+
+        # 窗口内平均2秒 -> 每秒1个
+        assert controller.drain_rate(now=5) == 1.0
+        # 样本全部过期后回到默认估算
+        assert controller.drain_rate(now=100) == 0.5
+
+
+class TestSharedWindow:
+    """多副本共享完成记录窗口测试"""
+
+    def make_replica(self, redis_client, name):
+        shared = RedisCompletionWindow(redis_client, prefix='test:admission', replica_id=name)
+        return make_controller(shared=shared)
+
+    @pytest.mark.asyncio
+    async def test_rate_is_summed_across_replicas(self, redis_client):
+        """测试出队速率按所有副本汇总，与全局队列深度匹配"""
+        first = self.make_replica(redis_client, 'a')
+        second = self.make_replica(redis_client, 'b')
+        for i in range(5):
+            first.record_completion(4.0, now=100 + i)
+            second.record_completion(4.0, now=100 + i)
+        await first.sync(now=105)
+        await second.sync(now=105)
+        # 先上报的副本在下一次同步时读到另一副本的记录
+        await first.sync(now=105)
+
+        # 两个副本共4个工作线程、每个任务4秒 -> 每秒1个，而不是单个副本的每秒0.5个
+        for controller in (first, second):
+            assert controller.drain_rate() == 1.0
+            assert controller.service_time() == 4.0
+            assert controller.window().workers == 4
+        # 排队15个预计16秒，按单个副本的速率会被误判为32秒而拒绝
+        assert second.check(queue_depth=15).admitted
+
+        # 窗口外的时间桶被清理
+        await first.sync(now=200)
+        assert first.window().completions == 0
+        assert await redis_client.hlen('test:admission:completions') == 0
+
+    @pytest.mark.asyncio
+    async def test_departed_replica_not_counted(self, redis_client):
+        """测试长时间未上报的副本不再计入工作线程数"""
+        first = self.make_replica(redis_client, 'a')
+        second = self.make_replica(redis_client, 'b')
+        await first.sync(now=100)
+        await second.sync(now=100)
+        assert second.window().workers == 4
+
+        await second.sync(now=200)
+        # 无样本时按存活副本的工作线程数估算：2个工作线程、每个任务4秒
+        assert second.window().workers == 2
+        assert second.drain_rate() == 0.5
+        assert await redis_client.hkeys('test:admission:workers') == ['b']
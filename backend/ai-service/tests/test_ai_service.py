@@ -271,13 +271,13 @@ class TestImageGeneration:
             "textColor": "#ffffff"
         }
         
-        image_path = await ai_service._create_banner_image(
+        result = await ai_service._create_banner_image(
             task_id, text, parameters
         )
         
-        assert image_path is not None
-        assert image_path.endswith(".png")
-        assert "banners" in image_path
+        assert result.image_path.endswith(".webp")
+        assert "banners" in result.image_path
+        assert result.output_format == "webp"
     
     @pytest.mark.asyncio
     async def test_emoji_image_creation(self):
@@ -293,13 +293,224 @@ class TestImageGeneration:
             "size": 300
         }
         
-        image_path = await ai_service._create_emoji_image(
+        result = await ai_service._create_emoji_image(
             task_id, prompt, parameters
         )
         
-        assert image_path is not None
-        assert image_path.endswith(".png")
-        assert "emojis" in image_path
+        assert result.image_path.endswith(".webp")
+        assert "emojis" in result.image_path
+
+    @pytest.mark.asyncio
+    async def test_enhanced_banner_image_creation(self):
+        """测试增强版横幅图片创建"""
+        from app.services.ai_service import AIService
+
+        ai_service = AIService()
+        design_data = ai_service._get_default_banner_design("樊振东加油")
+
+        result = await ai_service._create_enhanced_banner_image(
+            "enhanced_banner_test", design_data, {"width": 400, "height": 150, "format": "png"}
+        )
+
+        assert result.image_path == "generated/banners/enhanced_banner_test.png"
+        assert (result.width, result.height) == (400, 150)
+
+    @pytest.mark.asyncio
+    async def test_render_executor_process_pool(self):
+        """测试渲染进程池"""
+        from app.services.render_executor import RenderExecutor
+        from app.services.renderer import RenderJob
+
+        executor = RenderExecutor(max_workers=1)
+        executor.start()
+        try:
+            assert executor.mode == "process_pool"
+            result = await executor.submit(RenderJob(
+                kind="emoji",
+                task_id="render_pool_test",
+                payload={"prompt": "樊振东加油", "parameters": {}}
+            ))
+        finally:
+            await executor.shutdown()
+
+        assert result.image_path == "generated/emojis/render_pool_test.webp"
+        assert (result.width, result.height) == (300, 300)
+        assert result.file_size > 0
+
+    @pytest.mark.asyncio
+    async def test_render_executor_invalid_kind(self):
+        """测试不支持的渲染类型"""
+        from app.services.render_executor import RenderExecutor
+        from app.services.renderer import RenderJob
+
+        executor = RenderExecutor(max_workers=0)
+        executor.start()
+        assert executor.mode == "in_process"
+
+        with pytest.raises(ValueError):
+            await executor.submit(RenderJob(kind="video", task_id="invalid"))
+
+    @pytest.mark.asyncio
+    async def test_render_executor_rebuilds_broken_pool_once(self):
+        """测试多个在途任务同时遇到进程池崩溃时只重建一次"""
+        from concurrent.futures import Future
+        from concurrent.futures.process import BrokenProcessPool
+        from app.services.render_executor import RenderExecutor
+        from app.services.renderer import RenderJob, RenderResult
+
+        class BrokenPool:
+            """提交的任务在全部提交后一起失败"""
+            def __init__(self):
+                self.futures = []
+                self.shutdowns = 0
+
+            def submit(self, fn, *args):
+                future = Future()
+                self.futures.append(future)
+                return future
+
+            def shutdown(self, wait=True, cancel_futures=False):
+                self.shutdowns += 1
+
+        broken, rebuilt = BrokenPool(), BrokenPool()
+        executor = RenderExecutor(max_workers=1)
+        executor.pool = broken
+        starts = []
+
+        def start():
+            starts.append(1)
+            executor.pool = rebuilt
+
+        def render(job):
+            return RenderResult(image_path=f"generated/emojis/{job.task_id}.webp", width=1, height=1)
+
+        with patch.object(executor, 'start', start), \
+                patch('app.services.render_executor.run_render_job', render):
+            jobs = [asyncio.create_task(executor.submit(RenderJob(kind="emoji", task_id=f"t{i}")))
+                    for i in range(2)]
+            while len(broken.futures) < 2:
+                await asyncio.sleep(0)
+            for future in broken.futures:
+                future.set_exception(BrokenProcessPool("渲染进程退出"))
+            results = await asyncio.gather(*jobs)
+
+        assert [result.image_path for result in results] == [
+            "generated/emojis/t0.webp", "generated/emojis/t1.webp"
+        ]
+        assert broken.shutdowns == 1 and len(starts) == 1
+        assert executor.pool is rebuilt and rebuilt.shutdowns == 0
+
+    def test_element_cache_lru(self, tmp_path):
+        """测试视觉元素索引与LRU缓存"""
+        from PIL import Image
+        from app.services.asset_cache import ElementCache
+
+        for element_id in ("star", "crown"):
+            Image.new("RGBA", (40, 40), (255, 215, 0, 255)).save(tmp_path / f"{element_id}.png")
+
+        cache = ElementCache(elements_dir=str(tmp_path), max_size=2)
+        cache.build_index()
+
+        assert cache.get("star", 20, 20).size == (20, 20)
+        assert cache.get("star", 20, 20) is cache.get("star", 20, 20)
+        cache.get("crown", 30, 30)
+        cache.get("star", 10, 10)  # 淘汰最久未使用的 (star, 20, 20)
+        assert cache.get("unknown-element", 20, 20) is None
+
+        stats = cache.stats()
+        assert stats["indexed_elements"] == 2
+        assert stats["hits"] == 2
+        assert stats["misses"] == 3
+        assert stats["evictions"] == 1
+        assert stats["rejections"] == 1
+        assert stats["cached_items"] == 2
+
+    def test_element_cache_clamps_size(self, tmp_path):
+        """测试模型给出的超大或非正元素尺寸被限制在图片尺寸上限内"""
+        from PIL import Image
+        from app.services.asset_cache import ElementCache
+
+        Image.new("RGBA", (40, 40), (255, 215, 0, 255)).save(tmp_path / "star.png")
+        cache = ElementCache(elements_dir=str(tmp_path), max_width=64, max_height=32)
+        cache.build_index()
+
+        assert cache.get("star", 100000, 100000).size == (64, 32)
+        assert cache.get("star", 0, -5).size == (1, 1)
+        # 超出上限的不同尺寸共享同一缓存项
+        assert cache.get("star", 5000, 999) is cache.get("star", 64, 32)
+        assert cache.stats()["cached_items"] == 2
+
+    def test_font_registry_cache_and_fallback(self, tmp_path):
+        """测试字体注册表缓存与默认字体回退"""
+        from app.services.font_registry import FontRegistry
+
+        broken_font = tmp_path / "broken.otf"
+        broken_font.write_bytes(b"not a font")
+        registry = FontRegistry(families={"broken": str(broken_font)}, default_family="broken")
+        registry.load()
+
+        font = registry.get(32)
+        assert font is registry.get(32)
+        assert font is registry.get("32", family="missing-family")
+        assert registry.get(24) is not font
+        assert registry.stats()["loaded_families"] == []
+        assert registry.stats()["cached_fonts"] == 2
+
+    def test_font_registry_bounded(self):
+        """测试字号被限制在上限内，缓存按LRU淘汰"""
+        from app.services.font_registry import FontRegistry
+
+        registry = FontRegistry(families={}, default_family="missing", max_size=2, max_font_size=100)
+        largest = registry.get(10 ** 9)
+        assert largest is registry.get(100)
+
+        registry.get(10)
+        registry.get(100)
+        registry.get(20)
+        stats = registry.stats()
+        assert stats["cached_fonts"] == 2
+        assert stats["evictions"] == 1
+        # 最近使用过的字号仍在缓存中
+        assert registry.get(100) is largest
+
+    def test_linear_gradient_matches_row_interpolation(self):
+        """测试默认线性渐变与逐行插值结果一致"""
+        from app.services.gradient import create_gradient
+
+        img = create_gradient(4, 10, {"primary": "#FF0000", "secondary": "#0000FF"})
+
+        assert img.size == (4, 10)
+        assert img.mode == "RGBA"
+        assert img.getpixel((0, 0)) == (255, 0, 0, 255)
+        assert img.getpixel((3, 5)) == (int(255 * 0.5), 0, int(255 * 0.5), 255)
+        assert img.getpixel((0, 9)) == (int(255 * 0.1), 0, int(255 * 0.9), 255)
+
+    def test_radial_multi_stop_gradient(self):
+        """测试径向多色标渐变"""
+        from app.services.gradient import create_gradient
+
+        colors = {
+            "gradient": {
+                "type": "radial",
+                "stops": [
+                    {"color": "#FFFFFF", "position": 0},
+                    {"color": "#00FF00", "position": 0.5},
+                    {"color": "#000000", "position": 1}
+                ]
+            }
+        }
+        img = create_gradient(101, 101, colors)
+
+        assert img.getpixel((50, 50)) == (255, 255, 255, 255)
+        assert img.getpixel((0, 0)) == (0, 0, 0, 255)
+
+    def test_gradient_invalid_colors_fallback(self):
+        """测试无效颜色回退到默认值"""
+        from app.services.gradient import create_gradient
+
+        img = create_gradient(10, 10, {"primary": "not-a-color", "gradient": "unknown"})
+
+        assert img.getpixel((0, 0)) == (255, 0, 0, 255)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+"""
+微批处理测试
+"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.ai_service import AIService
+from app.services.batcher import BatchItemError, MicroBatcher
+
+
+class TestMicroBatcher:
+    """微批处理器测试"""
+
+    @pytest.mark.asyncio
+    async def test_requests_in_window_share_one_call(self):
+        """测试时间窗口内的请求合并为一次调用，单个失败不影响其他请求"""
+        calls = []
+
+        async def handler(items):
+            calls.append(items)
+            return [BatchItemError("bad") if item == "bad" else item.upper() for item in items]
+
+        batcher = MicroBatcher(handler, window=0.05, max_batch_size=10)
+        results = await asyncio.gather(
+            *(batcher.submit(item) for item in ["a", "bad", "c"]), return_exceptions=True
+        )
+
+        assert calls == [["a", "bad", "c"]]
+        assert results[0] == "A" and results[2] == "C"
+        assert isinstance(results[1], BatchItemError)
+        assert batcher.stats()["item_errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_immediately(self):
+        """测试达到批量上限时不等待时间窗口"""
+        sizes = []
+
+        async def handler(items):
+            sizes.append(len(items))
+            return items
+
+        batcher = MicroBatcher(handler, window=10, max_batch_size=2)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(i) for i in range(4))), timeout=1
+        )
+
+        assert results == [0, 1, 2, 3]
+        assert sizes == [2, 2]
+
+    @pytest.mark.asyncio
+    async def test_handler_error_fails_whole_batch(self):
+        """测试批量调用失败时所有请求收到异常"""
+        async def handler(items):
+            raise RuntimeError("quota exceeded")
+
+        batcher = MicroBatcher(handler, window=0.01, max_batch_size=10)
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert batcher.stats()["batch_errors"] == 1
+
+
+class TestSloganBatching:
+    """口号批量生成测试"""
+
+    @pytest.mark.asyncio
+    async def test_only_unparsed_item_falls_back(self):
+        """测试批量响应中缺失的需求单独生成"""
+        service = AIService()
+        service._update_task_status = AsyncMock()
+        batch_response = {
+            "results": [
+                {"id": 0, "slogans": [{"type": "简短有力", "text": "樊振东必胜！"}]},
+                {"id": 1, "slogans": "格式错误"}
+            ]
+        }
+        single_response = {"slogans": [{"type": "胜利祝愿", "text": "每赛都夺冠！"}]}
+        prompts = []
+
+        def generate_content(prompt, request_options=None):
+            prompts.append(prompt)
+            data = batch_response if len(prompts) == 1 else single_response
+            return MagicMock(text=f"```json\n{json.dumps(data, ensure_ascii=False)}\n```")
+
+        service.gemini_model = MagicMock(generate_content=generate_content)
+        tasks = [{'task_id': f"t{i}", 'type': 'slogan', 'prompt': f"需求{i}", 'parameters': {}}
+                 for i in range(2)]
+        first, second = await asyncio.gather(*(service._generate_slogan(task) for task in tasks))
+
+        assert len(prompts) == 2
+        assert '"需求0"' in prompts[0] and '"需求1"' in prompts[0]
+        assert first["slogans"][0]["text"] == "樊振东必胜！"
+        assert second["slogans"][0]["text"] == "每赛都夺冠！"
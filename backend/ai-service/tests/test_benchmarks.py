@@ -0,0 +1,100 @@
+"""
+基准测试工具测试
+"""
+
+import json
+import random
+
+import pytest
+
+from benchmarks.harness import compare, load_baseline, save_baseline, summarize
+from benchmarks.load_test import TaskSample, mock_response, parse_latency, parse_mix, summarize_samples
+
+
+class TestHarness:
+    """基准结果统计与比较测试"""
+
+    def test_summarize(self):
+        """测试耗时样本汇总"""
+        summary = summarize([0.001, 0.002, 0.003, 0.004], operations=10)
+        assert summary['mean_ms'] == pytest.approx(2.5)
+        assert summary['p50_ms'] == pytest.approx(3.0)
+        assert summary['p95_ms'] == pytest.approx(4.0)
+        assert summary['ops_per_sec'] == pytest.approx(4000.0)
+        assert summary['samples'] == 4
+
+    def test_save_and_load_baseline(self, tmp_path):
+        """测试基准文件保存与读取"""
+        path = str(tmp_path / 'baselines' / 'suite.json')
+        assert load_baseline(path) is None
+
+        results = {'render.emoji': summarize([0.01, 0.02])}
+        save_baseline(path, results)
+        assert load_baseline(path) == results
+
+    def test_compare_statuses(self):
+        """测试回退、改进、持平与新增的判定"""
+        baseline = {
+            'slower': {'p50_ms': 10.0},
+            'faster': {'p50_ms': 10.0},
+            'same': {'p50_ms': 10.0},
+        }
+        results = {
+            'slower': {'p50_ms': 13.0},
+            'faster': {'p50_ms': 5.0},
+            'same': {'p50_ms': 11.0},
+            'added': {'p50_ms': 1.0},
+        }
+        rows = {row['name']: row for row in compare(results, baseline, tolerance=0.25)}
+
+        assert rows['slower']['status'] == 'regression'
+        assert rows['slower']['change'] == pytest.approx(0.3)
+        assert rows['faster']['status'] == 'improved'
+        assert rows['same']['status'] == 'ok'
+        assert rows['added']['status'] == 'new'
+
+
+class TestLoadTest:
+    """压测参数解析与结果汇总测试"""
+
+    def test_parse_latency(self):
+        """测试各延迟分布的解析"""
+        rng = random.Random(0)
+        assert parse_latency('0.5', rng)() == 0.5
+        assert all(0.5 <= parse_latency('uniform:0.5,2', rng)() <= 2 for _ in range(100))
+        samples = sorted(parse_latency('lognormal:1.5,0.4', rng)() for _ in range(1001))
+        assert samples[500] == pytest.approx(1.5, rel=0.1)
+        with pytest.raises(ValueError):
+            parse_latency('gamma:1,2', rng)
+
+    def test_parse_mix(self):
+        """测试任务类型比例解析"""
+        assert parse_mix('banner=1,slogan=3') == {'banner': 1.0, 'slogan': 3.0}
+        assert parse_mix('emoji') == {'emoji': 1.0}
+        with pytest.raises(ValueError):
+            parse_mix('video=1')
+
+    def test_mock_response_matches_prompt(self):
+        """测试模拟响应按提示词返回批量口号、口号或横幅设计"""
+        respond = mock_response({'mainTitle': '樊振东必胜'})
+        batch = json.loads(respond('[0] "a"\n            [1] "b"\n"results"'))
+        assert [item['id'] for item in batch['results']] == [0, 1]
+        assert json.loads(respond('"slogans"'))['slogans']
+        assert json.loads(respond('横幅'))['mainTitle'] == '樊振东必胜'
+
+    def test_summarize_samples(self):
+        """测试按类型汇总任务结果与延迟分位"""
+        samples = [
+            TaskSample('t1', 'slogan', 'completed', 0.01, latency=1.0, queue_wait=0.1),
+            TaskSample('t2', 'slogan', 'completed', 0.01, latency=3.0, queue_wait=0.5),
+            TaskSample('t3', 'banner', 'rejected', 0.01),
+            TaskSample('t4', 'banner', 'timeout', 0.01),
+        ]
+        summary = summarize_samples(samples, elapsed=2.0)
+
+        assert summary['all']['sent'] == 4
+        assert summary['slogan']['throughput'] == 1.0
+        assert summary['slogan']['latency']['p99'] == 3.0
+        assert summary['slogan']['queue_wait']['p50'] == 0.5
+        assert summary['banner']['rejected'] == 1 and summary['banner']['timeout'] == 1
+        assert summary['banner']['latency']['p50'] is None
@@ -0,0 +1,69 @@
+"""
+数据库管理器测试
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.core.database import DatabaseManager
+
+
+def make_async_manager(rows=None, idle_time=0.0):
+    """构造使用模拟aiomysql连接池的数据库管理器"""
+    cursor = MagicMock()
+    cursor.execute = AsyncMock()
+    cursor.fetchall = AsyncMock(return_value=tuple(rows or ()))
+    cursor.rowcount = 3
+    cursor.lastrowid = 42
+    cursor.__aenter__ = AsyncMock(return_value=cursor)
+    cursor.__aexit__ = AsyncMock(return_value=False)
+
+    connection = MagicMock()
+    connection.cursor.return_value = cursor
+    connection.commit = AsyncMock()
+    connection.rollback = AsyncMock()
+    connection.ping = AsyncMock()
+    connection.last_usage = asyncio.get_running_loop().time() - idle_time
+
+    pool = MagicMock()
+    pool.acquire = AsyncMock(return_value=connection)
+
+    manager = DatabaseManager()
+    manager.pool = pool
+    manager.driver = 'aiomysql'
+    return manager, connection, cursor
+
+
+class TestAsyncDatabaseManager:
+    """原生异步驱动测试"""
+
+    @pytest.mark.asyncio
+    async def test_execute_query_returns_rows(self):
+        """测试查询返回字典列表并归还连接"""
+        manager, connection, cursor = make_async_manager(rows=[{'ok': 1}])
+
+        result = await manager.execute_query("SELECT 1 AS ok")
+
+        assert result == [{'ok': 1}]
+        cursor.execute.assert_awaited_once_with("SELECT 1 AS ok", ())
+        manager.pool.release.assert_called_once_with(connection)
+        connection.ping.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_execute_update_and_insert(self):
+        """测试更新返回影响行数、插入返回自增ID"""
+        manager, connection, _ = make_async_manager()
+
+        assert await manager.execute_update("UPDATE t SET a = %s", (1,)) == 3
+        assert await manager.execute_insert("INSERT INTO t VALUES (%s)", (1,)) == 42
+        assert connection.commit.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_idle_connection_health_check(self):
+        """测试空闲过久的连接在使用前ping"""
+        manager, connection, _ = make_async_manager(idle_time=3600)
+
+        await manager.execute_query("SELECT 1")
+
+        connection.ping.assert_awaited_once_with(reconnect=True)
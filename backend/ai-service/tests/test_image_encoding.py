@@ -0,0 +1,100 @@
+"""
+图片输出编码测试
+"""
+
+import io
+
+import pytest
+from unittest.mock import patch
+from PIL import Image
+
+from app.services.gradient import create_gradient
+from app.services.image_encoding import avif_supported, encode_image, resolve_format, resolve_quality
+from app.services.renderer import RenderJob, run_render_job
+
+
+GRADIENT = {'gradient': {'type': 'radial', 'stops': [
+    {'color': '#FF0000', 'position': 0}, {'color': '#FFD700', 'position': 0.6}, {'color': '#8B0000', 'position': 1}
+]}}
+
+
+def gradient_image(mode: str = 'RGBA') -> Image.Image:
+    """横幅背景渐变，接近实际输出的内容"""
+    return create_gradient(400, 150, GRADIENT).convert(mode)
+
+
+class TestResolveFormat:
+    """输出格式与质量选择测试"""
+
+    def test_request_parameter_overrides_default(self):
+        """测试请求参数format优先于IMAGE_FORMAT"""
+        with patch('app.services.image_encoding.settings.IMAGE_FORMAT', 'webp'):
+            assert resolve_format({}) == 'webp'
+            assert resolve_format({'format': 'PNG'}) == 'png'
+            assert resolve_format({'format': 'webp_lossless'}) == 'webp_lossless'
+
+    def test_unknown_format_falls_back_to_default(self):
+        """测试不支持的格式使用默认格式"""
+        with patch('app.services.image_encoding.settings.IMAGE_FORMAT', 'png'):
+            assert resolve_format({'format': 'gif'}) == 'png'
+
+    def test_avif_falls_back_when_unsupported(self):
+        """测试不支持AVIF编码时改用WebP"""
+        with patch('app.services.image_encoding.avif_supported', return_value=False):
+            assert resolve_format({'format': 'avif'}) == 'webp'
+
+    def test_quality(self):
+        """测试编码质量取请求参数或IMAGE_QUALITY并限制范围"""
+        with patch('app.services.image_encoding.settings.IMAGE_QUALITY', 85):
+            assert resolve_quality({}) == 85
+            assert resolve_quality({'quality': 60}) == 60
+            assert resolve_quality({'quality': 500}) == 100
+            assert resolve_quality({'quality': 'high'}) == 85
+
+
+class TestEncodeImage:
+    """图片编码测试"""
+
+    @pytest.mark.parametrize('output_format, pil_format', [
+        ('png', 'PNG'), ('webp', 'WEBP'), ('webp_lossless', 'WEBP')
+    ])
+    def test_encode(self, output_format, pil_format):
+        """测试各格式编码结果可被解码"""
+        encoded = encode_image(gradient_image(), output_format, 85)
+        decoded = Image.open(io.BytesIO(encoded.data))
+        assert decoded.format == pil_format
+        assert decoded.size == (400, 150)
+
+    @pytest.mark.skipif(not avif_supported(), reason="Pillow不支持AVIF编码")
+    def test_encode_avif(self):
+        """测试AVIF编码"""
+        encoded = encode_image(gradient_image(), 'avif', 85)
+        assert encoded.extension == 'avif'
+        assert Image.open(io.BytesIO(encoded.data)).format == 'AVIF'
+
+    def test_opaque_alpha_is_dropped(self):
+        """测试完全不透明的RGBA图片去掉透明通道，半透明图片保留"""
+        opaque = encode_image(gradient_image('RGBA'), 'webp_lossless', 85)
+        assert Image.open(io.BytesIO(opaque.data)).mode == 'RGB'
+
+        translucent = gradient_image('RGBA')
+        translucent.putpixel((0, 0), (0, 0, 0, 128))
+        encoded = encode_image(translucent, 'webp_lossless', 85)
+        assert Image.open(io.BytesIO(encoded.data)).mode == 'RGBA'
+
+    def test_lossy_webp_smaller_than_png(self):
+        """测试有损WebP明显小于PNG"""
+        img = gradient_image()
+        png = encode_image(img, 'png', 85)
+        webp = encode_image(img, 'webp', 85)
+        assert len(webp.data) * 3 < len(png.data)
+
+    def test_render_job_uses_requested_format(self, tmp_path):
+        """测试渲染结果按请求格式保存并记录文件大小"""
+        with patch('app.services.renderer.settings.GENERATED_PATH', str(tmp_path)):
+            result = run_render_job(RenderJob(kind='emoji', task_id='task-1',
+                                              payload={'prompt': '加油', 'parameters': {'format': 'png'}}))
+
+        assert result.image_path == 'generated/emojis/task-1.png'
+        assert result.output_format == 'png'
+        assert result.file_size == (tmp_path / 'emojis' / 'task-1.png').stat().st_size
@@ -0,0 +1,123 @@
+"""
+模型响应JSON提取测试
+"""
+
+import time
+
+from app.services.ai_service import is_valid_banner_design, is_valid_slogans
+from app.services.json_extract import JSONExtractor, iter_object_spans, remove_trailing_commas
+
+
+class TestObjectSpans:
+    """大括号扫描测试"""
+
+    def test_braces_inside_strings(self):
+        """测试字符串中的括号和转义引号不影响配平"""
+        text = '前言 {"a": "}{", "b": "\\"}"} 后记'
+        spans = list(iter_object_spans(text))
+        assert spans == [(3, len(text) - 3)]
+
+    def test_multiple_objects_and_unclosed(self):
+        """测试多个顶层对象与未闭合的对象"""
+        text = '{"a": 1} 和 {"b": 2} 以及 {"c": '
+        spans = list(iter_object_spans(text))
+        assert [text[start:end] for start, end in spans[:2]] == ['{"a": 1}', '{"b": 2}']
+        assert spans[2][1] is None
+
+    def test_remove_trailing_commas(self):
+        """测试只删除字符串之外的尾随逗号"""
+        assert remove_trailing_commas('{"a": [1, 2, ], "b": ",}", }') == '{"a": [1, 2 ], "b": ",}" }'
+
+
+class TestJSONExtractor:
+    """JSON提取测试"""
+
+    def test_prose_braces_before_json(self):
+        """测试正文中的括号不影响提取"""
+        extractor = JSONExtractor()
+        text = '好的，下面用{标题}表示占位：\n{"mainTitle": "樊振东加油", "subTitle": "冠军"}'
+        assert extractor.extract(text, is_valid_banner_design) == {
+            'mainTitle': '樊振东加油', 'subTitle': '冠军'
+        }
+
+    def test_unclosed_prose_brace(self):
+        """测试正文中未闭合的括号不会吞掉后面的对象"""
+        extractor = JSONExtractor()
+        text = '注意 { 这是说明\n{"mainTitle": "加油"}'
+        assert extractor.extract(text, is_valid_banner_design) == {'mainTitle': '加油'}
+
+    def test_quote_after_prose_brace(self):
+        """测试正文中括号之后的引号不会让后面的对象被当作字符串"""
+        extractor = JSONExtractor()
+        texts = {
+            'He said "{" then {"mainTitle":"w"}': 'w',
+            'Use braces like { or " then {"mainTitle": "y"}': 'y',
+            'Sure {note: "hi} and here: {"mainTitle": "x"}': 'x',
+            '说明：返回内容以 "{" 开头。\n{"mainTitle": "樊振东加油"}': '樊振东加油',
+        }
+        for text, title in texts.items():
+            assert extractor.extract(text, is_valid_banner_design) == {'mainTitle': title}
+
+    def test_first_valid_object_wins(self):
+        """测试跳过未通过校验的对象"""
+        extractor = JSONExtractor()
+        text = '{"example": true} {"slogans": []} {"slogans": [{"text": "必胜"}]}'
+        assert extractor.extract(text, is_valid_slogans) == {'slogans': [{'text': '必胜'}]}
+        assert extractor.counters['extracted'] == 1
+
+    def test_code_fence_and_trailing_commas(self):
+        """测试代码块中带尾随逗号的对象被修复"""
+        extractor = JSONExtractor()
+        text = '示例 {"slogans": "略"}\n```json\n{"slogans": [{"text": "必胜",},],}\n```'
+        assert extractor.extract(text, is_valid_slogans) == {'slogans': [{'text': '必胜'}]}
+        assert extractor.counters['fenced'] == 1
+        assert extractor.counters['repaired'] == 1
+
+    def test_failure_metrics(self):
+        """测试提取失败的统计"""
+        extractor = JSONExtractor()
+        assert extractor.extract('没有JSON', name='banner') is None
+        assert extractor.extract('{"slogans": []}', is_valid_slogans, name='slogan') is None
+        assert extractor.extract(None, name='slogan') is None
+
+        stats = extractor.stats()
+        assert stats['failures'] == 3
+        assert stats['schema_rejected'] == 1
+        assert stats['failure_rate'] == 1.0
+        assert stats['failures_by_name'] == {'banner': 1, 'slogan': 2}
+
+    def test_linear_on_long_response(self):
+        """测试长响应中的大量括号不会导致平方级耗时"""
+        extractor = JSONExtractor()
+        text = '{"x": 1} ' * 20000 + '{"mainTitle": "加油"}'
+        start = time.monotonic()
+        assert extractor.extract(text, is_valid_banner_design) == {'mainTitle': '加油'}
+        assert time.monotonic() - start < 2.0
+
+    def test_linear_on_adversarial_braces(self):
+        """测试大量未闭合、嵌套或无法解析的括号不会导致平方级耗时"""
+        extractor = JSONExtractor()
+        n = 20000
+        texts = [
+            '{' * n,
+            '{' * n + '}' * n,
+            '{"a":' * n + '1 x' + '}' * n,
+            '{"a": [1,] x ' * n,
+            '{"' * n,
+            'note {x} and "{" ' * n,
+            '{"a": "' * n,
+        ]
+        start = time.monotonic()
+        for text in texts:
+            assert extractor.extract(text + '{"mainTitle": "加油"}', is_valid_banner_design) == {
+                'mainTitle': '加油'
+            }
+        assert time.monotonic() - start < 2.0
+
+    def test_object_inside_failed_object(self):
+        """测试无法解析的对象内部的有效对象仍能被找到"""
+        extractor = JSONExtractor()
+        text = '{"a": {"mainTitle": "加油", "tags": [1,]} x}'
+        assert extractor.extract(text, is_valid_banner_design) == {
+            'mainTitle': '加油', 'tags': [1]
+        }
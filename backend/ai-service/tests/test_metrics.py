@@ -0,0 +1,118 @@
+"""
+运行指标测试
+"""
+
+import asyncio
+import pytest
+
+from app.core.metrics import (
+    MODEL_CALL_ERRORS, MODEL_CALL_LATENCY, MetricsRegistry, MetricsServer
+)
+from app.services.model_guard import CircuitBreaker, ModelGuard, ModelTimeoutError
+
+
+class TestMetricsRegistry:
+    """指标注册表测试"""
+
+    @pytest.mark.asyncio
+    async def test_render_text_format(self):
+        """测试Prometheus文本格式输出"""
+        registry = MetricsRegistry()
+        tasks = registry.counter('tasks_total', '任务数', ['type'])
+        wait = registry.histogram('wait_seconds', '等待时间', ['type'], buckets=(0.1, 1.0))
+        tasks.inc(type='banner')
+        tasks.inc(2, type='slogan')
+        wait.observe(0.05, type='banner')
+        wait.observe(0.5, type='banner')
+        wait.observe(5, type='banner')
+
+        text = await registry.render()
+        assert '# TYPE tasks_total counter' in text
+        assert 'tasks_total{type="slogan"} 2' in text
+        assert 'wait_seconds_bucket{type="banner",le="0.1"} 1' in text
+        assert 'wait_seconds_bucket{type="banner",le="1"} 2' in text
+        assert 'wait_seconds_bucket{type="banner",le="+Inf"} 3' in text
+        assert 'wait_seconds_count{type="banner"} 3' in text
+        assert 'wait_seconds_sum{type="banner"} 5.55' in text
+
+    @pytest.mark.asyncio
+    async def test_collectors_and_label_validation(self):
+        """测试采集函数在输出前运行，标签不匹配时报错"""
+        registry = MetricsRegistry()
+        depth = registry.gauge('queue_depth', '队列深度', ['lane'])
+
+        async def collect():
+            depth.set(3, lane='slogan')
+
+        registry.add_collector(collect)
+        assert 'queue_depth{lane="slogan"} 3' in await registry.render()
+        with pytest.raises(ValueError):
+            depth.set(1, queue='slogan')
+        with pytest.raises(ValueError):
+            registry.gauge('queue_depth', '重复')
+
+    @pytest.mark.asyncio
+    async def test_timer_decorator(self):
+        """测试耗时装饰器"""
+        registry = MetricsRegistry()
+        latency = registry.histogram('call_seconds', '调用耗时', ['command'])
+
+        @latency.time(command='get')
+        async def call():
+            await asyncio.sleep(0.01)
+            return 'ok'
+
+        assert await call() == 'ok'
+        assert latency.count(command='get') == 1
+        assert latency.sum(command='get') >= 0.01
+
+
+class TestMetricsServer:
+    """指标HTTP服务测试"""
+
+    @pytest.mark.asyncio
+    async def test_serves_metrics(self):
+        """测试GET /metrics 返回指标，其他路径返回404"""
+        registry = MetricsRegistry()
+        registry.counter('up_total', '启动次数').inc()
+        server = MetricsServer(registry)
+        await server.start(host='127.0.0.1', port=0)
+        try:
+            async def fetch(path):
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+                writer.write(f"GET {path} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+                await writer.drain()
+                response = await reader.read()
+                writer.close()
+                return response.decode()
+
+            response = await fetch('/metrics')
+            assert response.startswith('HTTP/1.1 200')
+            assert 'up_total 1' in response
+            assert (await fetch('/')).startswith('HTTP/1.1 404')
+        finally:
+            await server.stop()
+
+
+class TestModelCallMetrics:
+    """模型调用指标测试"""
+
+    @pytest.mark.asyncio
+    async def test_model_guard_records_latency_and_errors(self):
+        """测试模型调用记录耗时与失败原因"""
+        guard = ModelGuard(timeout=0.05, breaker=CircuitBreaker(window=10, min_calls=10))
+        successes = MODEL_CALL_LATENCY.count(outcome='success')
+        timeouts = MODEL_CALL_ERRORS.value(reason='timeout')
+
+        async def fast():
+            return 'ok'
+
+        async def slow():
+            await asyncio.sleep(1)
+
+        await guard.call(fast)
+        with pytest.raises(ModelTimeoutError):
+            await guard.call(slow)
+
+        assert MODEL_CALL_LATENCY.count(outcome='success') == successes + 1
+        assert MODEL_CALL_ERRORS.value(reason='timeout') == timeouts + 1
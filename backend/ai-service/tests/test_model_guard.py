@@ -0,0 +1,260 @@
+"""
+模型调用保护测试
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.ai_service import AIService, DEFAULT_SLOGANS
+from app.services.mock_model import MockStreamingModel
+from app.services.renderer import RenderResult
+from app.services.model_guard import (
+    CircuitBreaker, CircuitOpenError, Hedger, ModelGuard, ModelTimeoutError
+)
+
+
+def make_breaker(**kwargs):
+    options = dict(window=4, min_calls=4, failure_rate=0.5, slow_call_seconds=1.0,
+                   slow_call_rate=0.75, reset_timeout=0.05)
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def make_hedger(**kwargs):
+    options = dict(percentile=90, budget=1.0, min_samples=5, min_delay=0.0, burst=5.0)
+    options.update(kwargs)
+    return Hedger(**options)
+
+
+async def warm_up(hedger, latency=0.01, count=5):
+    async def call():
+        await asyncio.sleep(latency)
+        return 'ok'
+    for _ in range(count):
+        await hedger.run(call)
+
+
+class TestHedger:
+    """对冲请求测试"""
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_without_samples(self):
+        """测试样本不足时不对冲"""
+        hedger = make_hedger()
+        assert hedger.delay() is None
+        await warm_up(hedger, count=4)
+        assert hedger.delay() is None
+        assert hedger.counters['hedged'] == 0
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins_against_slow_primary(self):
+        """测试原始请求过慢时对冲请求先返回"""
+        hedger = make_hedger()
+        await warm_up(hedger)
+        latencies = iter([1.0, 0.01])
+
+        async def call():
+            latency = next(latencies)
+            await asyncio.sleep(latency)
+            return latency
+
+        start = time.monotonic()
+        assert await hedger.run(call) == 0.01
+        assert time.monotonic() - start < 0.5
+
+        stats = hedger.stats()
+        assert stats['hedged'] == 1
+        assert stats['hedge_wins'] == 1
+        assert stats['win_rate'] == 1.0
+        assert stats['hedge_rate'] == round(1 / 6, 4)
+
+    @pytest.mark.asyncio
+    async def test_primary_failure_falls_back_to_hedge(self):
+        """测试一个请求失败时使用另一个请求的结果"""
+        hedger = make_hedger()
+        await warm_up(hedger)
+        attempts = []
+
+        async def call():
+            attempts.append(1)
+            if len(attempts) == 1:
+                await asyncio.sleep(0.05)
+                raise RuntimeError("primary failed")
+            await asyncio.sleep(0.1)
+            return 'hedge'
+
+        assert await hedger.run(call) == 'hedge'
+        assert hedger.counters['hedge_wins'] == 1
+
+    @pytest.mark.asyncio
+    async def test_both_failures_raise(self):
+        """测试两个请求都失败时抛出异常"""
+        hedger = make_hedger()
+        await warm_up(hedger)
+
+        async def call():
+            await asyncio.sleep(0.05)
+            raise RuntimeError("failed")
+
+        with pytest.raises(RuntimeError):
+            await hedger.run(call)
+
+    @pytest.mark.asyncio
+    async def test_budget_caps_hedges(self):
+        """测试对冲数量受预算限制"""
+        # 取最小延迟作为对冲延迟，保证每次调用都会尝试对冲
+        hedger = make_hedger(percentile=0, budget=0.25, burst=1.0)
+        await warm_up(hedger)
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'ok'
+
+        for _ in range(8):
+            await hedger.run(slow)
+
+        # 名额上限为1且每次调用只积累0.25个，8次调用中只有第1次和第5次能对冲
+        assert hedger.counters['hedged'] == 2
+        assert hedger.counters['budget_exhausted'] == 6
+        assert len(calls) == 8 + hedger.counters['hedged']
+
+    @pytest.mark.asyncio
+    async def test_guard_skips_hedge_when_disabled_per_call(self):
+        """测试调用方可以关闭单次调用的对冲"""
+        hedger = make_hedger()
+        await warm_up(hedger)
+        guard = ModelGuard(timeout=1.0, breaker=make_breaker(), hedger=hedger)
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return 'ok'
+
+        assert await guard.call(slow, hedge=False) == 'ok'
+        assert len(calls) == 1
+        assert await guard.call(slow) == 'ok'
+        assert len(calls) == 3
+        assert guard.stats()['hedging']['hedged'] == 1
+
+
+class TestCircuitBreaker:
+    """熔断器测试"""
+
+    def test_opens_on_failure_rate_and_recovers(self):
+        """测试失败率超过阈值时打开，探测成功后关闭"""
+        breaker = make_breaker()
+        for failed in (False, True, False, True):
+            assert breaker.allow()
+            breaker.record(failed, 0.1)
+
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+
+        time.sleep(0.06)
+        assert breaker.allow()
+        # 探测期间只放行一次调用
+        assert not breaker.allow()
+        breaker.record(False, 0.1)
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_opens_on_slow_calls(self):
+        """测试慢调用比例超过阈值时打开"""
+        breaker = make_breaker()
+        for _ in range(4):
+            breaker.record(False, 2.0)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.stats()["opened"] == 1
+
+
+class TestModelGuard:
+    """截止时间与熔断测试"""
+
+    @pytest.mark.asyncio
+    async def test_deadline_and_open_breaker(self):
+        """测试超时中止调用，熔断后不再发起调用"""
+        guard = ModelGuard(timeout=0.05, breaker=make_breaker(min_calls=2, window=2))
+        calls = 0
+
+        async def hang():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(10)
+
+        for _ in range(2):
+            with pytest.raises(ModelTimeoutError):
+                await guard.call(hang)
+        with pytest.raises(CircuitOpenError):
+            await guard.call(hang)
+
+        assert calls == 2
+        assert guard.stats()["timeouts"] == 2
+        assert not guard.available
+
+
+    @pytest.mark.asyncio
+    async def test_hung_call_aborted_in_model_thread(self):
+        """测试模型调用在专用线程中执行，卡住的请求由SDK按截止时间中止并释放线程"""
+        service = AIService()
+        service.model_guard = ModelGuard(timeout=0.2, breaker=make_breaker(), threads=1)
+        model = MockStreamingModel('{"slogans": []}', latency=10)
+        threads = []
+
+        def generate_content(prompt, **kwargs):
+            threads.append(threading.current_thread().name)
+            return model.generate_content(prompt, **kwargs)
+
+        service.gemini_model = MagicMock(generate_content=generate_content)
+        start = time.monotonic()
+        with pytest.raises(ModelTimeoutError):
+            await service._call_model("prompt")
+        await asyncio.to_thread(service.model_guard.executor.shutdown, wait=True)
+
+        assert threads[0].startswith('model-call')
+        assert time.monotonic() - start < 2
+
+
+class TestModelFallback:
+    """模型不可用时的降级测试"""
+
+    @pytest.mark.asyncio
+    async def test_hung_model_falls_back_to_default_design(self):
+        """测试模型无响应时使用默认横幅设计"""
+        service = AIService()
+        service._update_task_status = AsyncMock()
+        service._create_enhanced_banner_image = AsyncMock(
+            return_value=RenderResult(image_path="generated/banners/t1.webp", width=800, height=300)
+        )
+        service.gemini_model = MockStreamingModel("{}", latency=1.0)
+        service.model_guard = ModelGuard(timeout=0.05, breaker=make_breaker())
+
+        result = await service._generate_banner(
+            {'task_id': "t1", 'type': 'banner', 'prompt': "樊振东加油", 'parameters': {}}
+        )
+
+        assert result["fallback"]
+        assert result["design_data"] == service._get_default_banner_design("樊振东加油")
+
+    @pytest.mark.asyncio
+    async def test_open_breaker_returns_canned_slogans(self):
+        """测试熔断期间直接返回预设口号"""
+        service = AIService()
+        service._update_task_status = AsyncMock()
+        service.gemini_model = MagicMock()
+        breaker = make_breaker(reset_timeout=60)
+        for _ in range(4):
+            breaker.record(True, 0.1)
+        service.model_guard = ModelGuard(timeout=1, breaker=breaker)
+
+        result = await service._generate_slogan(
+            {'task_id': "t1", 'type': 'slogan', 'prompt': "樊振东加油", 'parameters': {}}
+        )
+
+        assert result["slogans"] == DEFAULT_SLOGANS
+        assert result["fallback"]
+        service.gemini_model.generate_content.assert_not_called()
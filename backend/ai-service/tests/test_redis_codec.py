@@ -0,0 +1,90 @@
+"""
+Redis编解码测试
+"""
+
+import json
+import pytest
+
+from app.core.redis_client import RedisCodec, msgpack
+
+
+TASK_INFO = {
+    'status': 'completed',
+    'progress': 100,
+    'result': {
+        'type': 'banner',
+        'content': "樊振东加油！",
+        'design_data': {'mainTitle': "樊振东加油！", 'visualElements': [{'id': 'star'}] * 20},
+        'image_path': "generated/banners/t1.png"
+    }
+}
+
+
+class TestRedisCodec:
+    """编解码器测试"""
+
+    @pytest.mark.parametrize("fmt", ["json", pytest.param(
+        "msgpack", marks=pytest.mark.skipif(msgpack is None, reason="未安装msgpack"))])
+    def test_round_trip_keeps_types(self, fmt):
+        """测试各类型值编码后原样读回"""
+        codec = RedisCodec(fmt=fmt, compress_threshold=256)
+        for value in [TASK_INFO, [1, 2, 3], 42, 1.5, True, "123", "樊振东", b"\x00\x01"]:
+            assert codec.decode(codec.encode(value)) == value
+
+        # 字符串不会被当作JSON解析
+        assert isinstance(codec.decode(codec.encode("123")), str)
+
+    def test_large_payload_compressed(self):
+        """测试超过阈值的值压缩存储"""
+        codec = RedisCodec(fmt="json", compress_threshold=256)
+        data = codec.encode(TASK_INFO)
+
+        assert data[:2] == b"jz"
+        assert len(data) < len(json.dumps(TASK_INFO, ensure_ascii=False).encode('utf-8'))
+        assert codec.stats()["compressed"] == 1
+        assert codec.encode({'status': 'processing'})[:2] == b"j-"
+
+    def test_legacy_values_readable(self):
+        """测试读取引入编码头部之前写入的值"""
+        codec = RedisCodec(fmt="json")
+        assert codec.decode(json.dumps(TASK_INFO, ensure_ascii=False).encode('utf-8')) == TASK_INFO
+        assert codec.decode(b"plain text") == "plain text"
+        assert codec.stats()["legacy_reads"] == 2
+
+
+class TestRedisManagerCodec:
+    """Redis管理器编解码测试"""
+
+    @pytest.fixture
+    def manager(self, redis_manager):
+        redis_manager.codec = RedisCodec(fmt="json", compress_threshold=256)
+        return redis_manager
+
+    @pytest.mark.asyncio
+    async def test_value_api_uses_codec(self, manager):
+        """测试值接口经编解码器读写"""
+        await manager.set("task:t1", TASK_INFO, expire=60)
+        await manager.hset("h", "count", 3)
+        await manager.lpush("l", {'a': 1}, "b")
+
+        assert await manager.get("task:t1") == TASK_INFO
+        assert await manager.mget(["task:t1", "task:none"]) == [TASK_INFO, None]
+        assert await manager.hgetall("h") == {"count": 3}
+        assert await manager.rpop("l") == {'a': 1}
+        assert await manager.rpop("l") == "b"
+        assert await manager.exists("task:t1")
+
+    @pytest.mark.asyncio
+    async def test_pipeline_and_batch_helpers(self, manager):
+        """测试管道批量执行与批量写入"""
+        async with manager.pipeline() as pipe:
+            pipe.set("task:t1", TASK_INFO, expire=60)
+            pipe.hincrby("totals", "completed")
+            pipe.get("task:t1")
+        assert pipe.results[2] == TASK_INFO
+
+        assert await manager.mset({"a": {'x': 1}, "b": "text"}, expire=60)
+        assert await manager.mget(["a", "b"]) == [{'x': 1}, "text"]
+        assert await manager.hmset("h", {"count": 3, "name": "樊振东"})
+        assert await manager.hgetall("h") == {"count": 3, "name": "樊振东"}
+        assert await manager.counters("totals") == {"completed": 1}
@@ -0,0 +1,138 @@
+"""
+生成结果缓存测试
+"""
+
+import asyncio
+import pytest
+
+from app.services.result_cache import ResultCache
+
+
+@pytest.fixture
+def cache(redis_client):
+    """基于fakeredis的结果缓存"""
+    return ResultCache(redis_client=redis_client, prefix="test:result", ttl=60,
+                       max_entries=2, max_result_bytes=1024)
+
+
+class TestResultCache:
+    """结果缓存测试"""
+
+    def test_key_normalizes_prompt_and_parameters(self, cache):
+        """测试提示词空白、全角字符与参数顺序不影响缓存键"""
+        key = cache.key("slogan", "樊振东加油", {"style": "激励", "count": 3})
+        assert cache.key("slogan", "  樊振东加油 ", {"count": 3, "style": "激励"}) == key
+        assert cache.key("slogan", "樊振东加油！", {}) == cache.key("slogan", "樊振东加油!", {})
+        assert cache.key("banner", "樊振东加油", {"style": "激励", "count": 3}) != key
+
+    @pytest.mark.asyncio
+    async def test_concurrent_tasks_share_one_generation(self, cache):
+        """测试相同内容的并发任务只生成一次"""
+        calls = 0
+
+        async def generate():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"type": "slogan", "slogans": ["樊振东必胜"]}
+
+        key = cache.key("slogan", "樊振东加油", {})
+        results = await asyncio.gather(*(cache.get_or_generate(key, generate) for _ in range(5)))
+
+        assert calls == 1
+        assert all(result == results[0] for result in results)
+        assert await cache.get(key) == results[0]
+
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["shared"] == 4
+        assert stats["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_replicas_share_one_generation(self, redis_client):
+        """测试多个副本的相同任务通过Redis生成标记只生成一次"""
+        replicas = [ResultCache(redis_client=redis_client, prefix="test:result", ttl=60,
+                                poll_interval=0.01) for _ in range(3)]
+        calls = 0
+
+        async def generate():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"type": "slogan", "slogans": ["樊振东必胜"]}
+
+        key = replicas[0].key("slogan", "樊振东加油", {})
+        results = await asyncio.gather(*(replica.get_or_generate(key, generate)
+                                         for replica in replicas))
+
+        assert calls == 1
+        assert all(result == results[0] for result in results)
+        assert sum(replica.stats()["misses"] for replica in replicas) == 1
+        assert sum(replica.stats()["hits"] for replica in replicas) == 2
+        assert await redis_client.get(f"{key}:inflight") is None
+
+    @pytest.mark.asyncio
+    async def test_expired_marker_is_taken_over(self, cache, redis_client):
+        """测试生成标记过期（副本退出）后由等待的副本自行生成"""
+        cache.poll_interval = 0.01
+        key = cache.key("slogan", "副本退出", {})
+        await redis_client.set(f"{key}:inflight", "departed", px=100)
+
+        async def generate():
+            return {"slogans": ["接替生成"]}
+
+        assert await cache.get_or_generate(key, generate) == {"slogans": ["接替生成"]}
+        assert cache.stats()["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_corrupt_entry_is_a_miss(self, cache, redis_client):
+        """测试缓存内容损坏时按未命中处理并重新生成"""
+        key = cache.key("slogan", "损坏", {})
+        await redis_client.set(key, "{not json")
+
+        assert await cache.get(key) is None
+        assert cache.stats()["errors"] == 1
+
+        async def generate():
+            return {"slogans": ["重新生成"]}
+
+        assert await cache.get_or_generate(key, generate) == {"slogans": ["重新生成"]}
+        assert await cache.get(key) == {"slogans": ["重新生成"]}
+
+    @pytest.mark.asyncio
+    async def test_failure_is_not_cached(self, cache):
+        """测试生成失败时等待者收到异常且不写入缓存"""
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("model error")
+
+        key = cache.key("slogan", "失败", {})
+        results = await asyncio.gather(cache.get_or_generate(key, fail),
+                                       cache.get_or_generate(key, fail),
+                                       return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert await cache.get(key) is None
+
+    @pytest.mark.asyncio
+    async def test_size_limits(self, cache):
+        """测试条数上限淘汰最早写入的结果，超大结果不缓存"""
+        keys = [cache.key("slogan", f"口号{i}", {}) for i in range(3)]
+        for i, key in enumerate(keys):
+            await cache.set(key, {"slogans": [f"口号{i}"]})
+
+        assert await cache.get(keys[0]) is None
+        assert await cache.get(keys[2]) == {"slogans": ["口号2"]}
+        assert cache.stats()["evictions"] == 1
+
+        await cache.set(keys[0], {"slogans": ["长" * 1024]})
+        assert cache.stats()["oversized"] == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_image_is_stale(self, cache):
+        """测试图片文件已删除的结果视为失效"""
+        key = cache.key("banner", "横幅", {})
+        await cache.set(key, {"image_path": "generated/banners/missing.png"})
+
+        assert await cache.get(key) is None
+        assert cache.stats()["stale"] == 1
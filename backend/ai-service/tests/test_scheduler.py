@@ -0,0 +1,47 @@
+"""
+任务调度测试
+"""
+
+from collections import Counter
+
+from app.services.scheduler import FairScheduler, LaneSelector
+
+
+class TestLaneSelector:
+    """车道选择测试"""
+
+    def test_smooth_weighted_round_robin(self):
+        """测试选择次数与权重成比例且交错分布"""
+        selector = LaneSelector({'slogan': 5, 'banner': 1})
+        picks = [selector.select(['slogan', 'banner']) for _ in range(12)]
+        assert Counter(picks) == {'slogan': 10, 'banner': 2}
+        assert picks[:6].count('banner') == 1
+
+    def test_empty_and_unconfigured_lanes(self):
+        """测试无候选车道与未配置权重的车道"""
+        selector = LaneSelector({})
+        assert selector.select([]) is None
+        assert selector.weight('emoji') == 1
+
+
+class TestFairScheduler:
+    """公平调度器测试"""
+
+    def test_users_rotate_within_lane(self):
+        """测试车道内各用户轮流取任务"""
+        scheduler = FairScheduler({'banner': 1})
+        for task_id, user in [("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b"), ("c1", None)]:
+            scheduler.push({'task_id': task_id, 'type': 'banner', 'user_id': user})
+
+        order = [scheduler.pop()['task_id'] for _ in range(5)]
+        assert order == ["a1", "b1", "c1", "a2", "a3"]
+        assert scheduler.pop() is None
+        assert len(scheduler) == 0
+
+    def test_push_front(self):
+        """测试重新入队的任务优先处理"""
+        scheduler = FairScheduler({})
+        scheduler.push({'task_id': "t1", 'type': 'emoji'})
+        scheduler.push({'task_id': "t0", 'type': 'emoji'}, front=True)
+        assert scheduler.pop()['task_id'] == "t0"
+        assert scheduler.depths() == {'emoji': 1}
@@ -0,0 +1,95 @@
+"""
+任务状态写入测试
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.services.status_writer import TaskStatusWriter, PROGRESS_UPDATE_QUERY, TASK_TOTALS_KEY
+
+
+@pytest.fixture
+def backends(redis_manager):
+    """模拟数据库，Redis使用fakeredis"""
+    db = AsyncMock()
+    with patch('app.services.status_writer.get_db', AsyncMock(return_value=db)), \
+            patch('app.services.status_writer.get_redis', AsyncMock(return_value=redis_manager)):
+        yield db, redis_manager
+
+
+class TestTaskStatusWriter:
+    """任务状态写入器测试"""
+
+    @pytest.mark.asyncio
+    async def test_progress_updates_are_coalesced(self, backends):
+        """测试中间进度合并后批量落库"""
+        db, redis = backends
+        writer = TaskStatusWriter(flush_interval=60, batch_size=100)
+
+        for progress in (10, 30, 60):
+            await writer.write("task-a", "processing", progress)
+        await writer.write("task-b", "processing", 10)
+
+        assert (await redis.get("task:task-a"))["progress"] == 60
+        assert (await redis.get("task:task-b"))["progress"] == 10
+        db.execute_update.assert_not_awaited()
+        db.execute_many.assert_not_awaited()
+
+        await writer.flush()
+
+        db.execute_many.assert_awaited_once_with(PROGRESS_UPDATE_QUERY, [
+            ("processing", 60, "task-a"),
+            ("processing", 10, "task-b")
+        ])
+        stats = writer.stats()
+        assert stats["coalesced"] == 2
+        assert stats["flushed_rows"] == 2
+        assert stats["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_terminal_status_written_immediately(self, backends):
+        """测试终态立即落库并丢弃缓冲的进度"""
+        db, redis = backends
+        writer = TaskStatusWriter(flush_interval=60, batch_size=100)
+
+        await writer.write("task-a", "processing", 90)
+        await writer.write("task-a", "completed", 100, {"image_path": "generated/banners/task-a.png"})
+
+        db.execute_update.assert_awaited_once()
+        query, params = db.execute_update.await_args.args
+        assert "completed_at = NOW()" in query
+        assert params == ("completed", 100, "generated/banners/task-a.png", "task-a")
+        assert (await redis.get("task:task-a"))["result"]["image_path"] == "generated/banners/task-a.png"
+        assert await redis.counters(TASK_TOTALS_KEY) == {"completed": 1}
+
+        await writer.close()
+        db.execute_many.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_terminal_status_records_image_info(self, backends):
+        """测试终态记录图片的文件大小与尺寸"""
+        db, _ = backends
+        writer = TaskStatusWriter(flush_interval=60, batch_size=100)
+
+        await writer.write("task-a", "completed", 100, {
+            "image_path": "generated/banners/task-a.webp", "file_size": 15384, "dimensions": "1600x600"
+        })
+
+        query, params = db.execute_update.await_args.args
+        assert "file_size = %s, dimensions = %s" in query
+        assert params == ("completed", 100, "generated/banners/task-a.webp", 15384, "1600x600", "task-a")
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_is_retried(self, backends):
+        """测试批量写入失败后保留记录等待重试"""
+        db, _ = backends
+        db.execute_many.side_effect = [Exception("db down"), 1]
+        writer = TaskStatusWriter(flush_interval=60, batch_size=100)
+
+        await writer.write("task-a", "processing", 30)
+        await writer.flush()
+        assert writer.stats()["pending"] == 1
+
+        await writer.flush()
+        assert writer.stats()["pending"] == 0
+        assert writer.stats()["flush_errors"] == 1
@@ -0,0 +1,88 @@
+"""
+模型流式输出测试
+"""
+
+import json
+import pytest
+from unittest.mock import AsyncMock
+
+from app.core.config import settings
+from app.services.ai_service import AIService
+from app.services.mock_model import MockStreamingModel
+from app.services.streaming import StreamingJSONScanner, stream_model_text
+
+SLOGANS_RESPONSE = "```json\n" + json.dumps({
+    "slogans": [
+        {"type": "简短有力", "text": "樊振东必胜！", "visualStyle": {"elements": ["star"]}},
+        {"type": "押韵节拍", "text": "樊振东，真英雄，\"乒乓\"场上显神通！"}
+    ]
+}, ensure_ascii=False) + "\n```"
+
+
+class TestStreamingJSONScanner:
+    """增量JSON扫描测试"""
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 16, 1000])
+    def test_array_items_emitted_when_closed(self, chunk_size):
+        """测试任意分段下数组元素在闭合时返回且只返回一次"""
+        scanner = StreamingJSONScanner(array_key='slogans')
+        items = []
+        for start in range(0, len(SLOGANS_RESPONSE), chunk_size):
+            items.extend(scanner.feed(SLOGANS_RESPONSE[start:start + chunk_size]))
+
+        assert [item["text"] for item in items] == ["樊振东必胜！", "樊振东，真英雄，\"乒乓\"场上显神通！"]
+        assert items[0]["visualStyle"] == {"elements": ["star"]}
+
+    def test_field_found_before_response_completes(self):
+        """测试字段值完整后即可取得"""
+        scanner = StreamingJSONScanner(fields=('mainTitle',))
+        scanner.feed('{"mainTitle": "樊振东')
+        assert 'mainTitle' not in scanner.found
+        scanner.feed('加油！", "visualElements": [')
+        assert scanner.found == {'mainTitle': "樊振东加油！"}
+
+
+class TestStreamingGeneration:
+    """流式生成测试"""
+
+    @pytest.mark.asyncio
+    async def test_stream_model_text(self):
+        """测试模拟模型逐段输出"""
+        model = MockStreamingModel("abcdefg", chunk_size=3)
+        chunks = [chunk async for chunk in stream_model_text(model, "prompt")]
+        assert chunks == ["abc", "def", "g"]
+
+    @pytest.mark.asyncio
+    async def test_slogans_published_as_they_complete(self, monkeypatch):
+        """测试每条口号完成后立即发布到任务状态"""
+        monkeypatch.setattr(settings, 'MODEL_STREAMING', True)
+        service = AIService()
+        service._update_task_status = AsyncMock()
+        service.gemini_model = MockStreamingModel(SLOGANS_RESPONSE, chunk_size=8)
+
+        result = await service._generate_slogan(
+            {'task_id': "t1", 'type': 'slogan', 'prompt': "樊振东加油", 'parameters': {}}
+        )
+
+        partials = [call.args[3] for call in service._update_task_status.await_args_list
+                    if len(call.args) > 3]
+        assert [len(partial["slogans"]) for partial in partials] == [1, 2]
+        assert all(partial["partial"] for partial in partials)
+        assert len(result["slogans"]) == 2
+
+    @pytest.mark.asyncio
+    async def test_partial_banner_published_once_title_known(self, monkeypatch):
+        """测试主标题确定后发布部分横幅设计"""
+        monkeypatch.setattr(settings, 'MODEL_STREAMING', True)
+        service = AIService()
+        service._update_task_status = AsyncMock()
+        service.gemini_model = MockStreamingModel(
+            '{"mainTitle": "樊振东加油！", "subTitle": "为梦想而战", "visualElements": []}', chunk_size=5
+        )
+
+        text = await service._stream_banner_design("t1", "prompt")
+
+        assert json.loads(text)["mainTitle"] == "樊振东加油！"
+        service._update_task_status.assert_awaited_once()
+        partial = service._update_task_status.await_args.args[3]
+        assert partial["design_data"]["mainTitle"] == "樊振东加油！"
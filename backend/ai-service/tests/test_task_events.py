@@ -0,0 +1,124 @@
+"""
+任务进度推送测试
+"""
+
+import asyncio
+import json
+import pytest
+from contextlib import asynccontextmanager
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from unittest.mock import AsyncMock, patch
+
+from app.api import routes
+from app.main import app
+from app.services.task_events import TaskEventHub, task_channel
+
+
+async def publish_until_delivered(client, task_id, event, queue):
+    """订阅生效前发布的消息会丢失，重复发布直到收到"""
+    for _ in range(50):
+        await client.publish(task_channel(task_id), json.dumps(event))
+        try:
+            return await asyncio.wait_for(queue.get(), timeout=0.1)
+        except asyncio.TimeoutError:
+            continue
+    raise AssertionError("事件未送达")
+
+
+class TestTaskEventHub:
+    """任务事件分发测试"""
+
+    @pytest.mark.asyncio
+    async def test_subscribers_share_one_redis_subscription(self, redis_client):
+        """测试同一任务的多个订阅者共用一个Redis订阅"""
+        hub = TaskEventHub(redis_client=redis_client)
+        try:
+            async with hub.subscribe("t1") as first, hub.subscribe("t1") as second:
+                event = {'task_id': "t1", 'status': 'processing', 'progress': 30}
+                assert await publish_until_delivered(redis_client, "t1", event, first) == event
+                assert await asyncio.wait_for(second.get(), timeout=1) == event
+                assert hub.stats()["redis_subscriptions"] == 1
+                assert hub.stats()["subscribers"] == 2
+
+            assert hub.stats()["tasks"] == 0
+        finally:
+            await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_event_stream_ends_on_terminal_status(self, redis_manager):
+        """测试事件流先返回快照，任务完成后结束"""
+        hub = TaskEventHub(redis_client=redis_manager.redis_client)
+        await redis_manager.set("task:t2", {'status': 'processing', 'progress': 10})
+
+        with patch.object(routes, 'task_event_hub', hub), \
+                patch.object(routes, 'get_redis', AsyncMock(return_value=redis_manager)):
+            events = routes._task_events("t2")
+            assert (await events.__anext__())['progress'] == 10
+
+            async def publish_completion():
+                while not hub.stats()["subscribers"]:
+                    await asyncio.sleep(0.01)
+                for _ in range(50):
+                    await redis_manager.publish(task_channel("t2"),
+                                                {'task_id': "t2", 'status': 'completed', 'progress': 100})
+                    await asyncio.sleep(0.05)
+
+            publisher = asyncio.create_task(publish_completion())
+            try:
+                completed = await asyncio.wait_for(events.__anext__(), timeout=3)
+                assert completed['status'] == 'completed'
+                with pytest.raises(StopAsyncIteration):
+                    await events.__anext__()
+            finally:
+                publisher.cancel()
+                await hub.close()
+
+
+class IdleHub:
+    """不会收到事件的订阅"""
+
+    @asynccontextmanager
+    async def subscribe(self, task_id):
+        yield asyncio.Queue()
+
+
+class TestTaskEventRoutes:
+    """任务进度推送接口测试"""
+
+    @pytest.mark.asyncio
+    async def test_snapshot_falls_back_to_database(self, redis_manager):
+        """测试缓存中没有快照时读取数据库记录，记录已是终态时直接结束"""
+        db = AsyncMock()
+        db.execute_query.return_value = [{
+            'task_id': "t3", 'status': 'completed', 'progress': 100,
+            'output_image_path': "generated/banners/t3.png", 'thumbnail_path': None,
+            'error_message': None, 'generation_time': 12, 'created_at': None, 'completed_at': None
+        }]
+
+        with patch.object(routes, 'task_event_hub', IdleHub()), \
+                patch.object(routes, 'get_redis', AsyncMock(return_value=redis_manager)), \
+                patch.object(routes, 'get_db', AsyncMock(return_value=db)):
+            events = [event async for event in routes._task_events("t3")]
+
+        assert len(events) == 1
+        assert events[0]['status'] == 'completed'
+        assert events[0]['result']['image_path'] == "generated/banners/t3.png"
+
+    def test_unknown_task(self, redis_manager):
+        """测试任务不存在时SSE返回404，WebSocket发送错误后关闭"""
+        db = AsyncMock()
+        db.execute_query.return_value = []
+
+        with patch.object(routes, 'task_event_hub', IdleHub()), \
+                patch.object(routes, 'get_redis', AsyncMock(return_value=redis_manager)), \
+                patch.object(routes, 'get_db', AsyncMock(return_value=db)):
+            client = TestClient(app)
+            response = client.get("/api/v1/task/missing/events")
+            assert response.status_code == 404
+
+            with client.websocket_connect("/api/v1/task/missing/ws") as websocket:
+                assert websocket.receive_json() == {'task_id': "missing", 'error': "任务不存在"}
+                with pytest.raises(WebSocketDisconnect) as exc_info:
+                    websocket.receive_json()
+            assert exc_info.value.code == routes.WS_CLOSE_TASK_NOT_FOUND
@@ -0,0 +1,203 @@
+"""
+生成任务队列测试
+"""
+
+import asyncio
+import pytest
+
+from app.services.task_queue import MemoryTaskQueue, RedisTaskQueue, TaskQueue
+
+
+@pytest.fixture(params=[True, False], ids=['lua', 'watch'])
+def redis_queue(request, redis_client):
+    """基于fakeredis的Redis任务队列，分别以Lua脚本和WATCH事务出队"""
+    if request.param:
+        # fakeredis需要lupa才能执行Lua脚本
+        pytest.importorskip("lupa")
+    return RedisTaskQueue(redis_client=redis_client, prefix="test:queue",
+                          visibility_timeout=30, max_deliveries=2, poll_timeout=0.1,
+                          use_scripts=request.param)
+
+
+def make_task(task_id):
+    return {'task_id': task_id, 'type': 'slogan', 'prompt': '樊振东加油', 'parameters': {}}
+
+
+class TestRedisTaskQueue:
+    """Redis任务队列测试"""
+
+    @pytest.mark.asyncio
+    async def test_fifo_and_ack(self, redis_queue):
+        """测试先进先出与确认"""
+        await redis_queue.put(make_task("t1"))
+        await redis_queue.put(make_task("t2"))
+        assert await redis_queue.size() == 2
+
+        first = await redis_queue.get()
+        assert first == make_task("t1")
+        assert await redis_queue.size() == 1
+
+        await redis_queue.ack(first)
+        client = redis_queue.client
+        assert await client.llen(redis_queue.processing_key) == 0
+        assert await client.hexists(redis_queue.payloads_key, "t1") == 0
+
+    @pytest.mark.asyncio
+    async def test_expired_task_redelivered_then_dead(self, redis_queue):
+        """测试超时未确认的任务被重新投递，超过次数后放弃"""
+        await redis_queue.put(make_task("t1"))
+        await redis_queue.get()
+
+        # 模拟消费者崩溃：截止时间已过
+        await redis_queue.client.zadd(redis_queue.deadlines_key, {"t1": 0})
+        assert await redis_queue.requeue_expired() == 1
+
+        redelivered = await redis_queue.get()
+        assert redelivered["task_id"] == "t1"
+        assert redis_queue.stats()["redelivered"] == 1
+
+        await redis_queue.client.zadd(redis_queue.deadlines_key, {"t1": 0})
+        await redis_queue.requeue_expired()
+        assert await redis_queue.size() == 0
+        assert await redis_queue.client.lrange(redis_queue.dead_key, 0, -1) == ["t1"]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_reapers_requeue_once(self, redis_queue):
+        """测试多个回收者同时回收同一超时任务时只重新入队一次"""
+        other = RedisTaskQueue(redis_client=redis_queue.client, prefix="test:queue",
+                               visibility_timeout=30, max_deliveries=2)
+        await redis_queue.put(make_task("t1"))
+        await redis_queue.get()
+        await redis_queue.client.zadd(redis_queue.deadlines_key, {"t1": 0})
+
+        # 让两个回收者都先读到同一批超时任务
+        zrangebyscore = redis_queue.client.zrangebyscore
+
+        async def slow_zrangebyscore(*args, **kwargs):
+            expired = await zrangebyscore(*args, **kwargs)
+            await asyncio.sleep(0.05)
+            return expired
+
+        redis_queue.client.zrangebyscore = slow_zrangebyscore
+        reclaimed = await asyncio.gather(redis_queue.requeue_expired(), other.requeue_expired())
+
+        assert sorted(reclaimed) == [0, 1]
+        pending = redis_queue.pending_key('slogan', 'anonymous')
+        assert await redis_queue.client.lrange(pending, 0, -1) == ["t1"]
+        assert await redis_queue.client.llen(redis_queue.processing_key) == 0
+
+    @pytest.mark.asyncio
+    async def test_nack_requeues_immediately(self, redis_queue):
+        """测试放弃处理后任务立即可被取出"""
+        await redis_queue.put(make_task("t1"))
+        await redis_queue.put(make_task("t2"))
+        task = await redis_queue.get()
+        await redis_queue.nack(task)
+
+        assert (await redis_queue.get())["task_id"] == "t1"
+
+    @pytest.mark.asyncio
+    async def test_users_rotate_across_consumers(self, redis_queue):
+        """测试车道内按用户轮询，多个实例共享同一轮转顺序"""
+        other = RedisTaskQueue(redis_client=redis_queue.client, prefix="test:queue",
+                               poll_timeout=0.1, use_scripts=redis_queue.use_scripts)
+        for i in range(3):
+            await redis_queue.put({**make_task(f"a{i}"), 'user_id': 'a'})
+        await other.put({**make_task("b0"), 'user_id': 'b'})
+        await other.put({**make_task("b1"), 'user_id': 'b'})
+        assert await redis_queue.lane_depths() == {'slogan': 5}
+
+        order = []
+        for consumer in (redis_queue, other, redis_queue, other, redis_queue):
+            order.append((await consumer.get())['task_id'])
+        assert order == ["a0", "b0", "a1", "b1", "a2"]
+        assert await redis_queue.size() == 0
+        assert await redis_queue.client.llen(redis_queue.users_key('slogan')) == 0
+
+    @pytest.mark.asyncio
+    async def test_requeued_task_goes_first(self, redis_queue):
+        """测试放弃处理的任务排在其他用户之前"""
+        await redis_queue.put({**make_task("a0"), 'user_id': 'a'})
+        await redis_queue.put({**make_task("b0"), 'user_id': 'b'})
+        task = await redis_queue.get()
+        await redis_queue.nack(task)
+
+        assert (await redis_queue.get())['task_id'] == "a0"
+        assert (await redis_queue.get())['task_id'] == "b0"
+
+    @pytest.mark.asyncio
+    async def test_get_waits_for_new_task(self, redis_queue):
+        """测试空队列时阻塞等待"""
+        getter = asyncio.create_task(redis_queue.get())
+        await asyncio.sleep(0.2)
+        assert not getter.done()
+
+        await redis_queue.put(make_task("t1"))
+        assert (await asyncio.wait_for(getter, timeout=2))["task_id"] == "t1"
+
+
+class TestMemoryTaskQueue:
+    """进程内任务队列测试"""
+
+    def test_base_class_is_abstract(self):
+        """测试队列接口不能直接实例化"""
+        with pytest.raises(TypeError):
+            TaskQueue()
+
+    @pytest.mark.asyncio
+    async def test_put_get_ack(self):
+        """测试基本操作"""
+        queue = MemoryTaskQueue()
+        await queue.put(make_task("t1"))
+        assert await queue.size() == 1
+
+        task = await queue.get()
+        await queue.ack(task)
+        assert await queue.size() == 0
+
+    @pytest.mark.asyncio
+    async def test_lanes_follow_weights_and_users_rotate(self):
+        """测试车道按权重调度，车道内按用户轮询"""
+        queue = MemoryTaskQueue(weights={'slogan': 3, 'banner': 1})
+        for i in range(4):
+            await queue.put({**make_task(f"a{i}"), 'user_id': 'a'})
+        await queue.put({**make_task("b0"), 'user_id': 'b'})
+        for i in range(2):
+            await queue.put({**make_task(f"banner{i}"), 'type': 'banner'})
+        assert await queue.lane_depths() == {'slogan': 5, 'banner': 2}
+
+        order = [(await queue.get())['task_id'] for _ in range(5)]
+        # 用户b的任务不必等待用户a的全部任务
+        assert order[:2] == ["a0", "b0"]
+        assert sum(task_id.startswith("banner") for task_id in order[:4]) == 1
+
+
+class TestRedisLanes:
+    """Redis任务队列车道测试"""
+
+    @pytest.mark.asyncio
+    async def test_detects_script_support(self, redis_client):
+        """测试首次出队时检测Redis是否支持Lua脚本"""
+        try:
+            import lupa  # noqa: F401
+            scripting = True
+        except ImportError:
+            scripting = False
+        queue = RedisTaskQueue(redis_client=redis_client, prefix="test:detect", poll_timeout=0.1)
+        await queue.put(make_task("t1"))
+        assert (await queue.get())['task_id'] == "t1"
+        assert queue.use_scripts is scripting
+
+    @pytest.mark.asyncio
+    async def test_weighted_lanes(self, redis_client):
+        """测试车道按权重调度"""
+        queue = RedisTaskQueue(redis_client=redis_client, prefix="test:lanes", poll_timeout=0.1,
+                               weights={'slogan': 2, 'emoji': 1})
+        for i in range(4):
+            await queue.put(make_task(f"s{i}"))
+            await queue.put({**make_task(f"e{i}"), 'type': 'emoji'})
+        assert await queue.lane_depths() == {'emoji': 4, 'slogan': 4}
+
+        order = [(await queue.get())['task_id'] for _ in range(6)]
+        assert order == ["s0", "e0", "s1", "s2", "e1", "s3"]
+        assert await queue.size() == 2
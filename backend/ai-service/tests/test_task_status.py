@@ -0,0 +1,52 @@
+"""
+批量任务状态接口测试
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+from app.api import routes
+from app.main import app
+
+
+class TestBulkTaskStatus:
+    """批量任务状态测试"""
+
+    @pytest.mark.asyncio
+    async def test_cache_hits_and_single_query_for_misses(self, redis_manager):
+        """测试缓存命中直接返回，未命中的任务合并为一次查询"""
+        await redis_manager.set("task:t1", {'status': 'processing', 'progress': 30})
+
+        db = AsyncMock()
+        db.execute_query.return_value = [{
+            'task_id': "t2", 'status': 'completed', 'progress': 100,
+            'output_image_path': "generated/banners/t2.png", 'error_message': None,
+            'generation_time': 12, 'created_at': None, 'completed_at': None
+        }]
+
+        with patch.object(routes, 'get_redis', AsyncMock(return_value=redis_manager)), \
+                patch.object(routes, 'get_db', AsyncMock(return_value=db)):
+            response = TestClient(app).post(
+                "/api/v1/tasks/status", json={"task_ids": ["t1", "t2", "t3", "t1"]}
+            )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [task["task_id"] for task in data["tasks"]] == ["t1", "t2"]
+        assert data["tasks"][0]["progress"] == 30
+        assert data["tasks"][1]["result"]["image_path"] == "generated/banners/t2.png"
+        assert data["missing"] == ["t3"]
+
+        db.execute_query.assert_awaited_once()
+        query, params = db.execute_query.await_args.args
+        assert "IN (%s, %s)" in query
+        assert params == ("t2", "t3")
+
+        # 终态任务回填缓存
+        assert (await redis_manager.get("task:t2"))["status"] == "completed"
+
+    def test_empty_list_rejected(self):
+        """测试空任务列表返回校验错误"""
+        response = TestClient(app).post("/api/v1/tasks/status", json={"task_ids": []})
+        assert response.status_code == 422
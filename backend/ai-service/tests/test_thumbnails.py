@@ -0,0 +1,93 @@
+"""
+缩略图测试
+"""
+
+import os
+
+import pytest
+from unittest.mock import AsyncMock, patch
+from PIL import Image
+
+from app.services.image_encoding import make_thumbnail, thumbnail_path
+from app.services.renderer import RenderJob, run_render_job
+from app.services.thumbnail_backfill import ThumbnailBackfill
+from benchmarks.storage_benchmark import sqlite_db_manager
+
+
+class TestMakeThumbnail:
+    """缩略图生成测试"""
+
+    def test_downscale_keeps_aspect_ratio(self):
+        """测试按最长边等比缩小"""
+        thumbnail = make_thumbnail(Image.new('RGB', (1600, 600)), size=300)
+        assert thumbnail.size == (300, 113)
+
+    def test_small_image_and_disabled(self):
+        """测试小图直接使用原图，尺寸不大于0时不生成"""
+        img = Image.new('RGB', (300, 300))
+        assert make_thumbnail(img, size=300) is img
+        assert make_thumbnail(img, size=0) is None
+
+    def test_thumbnail_path(self):
+        """测试缩略图与原图在同一目录"""
+        assert thumbnail_path('generated/banners/t1.png', 'webp') == 'generated/banners/t1_thumb.webp'
+
+
+class TestRenderThumbnail:
+    """渲染阶段生成缩略图测试"""
+
+    def test_banner_thumbnail_written_next_to_output(self, tmp_path):
+        """测试由内存中的图片生成缩略图并写到原图旁"""
+        with patch('app.services.renderer.settings.GENERATED_PATH', str(tmp_path)), \
+                patch('app.services.image_encoding.settings.THUMBNAIL_SIZE', 300):
+            result = run_render_job(RenderJob(kind='banner', task_id='t1', payload={
+                'text': '樊振东加油', 'parameters': {'width': 800, 'height': 300, 'format': 'webp'}
+            }))
+
+        assert result.thumbnail_path == 'generated/banners/t1_thumb.webp'
+        with Image.open(tmp_path / 'banners' / 't1_thumb.webp') as thumbnail:
+            assert thumbnail.size == (300, 113)
+
+    def test_small_image_uses_output_as_thumbnail(self, tmp_path):
+        """测试不超过缩略图尺寸的图片不另存缩略图"""
+        with patch('app.services.renderer.settings.GENERATED_PATH', str(tmp_path)), \
+                patch('app.services.image_encoding.settings.THUMBNAIL_SIZE', 300):
+            result = run_render_job(RenderJob(kind='emoji', task_id='t2', payload={
+                'prompt': '加油', 'parameters': {'format': 'png'}
+            }))
+
+        assert result.thumbnail_path == result.image_path == 'generated/emojis/t2.png'
+        assert os.listdir(tmp_path / 'emojis') == ['t2.png']
+
+
+class TestThumbnailBackfill:
+    """缩略图补全测试"""
+
+    @pytest.mark.asyncio
+    async def test_backfill_missing_thumbnails(self, tmp_path):
+        """测试为缺少缩略图的记录生成缩略图并回写路径，原图缺失的记录跳过"""
+        (tmp_path / 'banners').mkdir()
+        Image.new('RGB', (800, 300), 'red').save(tmp_path / 'banners' / 'old.png')
+        db = sqlite_db_manager()
+        await db.execute_many(
+            "INSERT INTO fazd_generation_records (task_id, status, output_image_path, thumbnail_path) "
+            "VALUES (%s, %s, %s, %s)", [
+                ('old', 'completed', 'generated/banners/old.png', None),
+                ('gone', 'completed', 'generated/banners/gone.png', None),
+                ('done', 'completed', 'generated/banners/done.png', 'generated/banners/done_thumb.png'),
+                ('running', 'processing', None, None),
+            ]
+        )
+
+        with patch('app.services.thumbnail_backfill.get_db', AsyncMock(return_value=db)), \
+                patch('app.services.thumbnail_backfill.settings.GENERATED_PATH', str(tmp_path)), \
+                patch('app.services.image_encoding.settings.IMAGE_FORMAT', 'webp'), \
+                patch('app.services.image_encoding.settings.THUMBNAIL_SIZE', 300):
+            stats = await ThumbnailBackfill(batch_size=1).run()
+
+        assert stats == {'scanned': 2, 'created': 1, 'missing': 1, 'failed': 0}
+        rows = await db.execute_query("SELECT task_id, thumbnail_path FROM fazd_generation_records ORDER BY id")
+        assert rows[0] == {'task_id': 'old', 'thumbnail_path': 'generated/banners/old_thumb.webp'}
+        assert rows[1]['thumbnail_path'] is None
+        with Image.open(tmp_path / 'banners' / 'old_thumb.webp') as thumbnail:
+            assert thumbnail.size == (300, 113)
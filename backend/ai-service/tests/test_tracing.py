@@ -0,0 +1,127 @@
+"""
+链路追踪测试
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.core.tracing import OTLPExporter, Tracer, parse_traceparent
+from app.services.renderer import RenderJob, run_render_job
+
+UPSTREAM = "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01"
+
+
+class TestTraceparent:
+    """W3C traceparent解析测试"""
+
+    def test_parse_valid(self):
+        """测试解析有效的traceparent"""
+        assert parse_traceparent(UPSTREAM) == ('4bf92f3577b34da6a3ce929d0e0e4736', '00f067aa0ba902b7')
+
+    def test_parse_invalid(self):
+        """测试无效的traceparent被忽略"""
+        assert parse_traceparent(None) is None
+        assert parse_traceparent('garbage') is None
+        assert parse_traceparent('00-' + '0' * 32 + '-00f067aa0ba902b7-01') is None
+        assert parse_traceparent('ff-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01') is None
+
+
+class TestTracer:
+    """追踪器测试"""
+
+    @pytest.mark.asyncio
+    async def test_nested_spans_continue_upstream_trace(self):
+        """测试子span继承任务与链路，根span接续上游链路"""
+        tracer = Tracer(max_tasks=10)
+        with tracer.span('process', task_id='task-1', traceparent=UPSTREAM) as root:
+            tracer.record('queue_wait', root.start - 1.0, root.start)
+            with tracer.span('generate') as generate:
+                with tracer.span('model_call') as call:
+                    await asyncio.sleep(0.01)
+
+        spans = tracer.spans('task-1')
+        assert [span['name'] for span in spans] == ['queue_wait', 'process', 'generate', 'model_call']
+        assert {span['trace_id'] for span in spans} == {'4bf92f3577b34da6a3ce929d0e0e4736'}
+        assert root.parent_id == '00f067aa0ba902b7'
+        assert generate.parent_id == root.span_id
+        assert call.parent_id == generate.span_id
+        assert tracer.breakdown(spans)['queue_wait'] == pytest.approx(1.0)
+
+    def test_later_spans_attach_to_task_root(self):
+        """测试同一任务后续的span挂到根span下"""
+        tracer = Tracer(max_tasks=10)
+        with tracer.span('enqueue', task_id='task-1') as root:
+            pass
+        with tracer.span('process', task_id='task-1') as process:
+            pass
+
+        assert process.trace_id == root.trace_id
+        assert process.parent_id == root.span_id
+
+    def test_error_status_and_eviction(self):
+        """测试异常标记与任务数量上限"""
+        tracer = Tracer(max_tasks=2)
+        with pytest.raises(ValueError):
+            with tracer.span('generate', task_id='task-1'):
+                raise ValueError("boom")
+        assert tracer.spans('task-1')[0]['status'] == 'error'
+        assert tracer.spans('task-1')[0]['error'] == 'boom'
+
+        for task_id in ('task-2', 'task-3'):
+            with tracer.span('generate', task_id=task_id):
+                pass
+        assert tracer.spans('task-1') == []
+        assert tracer.spans('task-3')
+
+    @pytest.mark.asyncio
+    async def test_persist_and_load_from_redis(self, redis_manager):
+        """测试span写入Redis后可被其他进程读取"""
+        writer, reader = Tracer(), Tracer()
+        with writer.span('process', task_id='task-1'):
+            pass
+        with patch('app.core.tracing.get_redis', AsyncMock(return_value=redis_manager)):
+            await writer.persist('task-1')
+            spans = await reader.load('task-1')
+
+        assert [span['name'] for span in spans] == ['process']
+
+
+class TestOTLPExporter:
+    """OTLP导出测试"""
+
+    @pytest.mark.asyncio
+    async def test_payload_and_flush(self):
+        """测试OTLP JSON格式与批量发送"""
+        exporter = OTLPExporter('http://collector/v1/traces', service_name='ai-service', batch_size=2)
+        tracer = Tracer(exporter=exporter)
+        for _ in range(3):
+            with tracer.span('render', task_id='task-1', kind='banner'):
+                pass
+
+        payload = exporter.payload(exporter._buffer[:1])
+        span = payload['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+        assert payload['resourceSpans'][0]['resource']['attributes'][0]['value'] == {'stringValue': 'ai-service'}
+        assert len(span['traceId']) == 32 and len(span['spanId']) == 16
+        assert {'key': 'kind', 'value': {'stringValue': 'banner'}} in span['attributes']
+
+        client = AsyncMock()
+        exporter._client = client
+        await exporter.flush()
+        assert client.post.await_count == 2
+        assert exporter.counters['exported'] == 3
+
+
+class TestRenderStages:
+    """渲染阶段计时测试"""
+
+    def test_render_result_has_stages(self, tmp_path):
+        """测试渲染结果包含编码与写盘阶段"""
+        with patch('app.services.renderer.settings.GENERATED_PATH', str(tmp_path)):
+            result = run_render_job(RenderJob(kind='emoji', task_id='task-1',
+                                              payload={'prompt': '加油', 'parameters': {}}))
+
+        names = [name for name, _, _ in result.stages]
+        assert names == ['compose', 'encode', 'thumbnail', 'write']
+        assert all(end >= start for _, start, end in result.stages)
+        assert result.file_size == (tmp_path / 'emojis' / 'task-1.webp').stat().st_size